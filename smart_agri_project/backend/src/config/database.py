@@ -15,12 +15,40 @@ def get_database():
     client = get_client()
     return client[settings.MONGO_DB]
 
+async def create_sensor_collection(db):
+    """
+    Create sensor_readings as a time-series collection (MongoDB 5.0+).
+    Falls back to a regular collection if it already exists or the server can't do it.
+    """
+    existing = await db.list_collection_names(filter={"name": "sensor_readings"})
+    if not existing:
+        try:
+            await db.create_collection(
+                "sensor_readings",
+                timeseries={"timeField": "timestamp", "metaField": "sensor_id", "granularity": "minutes"}
+            )
+        except Exception as e:
+            print("Time-series collection not created, using a regular collection:", e)
+
 async def create_indexes():
     db = get_database()
-    # Indexes for predictions
-    await db.disease_predictions.create_index("created_at")
-    await db.irrigation_predictions.create_index("created_at")
-    await db.yield_predictions.create_index("created_at")
+    # Indexes for predictions: keyset pagination on (created_at, _id), alone and behind each history filter
+    from src.services.db_service import history_indexes
+    for collection, indexes in history_indexes().items():
+        for keys in indexes:
+            await db[collection].create_index(keys)
+
+    # Daily prediction summaries (analytics), one document per bucket key
+    from src.services.analytics_service import SUMMARY_KEYS
+    for summary, keys in SUMMARY_KEYS.items():
+        await db[summary].create_index([(k, 1) for k in keys], unique=True)
+    await db.irrigation_summary_1d.create_index([("sensor_id", 1), ("day", 1)])
+
+    # Sensor readings + rollups
+    await create_sensor_collection(db)
+    await db.sensor_readings.create_index([("sensor_id", 1), ("timestamp", 1)])
+    for rollup in ("sensor_rollup_1m", "sensor_rollup_1h", "sensor_rollup_1d"):
+        await db[rollup].create_index([("sensor_id", 1), ("bucket", 1)], unique=True)
 
 async def close_client():
     global _client
@@ -11,10 +11,105 @@ class Settings(BaseSettings):
     APP_HOST: str = Field("0.0.0.0", env="APP_HOST")
     APP_PORT: int = Field(8000, env="APP_PORT")
 
-    # Model paths
-    DISEASE_MODEL_PATH: str = Field("data/models/disease_model.pth", env="DISEASE_MODEL_PATH")
-    IRRIGATION_MODEL_PATH: str = Field("data/models/irrigation_model.pkl", env="IRRIGATION_MODEL_PATH")
-    YIELD_MODEL_PATH: str = Field("data/models/yield_model.pkl", env="YIELD_MODEL_PATH")
+    # Model paths (relative to backend/); served until a version is published to the model store
+    DISEASE_MODEL_PATH: str = Field("data/models/disease_resnet18.pth", env="DISEASE_MODEL_PATH")
+    IRRIGATION_MODEL_PATH: str = Field("data/models/irrigation_rf.pkl", env="IRRIGATION_MODEL_PATH")
+    YIELD_MODEL_PATH: str = Field("data/models/yield_rf.pkl", env="YIELD_MODEL_PATH")
+
+    # Versioned model store (<dir>/<model>/<version>/manifest.json) and hot-reload polling (0 = off)
+    MODEL_STORE_DIR: str = Field("data/models", env="MODEL_STORE_DIR")
+    MODEL_WATCH_INTERVAL_S: float = Field(10.0, env="MODEL_WATCH_INTERVAL_S")
+    # Required in X-Admin-Token for /admin endpoints (empty = no check)
+    ADMIN_TOKEN: str = Field("", env="ADMIN_TOKEN")
+
+    # Models loaded in the background at startup (comma-separated; empty = load on first request)
+    MODEL_WARMUP: str = Field("disease,irrigation,yield", env="MODEL_WARMUP")
+
+    # Disease inference micro-batching
+    DISEASE_BATCH_MAX_SIZE: int = Field(16, env="DISEASE_BATCH_MAX_SIZE")
+    DISEASE_BATCH_MAX_WAIT_MS: float = Field(5.0, env="DISEASE_BATCH_MAX_WAIT_MS")
+
+    # Multi-image disease scans (/predict/disease/batch)
+    DISEASE_BULK_BATCH_SIZE: int = Field(32, env="DISEASE_BULK_BATCH_SIZE")
+    DISEASE_BULK_MAX_IMAGES: int = Field(1000, env="DISEASE_BULK_MAX_IMAGES")
+    # Uncompressed size limits per image and per request (zip entries are checked before extraction)
+    DISEASE_BULK_MAX_IMAGE_BYTES: int = Field(20 * 1024 * 1024, env="DISEASE_BULK_MAX_IMAGE_BYTES")
+    DISEASE_BULK_MAX_TOTAL_BYTES: int = Field(512 * 1024 * 1024, env="DISEASE_BULK_MAX_TOTAL_BYTES")
+    DISEASE_DECODE_WORKERS: int = Field(4, env="DISEASE_DECODE_WORKERS")
+
+    # Disease model artifact: "auto" (int8 > torchscript > eager, whichever exists), "int8", "torchscript" or "eager"
+    DISEASE_MODEL_VARIANT: str = Field("auto", env="DISEASE_MODEL_VARIANT")
+    # "auto" only serves int8 if its export report shows at most this top-1 accuracy drop vs fp32
+    DISEASE_INT8_MAX_TOP1_DROP: float = Field(0.01, env="DISEASE_INT8_MAX_TOP1_DROP")
+    # Torch CPU threads (0 = torch default)
+    TORCH_NUM_THREADS: int = Field(0, env="TORCH_NUM_THREADS")
+    TORCH_INTEROP_THREADS: int = Field(0, env="TORCH_INTEROP_THREADS")
+
+    # Inference executor pools: torch runs on threads, the sklearn forests on processes ("process" or "thread").
+    # More than workers + max_queue pending calls on a pool answer 503 with Retry-After.
+    TORCH_POOL_WORKERS: int = Field(1, env="TORCH_POOL_WORKERS")
+    TORCH_POOL_MAX_QUEUE: int = Field(64, env="TORCH_POOL_MAX_QUEUE")
+    SKLEARN_POOL_KIND: str = Field("process", env="SKLEARN_POOL_KIND")
+    SKLEARN_POOL_WORKERS: int = Field(2, env="SKLEARN_POOL_WORKERS")
+    SKLEARN_POOL_MAX_QUEUE: int = Field(128, env="SKLEARN_POOL_MAX_QUEUE")
+    INFERENCE_RETRY_AFTER_S: int = Field(1, env="INFERENCE_RETRY_AFTER_S")
+
+    # Random forest inference backend per model: "sklearn" or "compiled"
+    IRRIGATION_INFERENCE_BACKEND: str = Field("sklearn", env="IRRIGATION_INFERENCE_BACKEND")
+    YIELD_INFERENCE_BACKEND: str = Field("sklearn", env="YIELD_INFERENCE_BACKEND")
+    # Batches above this many rows fall back to sklearn even with the compiled backend
+    COMPILED_FOREST_MAX_ROWS: int = Field(128, env="COMPILED_FOREST_MAX_ROWS")
+
+    # Sensor bulk ingestion (write-behind buffer)
+    SENSOR_FLUSH_ROWS: int = Field(500, env="SENSOR_FLUSH_ROWS")
+    SENSOR_FLUSH_INTERVAL_MS: float = Field(1000.0, env="SENSOR_FLUSH_INTERVAL_MS")
+    SENSOR_BUFFER_MAX_ROWS: int = Field(20000, env="SENSOR_BUFFER_MAX_ROWS")
+    SENSOR_BUFFER_PUT_TIMEOUT_S: float = Field(5.0, env="SENSOR_BUFFER_PUT_TIMEOUT_S")
+
+    # Prediction audit writes (db_service.prediction_queue): batched insert_many off the request path
+    PERSIST_FLUSH_ROWS: int = Field(500, env="PERSIST_FLUSH_ROWS")
+    PERSIST_FLUSH_INTERVAL_MS: float = Field(200.0, env="PERSIST_FLUSH_INTERVAL_MS")
+    # beyond this many queued documents new ones go straight to the spill file
+    PERSIST_QUEUE_MAX_ROWS: int = Field(50000, env="PERSIST_QUEUE_MAX_ROWS")
+    PERSIST_RETRIES: int = Field(3, env="PERSIST_RETRIES")
+    PERSIST_BACKOFF_S: float = Field(0.5, env="PERSIST_BACKOFF_S")
+    PERSIST_BACKOFF_MAX_S: float = Field(10.0, env="PERSIST_BACKOFF_MAX_S")
+    # Append-only JSONL file for documents Mongo did not take (empty = drop them), replayed on recovery
+    PERSIST_SPILL_PATH: str = Field("data/spill/predictions.jsonl", env="PERSIST_SPILL_PATH")
+    PERSIST_REPLAY_INTERVAL_S: float = Field(30.0, env="PERSIST_REPLAY_INTERVAL_S")
+
+    # Per-sensor ring buffer of recent readings for irrigation lag / rolling features
+    SENSOR_FEATURE_WINDOW: int = Field(24, env="SENSOR_FEATURE_WINDOW")
+
+    # Incremental irrigation retraining from sensor_readings (src/services/incremental_irrigation.py)
+    # "warm_start" grows the served forest with new trees; "window" refits on the most recent rows
+    IRRIGATION_RETRAIN_MODE: str = Field("warm_start", env="IRRIGATION_RETRAIN_MODE")
+    IRRIGATION_RETRAIN_TREES_PER_RUN: int = Field(20, env="IRRIGATION_RETRAIN_TREES_PER_RUN")
+    IRRIGATION_RETRAIN_MAX_TREES: int = Field(300, env="IRRIGATION_RETRAIN_MAX_TREES")
+    IRRIGATION_RETRAIN_WINDOW_ROWS: int = Field(50000, env="IRRIGATION_RETRAIN_WINDOW_ROWS")
+    IRRIGATION_RETRAIN_HOLDOUT_ROWS: int = Field(20000, env="IRRIGATION_RETRAIN_HOLDOUT_ROWS")
+    # fewer new training rows than this: leave the watermark where it is and wait for more
+    IRRIGATION_RETRAIN_MIN_ROWS: int = Field(200, env="IRRIGATION_RETRAIN_MIN_ROWS")
+
+    # Request / per-stage latency metrics at GET /metrics (Prometheus text format)
+    METRICS_ENABLED: bool = Field(True, env="METRICS_ENABLED")
+
+    # Prediction cache (yield / irrigation)
+    PREDICTION_CACHE_ENABLED: bool = Field(True, env="PREDICTION_CACHE_ENABLED")
+    PREDICTION_CACHE_MAX_ENTRIES: int = Field(10000, env="PREDICTION_CACHE_MAX_ENTRIES")
+    PREDICTION_CACHE_TTL_S: float = Field(300.0, env="PREDICTION_CACHE_TTL_S")
+    # Optional SQLite file shared by all workers on a host (empty = in-process only)
+    PREDICTION_CACHE_SQLITE_PATH: str = Field("", env="PREDICTION_CACHE_SQLITE_PATH")
+    # Row cap for the shared file and how often expired rows are purged (on write)
+    PREDICTION_CACHE_SQLITE_MAX_ROWS: int = Field(100000, env="PREDICTION_CACHE_SQLITE_MAX_ROWS")
+    PREDICTION_CACHE_SQLITE_PURGE_S: float = Field(60.0, env="PREDICTION_CACHE_SQLITE_PURGE_S")
+
+    # AI recommendations (Gemini)
+    AI_MODEL_NAME: str = Field("gemini-pro", env="AI_MODEL_NAME")
+    AI_MAX_CONCURRENCY: int = Field(4, env="AI_MAX_CONCURRENCY")
+    AI_TIMEOUT_S: float = Field(20.0, env="AI_TIMEOUT_S")
+    AI_CACHE_MAX_ENTRIES: int = Field(1000, env="AI_CACHE_MAX_ENTRIES")
+    AI_CACHE_TTL_S: float = Field(3600.0, env="AI_CACHE_TTL_S")
 
     # Debug
     DEBUG: bool = Field(True, env="DEBUG")
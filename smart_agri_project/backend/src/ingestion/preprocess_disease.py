@@ -1,58 +1,235 @@
-import os
-import shutil
+"""
+Disease (PlantVillage) image preprocessing.
+Run from backend/:  python -m src.ingestion.preprocess_disease [--workers 8]
+
+- Decoding / resizing runs on a process pool; JPEGs are decoded with PIL draft() at the
+  smallest DCT scale that is still >= 224x224, which skips most of the decode work.
+- Incremental: manifest.json records every source image's size/mtime, content hash, split and
+  target. Re-runs skip images whose hash is unchanged and whose target exists.
+- Corrupt images are listed in corrupt.json (path + error) instead of only being printed.
+- The train/val/test split is a hash of the image's class/filename, so it never changes
+  between runs or when new images are added.
+- Every run finishes by deleting files under the split folders that the manifest does not own
+  (deleted or corrupt sources, and outputs of the older random split that landed in another
+  split), so no image is ever in both train/ and test/.
+"""
+
+import argparse
+import hashlib
+import io
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
 from PIL import Image
-from sklearn.model_selection import train_test_split
 
 BASE = Path(__file__).resolve().parents[2]
 RAW = BASE / "data" / "training" / "disease" / "raw"
 PROC = BASE / "data" / "processed" / "disease"
 
 IMG_SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+
+# (split, fraction) — ~70/15/15
+SPLITS = [("train", 0.70), ("val", 0.15), ("test", 0.15)]
+
+MANIFEST_NAME = "manifest.json"
+CORRUPT_NAME = "corrupt.json"
+# manifest is checkpointed this often so an interrupted run keeps its progress
+CHECKPOINT_EVERY = 1000
+
+
+def split_for(rel_path: str) -> str:
+    """Deterministic split from the image's path relative to the raw folder."""
+    digest = hashlib.blake2b(rel_path.encode(), digest_size=8).digest()
+    u = int.from_bytes(digest, "big") / float(2 ** 64)
+    edge = 0.0
+    for name, frac in SPLITS:
+        edge += frac
+        if u < edge:
+            return name
+    return SPLITS[-1][0]
+
+
+def prepare_dirs(proc: Path = PROC):
+    for split, _ in SPLITS:
+        (proc / split).mkdir(parents=True, exist_ok=True)
+
+
+def _load_json(path: Path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _save_json(path: Path, data):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, path)
+
 
-def prepare_dirs():
-    for split in ["train", "val", "test"]:
-        (PROC / split).mkdir(parents=True, exist_ok=True)
+def _process_one(src: str, dst: str, previous_hash: Optional[str]) -> Tuple[str, str, Optional[str]]:
+    """
+    Worker: hash the source, then decode + resize + save unless nothing changed.
+    Returns (status, sha1, error) with status "done", "unchanged" or "corrupt".
+    """
+    try:
+        with open(src, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        return "corrupt", "", str(e)
+    digest = hashlib.sha1(data).hexdigest()
+    if digest == previous_hash and os.path.exists(dst):
+        return "unchanged", digest, None
 
-def process_images():
-    classes = [c.name for c in RAW.iterdir() if c.is_dir()]
+    try:
+        im = Image.open(io.BytesIO(data))
+        im.draft("RGB", IMG_SIZE)
+        im = im.convert("RGB").resize(IMG_SIZE)
+        # write next to the target and rename, so a killed run never leaves a partial file
+        tmp = f"{dst}.tmp{os.getpid()}"
+        im.save(tmp, format="PNG" if dst.lower().endswith(".png") else "JPEG")
+        os.replace(tmp, dst)
+    except Exception as e:
+        return "corrupt", digest, str(e)
+    return "done", digest, None
+
+
+def prune_outputs(proc: Path, manifest: Dict[str, Dict]) -> int:
+    """Delete images under the split folders that are not the target of a good manifest entry."""
+    owned = {Path(e["target"]).as_posix() for e in manifest.values()
+             if e.get("status") != "corrupt" and e.get("target")}
+    removed = 0
+    for split, _ in SPLITS:
+        split_dir = proc / split
+        if not split_dir.exists():
+            continue
+        for path in sorted(split_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            # images we do not own, and partial files left by a killed worker
+            stray_tmp = ".tmp" in path.name
+            if stray_tmp or (path.suffix.lower() in IMAGE_EXTENSIONS
+                             and path.relative_to(proc).as_posix() not in owned):
+                path.unlink()
+                removed += 1
+    return removed
+
+
+class _Progress:
+    def __init__(self, total: int, every_s: float = 5.0):
+        self.total = total
+        self.every_s = every_s
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.done = 0
+
+    def step(self):
+        self.done += 1
+        now = time.perf_counter()
+        if now - self.last >= self.every_s or self.done == self.total:
+            self.last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            eta = (self.total - self.done) / rate if rate else 0.0
+            print(f"[{self.done}/{self.total}] {rate:.1f} images/sec, ETA {eta:.0f}s")
+
+    @property
+    def rate(self) -> float:
+        return self.done / max(time.perf_counter() - self.start, 1e-9)
+
+
+def process_images(raw: Path = RAW, proc: Path = PROC, workers: Optional[int] = None) -> Dict:
+    prepare_dirs(proc)
+    classes = sorted(c.name for c in raw.iterdir() if c.is_dir())
     class_map = {name: idx for idx, name in enumerate(classes)}
 
-    all_images = []
+    manifest: Dict[str, Dict] = _load_json(proc / MANIFEST_NAME, {})
+    corrupt: Dict[str, str] = {}
+    counts = {"done": 0, "unchanged": 0, "corrupt": 0}
+
+    todo = []
+    seen = set()
     for cls in classes:
-        for img_path in (RAW / cls).glob("*"):
-            if img_path.suffix.lower() in [".jpg", ".png", ".jpeg"]:
-                all_images.append((img_path, cls))
-
-    train_imgs, test_imgs = train_test_split(all_images, test_size=0.15, random_state=42)
-    train_imgs, val_imgs = train_test_split(train_imgs, test_size=0.176, random_state=42)  # yields ~70/15/15
-
-    splits = {"train": train_imgs, "val": val_imgs, "test": test_imgs}
-
-    for split, images in splits.items():
-        split_dir = PROC / split
-        for img, cls in images:
-            cls_dir = split_dir / cls
-            cls_dir.mkdir(exist_ok=True)
-            try:
-                im = Image.open(img).convert("RGB")
-                im = im.resize(IMG_SIZE)
-                im.save(cls_dir / img.name)
-            except Exception:
-                print(f"Corrupted image skipped: {img}")
-
-    json.dump(class_map, open(PROC / "labels.json", "w"), indent=4)
-
-    json.dump({
-        "total_images": len(all_images),
-        "train": len(train_imgs),
-        "val": len(val_imgs),
-        "test": len(test_imgs),
-        "classes": class_map
-    }, open(PROC / "dataset_info.json", "w"), indent=4)
+        for img_path in sorted((raw / cls).iterdir()):
+            if img_path.suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            rel = f"{cls}/{img_path.name}"
+            seen.add(rel)
+            st = img_path.stat()
+            split = split_for(rel)
+            dst = proc / split / cls / img_path.name
+            entry = manifest.get(rel)
+            # fast path: same size/mtime as last run -> no read, no hash
+            if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                if entry.get("status") == "corrupt":
+                    corrupt[rel] = entry.get("error", "")
+                    continue
+                if dst.exists():
+                    counts["unchanged"] += 1
+                    continue
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            todo.append((rel, str(img_path), str(dst), split, st, (entry or {}).get("sha1")))
+
+    print(f"{len(seen)} images, {len(todo)} to process, {counts['unchanged']} unchanged")
+    progress = _Progress(len(todo))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_process_one,
+                           [t[1] for t in todo], [t[2] for t in todo], [t[5] for t in todo],
+                           chunksize=32)
+        for i, ((rel, src, dst, split, st, _), (status, digest, error)) in enumerate(zip(todo, results), 1):
+            counts[status] += 1
+            manifest[rel] = {
+                "sha1": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "split": split, "target": os.path.relpath(dst, proc), "status": status,
+            }
+            if status == "corrupt":
+                manifest[rel]["error"] = error
+                corrupt[rel] = error
+            else:
+                corrupt.pop(rel, None)
+            progress.step()
+            if i % CHECKPOINT_EVERY == 0:
+                _save_json(proc / MANIFEST_NAME, manifest)
+
+    # drop entries for sources that were deleted, then their files and any other stray outputs
+    manifest = {rel: e for rel, e in manifest.items() if rel in seen}
+    _save_json(proc / MANIFEST_NAME, manifest)
+    removed = prune_outputs(proc, manifest)
+    if removed:
+        print(f"Removed {removed} processed files no longer in the manifest")
+    _save_json(proc / CORRUPT_NAME, [{"path": rel, "error": err} for rel, err in sorted(corrupt.items())])
+
+    json.dump(class_map, open(proc / "labels.json", "w"), indent=4)
+
+    split_counts = {name: 0 for name, _ in SPLITS}
+    for entry in manifest.values():
+        if entry.get("status") != "corrupt":
+            split_counts[entry["split"]] += 1
+    info = {
+        "total_images": len(seen),
+        **split_counts,
+        "corrupt": len(corrupt),
+        "classes": class_map,
+        "last_run": {**counts, "removed": removed, "images_per_sec": round(progress.rate, 1) if todo else None},
+    }
+    json.dump(info, open(proc / "dataset_info.json", "w"), indent=4)
+    print(f"Processed {counts['done']}, unchanged {counts['unchanged']}, corrupt {counts['corrupt']}"
+          + (f" at {progress.rate:.1f} images/sec" if todo else ""))
+    return info
+
 
 if __name__ == "__main__":
-    prepare_dirs()
-    process_images()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw_dir", type=str, default=str(RAW))
+    parser.add_argument("--processed_dir", type=str, default=str(PROC))
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    args = parser.parse_args()
+
+    process_images(Path(args.raw_dir), Path(args.processed_dir), workers=args.workers)
     print("Disease dataset processed successfully!")
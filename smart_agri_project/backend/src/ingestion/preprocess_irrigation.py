@@ -1,61 +1,44 @@
+"""
+Irrigation dataset preprocessing.
+Run from backend/:  python -m src.ingestion.preprocess_irrigation [--streaming --chunksize 200000]
+"""
+import argparse
 import pandas as pd
 from pathlib import Path
-from sklearn.model_selection import train_test_split
-import json
+
+from src.ingestion.streaming import (
+    DEFAULT_CHUNKSIZE, find_raw_file, preprocess_in_memory, preprocess_streaming
+)
 
 BASE = Path(__file__).resolve().parents[2]
 RAW = BASE / "data" / "training" / "irrigation" / "raw"
 PROC = BASE / "data" / "processed" / "irrigation"
 
-PROC.mkdir(parents=True, exist_ok=True)
-
-# Detect correct file
-csv_files = list(RAW.glob("*.csv"))
-xlsx_files = list(RAW.glob("*.xlsx"))
-
-if csv_files:
-    FILE = csv_files[0]
-elif xlsx_files:
-    FILE = xlsx_files[0]
-else:
-    raise FileNotFoundError("No CSV or Excel irrigation data found in raw folder.")
-
-
-def preprocess():
-    # Load the file
-    if FILE.suffix == ".xlsx":
-        df = pd.read_excel(FILE)
-    else:
-        df = pd.read_csv(FILE)
 
+def clean(df: pd.DataFrame) -> pd.DataFrame:
     # Remove missing values
-    df = df.dropna()
+    return df.dropna()
 
-    # Normalize numeric columns
-    num_cols = df.select_dtypes("number").columns
-    df[num_cols] = (df[num_cols] - df[num_cols].mean()) / df[num_cols].std()
 
-    # Save cleaned data
-    df.to_csv(PROC / "cleaned.csv", index=False)
-
-    # Train/Val/Test Split
-    train, test = train_test_split(df, test_size=0.15, random_state=42)
-    train, val = train_test_split(train, test_size=0.176, random_state=42)
-
-    train.to_csv(PROC / "train.csv", index=False)
-    val.to_csv(PROC / "val.csv", index=False)
-    test.to_csv(PROC / "test.csv", index=False)
-
-    # Metadata
-    json.dump({
-        "rows": len(df),
-        "columns": list(df.columns),
-        "train": len(train),
-        "val": len(val),
-        "test": len(test)
-    }, open(PROC / "dataset_info.json", "w"), indent=4)
+def preprocess(path=None, out_dir: Path = PROC, streaming: bool = False, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Clean, normalize numeric columns (z-score) and split 70/15/15 by row hash.
+    streaming=True reads the file in chunks and writes partitioned Parquet (multi-GB exports);
+    otherwise the whole file is loaded and cleaned/train/val/test CSVs are written.
+    """
+    # Detect correct file
+    path = Path(path) if path else find_raw_file(RAW)
+    if streaming:
+        return preprocess_streaming(path, out_dir, clean, normalize_numeric=True, chunksize=chunksize)
+    return preprocess_in_memory(path, out_dir, clean, normalize_numeric=True)
 
 
 if __name__ == "__main__":
-    preprocess()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=None, help="raw CSV/XLSX (default: first file in raw folder)")
+    parser.add_argument("--streaming", action="store_true", help="chunked read, Parquet output")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    preprocess(args.input, streaming=args.streaming, chunksize=args.chunksize)
     print("Irrigation dataset processed successfully!")
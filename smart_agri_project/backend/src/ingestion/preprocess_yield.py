@@ -1,39 +1,42 @@
+"""
+Yield dataset preprocessing.
+Run from backend/:  python -m src.ingestion.preprocess_yield [--streaming --chunksize 200000]
+"""
+import argparse
 import pandas as pd
 from pathlib import Path
-from sklearn.model_selection import train_test_split
-import json
+
+from src.ingestion.streaming import (
+    DEFAULT_CHUNKSIZE, find_raw_file, preprocess_in_memory, preprocess_streaming
+)
 
 BASE = Path(__file__).resolve().parents[2]
 RAW = BASE / "data" / "training" / "yield" / "raw"
 PROC = BASE / "data" / "processed" / "yield"
 
-PROC.mkdir(parents=True, exist_ok=True)
-
-FILE = list(RAW.glob("*.csv"))[0]
-
-def preprocess():
-    df = pd.read_csv(FILE)
 
-    df = df.dropna()
+def clean(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.dropna().copy()
     df["Yield"] = df["Production"] / df["Area"].replace(0, 1)
+    return df
 
-    df.to_csv(PROC / "cleaned.csv", index=False)
 
-    train, test = train_test_split(df, test_size=0.15, random_state=42)
-    train, val = train_test_split(train, test_size=0.176, random_state=42)
-
-    train.to_csv(PROC / "train.csv", index=False)
-    val.to_csv(PROC / "val.csv", index=False)
-    test.to_csv(PROC / "test.csv", index=False)
-
-    json.dump({
-        "rows": len(df),
-        "columns": list(df.columns),
-        "train": len(train),
-        "val": len(val),
-        "test": len(test)
-    }, open(PROC / "dataset_info.json", "w"), indent=4)
+def preprocess(path=None, out_dir: Path = PROC, streaming: bool = False, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Clean, add Yield = Production / Area and split 70/15/15 by row hash (no normalization).
+    streaming=True reads the CSV in chunks and writes partitioned Parquet.
+    """
+    path = Path(path) if path else find_raw_file(RAW, patterns=("*.csv",))
+    if streaming:
+        return preprocess_streaming(path, out_dir, clean, normalize_numeric=False, chunksize=chunksize)
+    return preprocess_in_memory(path, out_dir, clean, normalize_numeric=False)
 
 if __name__ == "__main__":
-    preprocess()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=None, help="raw CSV (default: first file in raw folder)")
+    parser.add_argument("--streaming", action="store_true", help="chunked read, Parquet output")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    preprocess(args.input, streaming=args.streaming, chunksize=args.chunksize)
     print("Yield dataset processed successfully!")
@@ -0,0 +1,268 @@
+"""
+Shared helpers for tabular preprocessing (irrigation / yield).
+
+Two modes produce the same rows, normalization and splits:
+- in-memory: read the whole file with pandas, write CSVs (small datasets).
+- streaming: two passes over fixed-size chunks, so peak memory is bounded by the chunk size.
+  Pass 1 accumulates per-column mean/std (Welford / Chan merge); pass 2 normalizes each chunk
+  and appends it to hive-partitioned Parquet (out_dir/parquet/split=<name>/part-NNNNN.parquet).
+
+Splits come from a hash of each cleaned row, not from a shuffled index, so a row lands in the
+same split regardless of chunk size, file order or mode.
+"""
+
+import json
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# (split, fraction) — ~70/15/15, as the train_test_split based code had
+SPLITS = [("train", 0.70), ("val", 0.15), ("test", 0.15)]
+DEFAULT_CHUNKSIZE = 100_000
+
+Cleaner = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def find_raw_file(raw_dir: Path, patterns=("*.csv", "*.xlsx")) -> Path:
+    """First raw data file in raw_dir, CSV preferred over Excel."""
+    for pattern in patterns:
+        files = sorted(Path(raw_dir).glob(pattern))
+        if files:
+            return files[0]
+    raise FileNotFoundError(f"No {' or '.join(patterns)} data found in {raw_dir}")
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    if path.suffix == ".xlsx":
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def iter_chunks(path: Path, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Yield DataFrames of at most `chunksize` rows without loading the whole file."""
+    if path.suffix != ".xlsx":
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+
+    # pandas cannot stream Excel; openpyxl read-only mode iterates rows lazily
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c) for c in next(rows)]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=header).infer_objects()
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header).infer_objects()
+    finally:
+        wb.close()
+
+
+class RunningStats:
+    """
+    One-pass per-column count / mean / M2, merged chunk by chunk with Chan's parallel
+    form of Welford's update. std uses ddof=1 like pandas.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.count = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        # numeric columns that only ever held whole numbers keep an integer type
+        self.integral = np.ones(k, dtype=bool)
+
+    def update(self, df: pd.DataFrame):
+        X = df[self.columns].to_numpy(dtype=float)
+        n_b = np.count_nonzero(~np.isnan(X), axis=0).astype(float)
+        if not n_b.any():
+            return
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, np.nansum(X, axis=0) / n_b, 0.0)
+        m2_b = np.nansum((X - mean_b) ** 2, axis=0)
+        # a missing (or unparseable, coerced to NaN) value makes the column float, as pandas would
+        self.integral &= np.all(~np.isnan(X) & (X == np.round(X)), axis=0)
+
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = np.where(n > 0, n_b / n, 0.0)
+        self.mean = self.mean + delta * ratio
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.count * ratio
+        self.count = n
+
+    @property
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(np.where(self.count > 1, self.m2 / (self.count - 1), np.nan))
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            c: {"count": int(n), "mean": float(m), "std": float(s)}
+            for c, n, m, s in zip(self.columns, self.count, self.mean, self.std)
+        }
+
+
+def numeric_columns(df: pd.DataFrame) -> List[str]:
+    return list(df.select_dtypes("number").columns)
+
+
+def assign_splits(df: pd.DataFrame, num_cols: List[str], seed: int = 42) -> np.ndarray:
+    """
+    Split name per row from a stable 64-bit hash of its (cleaned, un-normalized) values.
+    Numeric values are hashed as float64 so an int column read as float in another chunk
+    hashes the same.
+    """
+    canon = df.copy()
+    for c in canon.columns:
+        canon[c] = canon[c].astype("float64") if c in num_cols else canon[c].astype(str)
+    h = pd.util.hash_pandas_object(canon, index=False, hash_key=f"{seed:016d}").to_numpy()
+    u = h / float(2 ** 64)
+    edges = np.cumsum([frac for _, frac in SPLITS])
+    idx = np.minimum(np.searchsorted(edges, u, side="right"), len(SPLITS) - 1)
+    return np.array([name for name, _ in SPLITS])[idx]
+
+
+def normalize(df: pd.DataFrame, cols: List[str], mean, std) -> pd.DataFrame:
+    df = df.copy()
+    df[cols] = (df[cols] - np.asarray(mean)) / np.asarray(std)
+    return df
+
+
+def _write_info(out_dir: Path, info: Dict):
+    with open(out_dir / "dataset_info.json", "w") as f:
+        json.dump(info, f, indent=4)
+
+
+def preprocess_in_memory(path: Path, out_dir: Path, clean: Cleaner, normalize_numeric: bool) -> Dict:
+    """Whole-file path: cleaned/train/val/test CSVs."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = clean(read_table(path))
+    num_cols = numeric_columns(df)
+    splits = assign_splits(df, num_cols)
+
+    stats = RunningStats(num_cols)
+    stats.update(df)
+    if normalize_numeric:
+        df = normalize(df, num_cols, df[num_cols].mean(), df[num_cols].std())
+
+    df.to_csv(out_dir / "cleaned.csv", index=False)
+    counts = {}
+    for name, _ in SPLITS:
+        part = df[splits == name]
+        part.to_csv(out_dir / f"{name}.csv", index=False)
+        counts[name] = len(part)
+
+    info = {"rows": len(df), "columns": list(df.columns), **counts,
+            "split": "hash", "normalized": normalize_numeric, "stats": stats.to_dict()}
+    _write_info(out_dir, info)
+    return info
+
+
+class PartitionedParquetWriter:
+    """Appends each chunk's rows as one part file under out_dir/split=<name>/."""
+
+    def __init__(self, out_dir: Path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Streaming preprocessing writes Parquet and needs pyarrow (pip install pyarrow).")
+        self.out_dir = out_dir
+        self.parts: Dict[str, int] = {name: 0 for name, _ in SPLITS}
+        self.rows: Dict[str, int] = {name: 0 for name, _ in SPLITS}
+
+    def write(self, split: str, df: pd.DataFrame):
+        if df.empty:
+            return
+        part_dir = self.out_dir / f"split={split}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(part_dir / f"part-{self.parts[split]:05d}.parquet", index=False)
+        self.parts[split] += 1
+        self.rows[split] += len(df)
+
+
+def _canonical_types(df: pd.DataFrame, num_cols: List[str], integral: Dict[str, bool]) -> pd.DataFrame:
+    """
+    Same column types in every part file regardless of what a chunk inferred.
+    Only columns without missing or unparseable values anywhere in the file are integral (see
+    RunningStats), so the int64 cast never meets a NaN.
+    """
+    df = df.copy()
+    for c in num_cols:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("int64" if integral.get(c) else "float64")
+    for c in df.columns:
+        if c not in num_cols:
+            df[c] = df[c].astype(str)
+    return df
+
+
+def preprocess_streaming(path: Path,
+                         out_dir: Path,
+                         clean: Cleaner,
+                         normalize_numeric: bool,
+                         chunksize: int = DEFAULT_CHUNKSIZE,
+                         num_cols: Optional[List[str]] = None) -> Dict:
+    """
+    Two-pass chunked path writing partitioned Parquet. Numeric columns are taken from the
+    first cleaned chunk unless given.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    parquet_dir = out_dir / "parquet"
+    if parquet_dir.exists():
+        shutil.rmtree(parquet_dir)
+
+    # Pass 1: schema + normalization statistics
+    stats = None
+    columns = None
+    for chunk in iter_chunks(path, chunksize):
+        chunk = clean(chunk)
+        if chunk.empty:
+            continue
+        if stats is None:
+            columns = list(chunk.columns)
+            num_cols = num_cols or numeric_columns(chunk)
+            stats = RunningStats(num_cols)
+        for c in num_cols:
+            chunk[c] = pd.to_numeric(chunk[c], errors="coerce")
+        stats.update(chunk)
+    if stats is None:
+        raise ValueError(f"No rows left in {path} after cleaning")
+    integral = dict(zip(num_cols, stats.integral.tolist()))
+
+    # Pass 2: normalize, split and write
+    writer = PartitionedParquetWriter(parquet_dir)
+    total = 0
+    for chunk in iter_chunks(path, chunksize):
+        chunk = clean(chunk)
+        if chunk.empty:
+            continue
+        chunk = _canonical_types(chunk[columns], num_cols, integral)
+        splits = assign_splits(chunk, num_cols)
+        if normalize_numeric:
+            chunk = normalize(chunk, num_cols, stats.mean, stats.std)
+        for name, _ in SPLITS:
+            writer.write(name, chunk[splits == name])
+        total += len(chunk)
+
+    info = {"rows": total, "columns": columns, **writer.rows,
+            "split": "hash", "normalized": normalize_numeric, "format": "parquet",
+            "path": str(parquet_dir), "chunksize": chunksize, "stats": stats.to_dict()}
+    _write_info(out_dir, info)
+    return info
+
+
+def read_split(out_dir: Path, split: str) -> pd.DataFrame:
+    """Load one split written by either mode."""
+    part_dir = Path(out_dir) / "parquet" / f"split={split}"
+    if part_dir.is_dir():
+        parts = sorted(part_dir.glob("part-*.parquet"))
+        return pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True) if parts else pd.DataFrame()
+    return pd.read_csv(Path(out_dir) / f"{split}.csv")
@@ -7,9 +7,23 @@ from src.routes.irrigation import router as irrigation_router
 from src.routes.yield_pred import router as yield_router
 from src.routes.fertilizer import router as fertilizer_router
 from src.routes.ai import router as ai_router
+from src.routes.sensors import router as sensors_router
+from src.routes.health import router as health_router, warmup_models
+from src.routes.admin import router as admin_router
+from src.routes.metrics import router as metrics_router
+from src.routes.history import router as history_router
+from src.routes.analytics import router as analytics_router
+
+from src.config.settings import settings
+from src.services.model_registry import registry
+from src.services.sensor_service import write_buffer as sensor_write_buffer
+from src.services import db_service, sensor_service
+from src.services.db_service import prediction_queue
+from src.services.feature_store import feature_store
+from src.utils.metrics import MetricsMiddleware
 
 # MongoDB
-from src.config.database import get_client, create_indexes, close_client
+from src.config.database import get_client, get_database, create_indexes, close_client
 
 app = FastAPI(
     title="AI-Based Smart Agriculture System",
@@ -26,12 +40,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# outermost, so CORS preflights are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 app.include_router(disease_router)
 app.include_router(irrigation_router)
 app.include_router(yield_router)
 app.include_router(fertilizer_router)
 app.include_router(ai_router)
+app.include_router(sensors_router)
+app.include_router(health_router)
+app.include_router(admin_router)
+app.include_router(history_router)
+app.include_router(analytics_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -41,7 +65,13 @@ def root():
         "available_routes": [
             "/predict/disease",
             "/predict/irrigation",
-            "/predict/yield"
+            "/predict/yield",
+            "/sensors/bulk",
+            "/health/ready",
+            "/admin/models",
+            "/history/{disease|irrigation|yield}",
+            "/analytics/disease/daily",
+            "/metrics"
         ]
     }
 
@@ -64,11 +94,51 @@ async def startup_db():
     except Exception as e:
         print("Index creation failed:", e)
 
+    # Prediction history sorts and ranges on BSON dates
+    try:
+        migrated = await db_service.migrate_created_at()
+        if any(r["converted"] or r["invalid"] for r in migrated.values()):
+            print(f"Converted string created_at to dates: {migrated}")
+    except Exception as e:
+        print("created_at migration failed:", e)
+
+    # Sensor range queries and rollups need date timestamps too
+    try:
+        migrated = await sensor_service.migrate_sensor_timestamps()
+        if migrated["converted"] or migrated["invalid"]:
+            print(f"Converted string sensor timestamps to dates: {migrated}")
+    except Exception as e:
+        print("Sensor timestamp migration failed:", e)
+
+    # Per-sensor lag features from the newest readings
+    try:
+        sensors = await feature_store.rebuild(get_database())
+        print(f"Sensor feature store rebuilt for {sensors} sensors.")
+    except Exception as e:
+        print("Sensor feature store rebuild failed:", e)
+
+
+@app.on_event("startup")
+async def warmup_models_in_background():
+    """
+    Loads models in a worker thread so startup returns immediately.
+    /health/ready reports progress.
+    """
+    models = warmup_models()
+    if models:
+        registry.start_warmup(models)
+    # hot-swap newly published / pinned model versions
+    if settings.MODEL_WATCH_INTERVAL_S > 0:
+        registry.start_watcher(settings.MODEL_WATCH_INTERVAL_S)
+
 
 @app.on_event("shutdown")
 async def shutdown_db():
     """
     Gracefully closes database connection.
     """
+    await registry.shutdown()
+    await sensor_write_buffer.close()
+    await prediction_queue.close()
     await close_client()
     print("MongoDB connection closed.")
@@ -38,78 +38,73 @@ def build_model(num_classes):
     model.fc = nn.Linear(in_features, num_classes)
     return model.to(device)
 
-def train_model(data_dir, epochs=5, batch_size=32, lr=1e-4, num_workers=4):
+def make_datasets(data_dir, packed_dir=None):
+    """
+    (train, val) datasets: ImageFolder over the JPEGs, or the pre-decoded memmap
+    arrays written by packed_dataset.py when packed_dir is given.
+    """
+    data_dir = Path(data_dir)
+    if packed_dir is not None:
+        try:
+            from packed_dataset import PackedImageDataset
+        except ImportError:
+            from src.ml.packed_dataset import PackedImageDataset
+        return (PackedImageDataset(packed_dir, "train", train=True),
+                PackedImageDataset(packed_dir, "val", train=False))
+    return (datasets.ImageFolder(data_dir / "train", transform=get_transforms(train=True)),
+            datasets.ImageFolder(data_dir / "val", transform=get_transforms(train=False)))
+
+def train_model(data_dir, epochs=5, batch_size=32, lr=1e-4, num_workers=4, packed_dir=None,
+                amp="none", channels_last=False, accum_steps=1, scheduler="cosine",
+                checkpoint_path=None, checkpoint_every=1, resume=False):
     """
     data_dir should point to processed disease folder with train/val subfolders:
       backend/data/processed/disease/train
       backend/data/processed/disease/val
+    packed_dir (optional) reads the same splits from packed_dataset.py memmap arrays instead.
+    The loop itself lives in train_engine.fit (bf16 autocast, channels_last, gradient
+    accumulation, resumable checkpoints at checkpoint_path, default MODEL_DIR/disease_train_ckpt.pt).
     """
-    data_dir = Path(data_dir)
-    train_dir = data_dir / "train"
-    val_dir = data_dir / "val"
+    try:
+        from train_engine import TrainConfig, fit
+    except ImportError:
+        from src.ml.train_engine import TrainConfig, fit
 
-    train_ds = datasets.ImageFolder(train_dir, transform=get_transforms(train=True))
-    val_ds = datasets.ImageFolder(val_dir, transform=get_transforms(train=False))
+    train_ds, val_ds = make_datasets(data_dir, packed_dir)
 
     num_classes = len(train_ds.classes)
     print("Detected classes:", num_classes)
 
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, num_workers=num_workers)
-    val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    # packed datasets return ready-made batches
+    collate = getattr(train_ds, "collate_fn", None)
+    pin = device.type == "cuda"
+    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, num_workers=num_workers,
+                              collate_fn=collate, pin_memory=pin)
+    val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False, num_workers=num_workers,
+                            collate_fn=collate, pin_memory=pin)
 
     model = build_model(num_classes)
-    criterion = nn.CrossEntropyLoss()
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
-
-    best_val_acc = 0.0
-    for epoch in range(1, epochs + 1):
-        model.train()
-        running_loss = 0.0
-        correct = 0
-        total = 0
-        for imgs, labels in train_loader:
-            imgs, labels = imgs.to(device), labels.to(device)
-            optimizer.zero_grad()
-            outputs = model(imgs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-
-            running_loss += float(loss.item()) * imgs.size(0)
-            _, preds = torch.max(outputs, 1)
-            correct += (preds == labels).sum().item()
-            total += labels.size(0)
-
-        train_loss = running_loss / total
-        train_acc = correct / total
-
-        # Validation
-        model.eval()
-        val_correct = 0
-        val_total = 0
-        with torch.no_grad():
-            for imgs, labels in val_loader:
-                imgs, labels = imgs.to(device), labels.to(device)
-                outputs = model(imgs)
-                _, preds = torch.max(outputs, 1)
-                val_correct += (preds == labels).sum().item()
-                val_total += labels.size(0)
-        val_acc = val_correct / val_total
-
-        print(f"Epoch {epoch}/{epochs} - train_loss: {train_loss:.4f}, train_acc: {train_acc:.4f}, val_acc: {val_acc:.4f}")
-
-        # Save best
-        if val_acc > best_val_acc:
-            best_val_acc = val_acc
-            torch.save({
-                "model_state": model.state_dict(),
-                "classes": train_ds.classes
-            }, MODEL_PATH)
-            # also save labels
-            json.dump({"classes": train_ds.classes}, open(LABELS_PATH, "w"), indent=2)
-            print("Saved best model.")
 
-    print("Training finished. Best val acc:", best_val_acc)
+    def save_best(model, epoch, val_acc):
+        torch.save({
+            "model_state": model.state_dict(),
+            "classes": train_ds.classes
+        }, MODEL_PATH)
+        # also save labels
+        json.dump({"classes": train_ds.classes}, open(LABELS_PATH, "w"), indent=2)
+        print("Saved best model.")
+
+    config = TrainConfig(
+        epochs=epochs, lr=lr, amp=amp, channels_last=channels_last, accum_steps=accum_steps,
+        scheduler=scheduler,
+        checkpoint_path=str(checkpoint_path or MODEL_DIR / "disease_train_ckpt.pt"),
+        checkpoint_every=checkpoint_every, resume=resume,
+        log_path=str(MODEL_DIR / "disease_train_log.jsonl"),
+    )
+    history = fit(model, train_loader, val_loader, device, config, on_best=save_best,
+                  extra_state={"classes": train_ds.classes})
+
+    print("Training finished. Best val acc:", max((h["val_acc"] for h in history), default=0.0))
     return MODEL_PATH
 
 def load_model(path=None):
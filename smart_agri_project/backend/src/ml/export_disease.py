@@ -0,0 +1,184 @@
+# export_disease.py
+# Produce CPU-optimized serving artifacts from disease_resnet18.pth:
+#   - disease_resnet18_fp32.ts : TorchScript-traced, frozen float32 model
+#   - disease_resnet18_int8.ts : statically int8-quantized (fused conv+bn+relu), TorchScript-traced
+#   - disease_export_report.json : top-1 accuracy / latency of every variant on the test split, and
+#     the sha256 of the .pth they were exported from (the server ignores exports of an older .pth)
+# Run from backend/:  python src/ml/export_disease.py --processed_dir data/processed/disease
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Subset
+from torchvision import datasets, models, transforms
+from torchvision.models.quantization import resnet18 as quantizable_resnet18
+
+MODEL_DIR = Path(__file__).resolve().parents[2] / "data" / "models"
+MODEL_PATH = MODEL_DIR / "disease_resnet18.pth"
+LABELS_PATH = MODEL_DIR / "disease_labels.json"
+FP32_TS_PATH = MODEL_DIR / "disease_resnet18_fp32.ts"
+INT8_TS_PATH = MODEL_DIR / "disease_resnet18_int8.ts"
+REPORT_PATH = MODEL_DIR / "disease_export_report.json"
+
+IMG_SIZE = 224
+
+eval_transform = transforms.Compose([
+    transforms.Resize((IMG_SIZE, IMG_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+])
+
+
+def _state_dict(path=MODEL_PATH):
+    checkpoint = torch.load(path, map_location="cpu")
+    if isinstance(checkpoint, dict) and "model_state" in checkpoint:
+        return checkpoint["model_state"]
+    return checkpoint
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _num_classes():
+    with open(LABELS_PATH, "r") as f:
+        return len(json.load(f)["classes"])
+
+
+def load_float_model(num_classes):
+    model = models.resnet18(weights=None)
+    model.fc = nn.Linear(512, num_classes)
+    model.load_state_dict(_state_dict())
+    return model.eval()
+
+
+def export_torchscript_fp32(model):
+    example = torch.randn(1, 3, IMG_SIZE, IMG_SIZE)
+    with torch.no_grad():
+        # frozen (weights inlined as constants); optimize_for_inference output does not reload
+        traced = torch.jit.freeze(torch.jit.trace(model, example))
+    traced.save(str(FP32_TS_PATH))
+    return traced
+
+
+def export_int8(num_classes, calib_loader, engine, calib_batches):
+    """
+    Post-training static quantization: fuse conv/bn/relu, observe activations on a few
+    calibration batches, convert to int8 kernels, then trace for serving.
+    """
+    torch.backends.quantized.engine = engine
+    model = quantizable_resnet18(weights=None, quantize=False)
+    model.fc = nn.Linear(512, num_classes)
+    model.load_state_dict(_state_dict())
+    model.eval()
+    model.fuse_model(is_qat=False)
+    model.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+    torch.ao.quantization.prepare(model, inplace=True)
+
+    with torch.no_grad():
+        for i, (imgs, _) in enumerate(calib_loader):
+            if i >= calib_batches:
+                break
+            model(imgs)
+
+    torch.ao.quantization.convert(model, inplace=True)
+    example = torch.randn(1, 3, IMG_SIZE, IMG_SIZE)
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, example))
+    traced.save(str(INT8_TS_PATH))
+    return traced
+
+
+def evaluate(model, loader):
+    correct = torch.zeros((), dtype=torch.long)
+    total = 0
+    with torch.no_grad():
+        for imgs, labels in loader:
+            preds = model(imgs).argmax(dim=1)
+            correct += (preds == labels).sum()
+            total += labels.size(0)
+    return correct.item() / max(total, 1), total
+
+
+def latency_ms(model, batch_size, repeat=20):
+    x = torch.randn(batch_size, 3, IMG_SIZE, IMG_SIZE)
+    with torch.no_grad():
+        for _ in range(3):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model(x)
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def export(processed_dir, engine="x86", calib_batches=10, batch_size=32, max_eval_images=None, num_threads=None):
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    processed_dir = Path(processed_dir)
+    num_classes = _num_classes()
+
+    calib_ds = datasets.ImageFolder(processed_dir / "train", transform=eval_transform)
+    test_ds = datasets.ImageFolder(processed_dir / "test", transform=eval_transform)
+    if max_eval_images:
+        test_ds = Subset(test_ds, range(min(max_eval_images, len(test_ds))))
+    calib_loader = DataLoader(calib_ds, batch_size=batch_size, shuffle=True,
+                              generator=torch.Generator().manual_seed(42))
+    test_loader = DataLoader(test_ds, batch_size=batch_size, shuffle=False)
+
+    source_sha256 = file_sha256(MODEL_PATH)
+    float_model = load_float_model(num_classes)
+    print("Exporting TorchScript fp32 ->", FP32_TS_PATH)
+    fp32_ts = export_torchscript_fp32(float_model)
+    print(f"Quantizing to int8 ({engine}, {calib_batches} calibration batches) ->", INT8_TS_PATH)
+    int8_ts = export_int8(num_classes, calib_loader, engine, calib_batches)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": MODEL_PATH.name,
+        "source_sha256": source_sha256,
+        "quantized_engine": engine,
+        "calibration_batches": calib_batches,
+        "num_threads": torch.get_num_threads(),
+        "variants": {}
+    }
+    for name, model, path in [("eager_fp32", float_model, MODEL_PATH),
+                              ("torchscript_fp32", fp32_ts, FP32_TS_PATH),
+                              ("torchscript_int8", int8_ts, INT8_TS_PATH)]:
+        acc, n = evaluate(model, test_loader)
+        report["variants"][name] = {
+            "path": str(path.name),
+            "size_mb": round(path.stat().st_size / 1e6, 2),
+            "top1": round(acc, 4),
+            "latency_ms_bs1": round(latency_ms(model, 1), 2),
+            "latency_ms_bs16": round(latency_ms(model, 16, repeat=5), 2),
+        }
+        print(f"{name}: top1={acc:.4f} on {n} images", report["variants"][name])
+
+    base = report["variants"]["eager_fp32"]["top1"]
+    report["int8_top1_drop"] = round(base - report["variants"]["torchscript_int8"]["top1"], 4)
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Report written to", REPORT_PATH)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processed_dir", type=str, default="data/processed/disease")
+    parser.add_argument("--engine", type=str, default="x86", help="quantized backend: x86, fbgemm or qnnpack")
+    parser.add_argument("--calib_batches", type=int, default=10)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_eval_images", type=int, default=None)
+    parser.add_argument("--num_threads", type=int, default=None)
+    args = parser.parse_args()
+
+    export(args.processed_dir, engine=args.engine, calib_batches=args.calib_batches,
+           batch_size=args.batch_size, max_eval_images=args.max_eval_images, num_threads=args.num_threads)
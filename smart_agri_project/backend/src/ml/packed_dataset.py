@@ -0,0 +1,226 @@
+# packed_dataset.py
+# Pre-decoded disease dataset: every image of a split decoded once into one uint8 .npy array
+# (N, 3, 224, 224) that training reads through np.memmap, so epochs never touch PIL again.
+#
+#   data/processed/disease/packed/<split>_images.npy   uint8, NCHW
+#   data/processed/disease/packed/<split>_labels.npy   int64
+#   data/processed/disease/packed/<split>_index.json   classes, files, shape, source fingerprint
+#
+# The fingerprint hashes the name, size and mtime of every source image, so ensure_packed()
+# repacks a split whenever preprocessing adds, removes or rewrites images.
+#
+# Build from backend/:  python src/ml/packed_dataset.py --processed_dir data/processed/disease
+import argparse
+import hashlib
+import json
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torch.utils.data import Dataset
+from typing import List
+
+IMG_SIZE = 224
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+
+
+def _scan(split_dir: Path):
+    """(path, class index) pairs in ImageFolder order, plus the class list."""
+    classes = sorted(d.name for d in split_dir.iterdir() if d.is_dir())
+    samples = []
+    for idx, cls in enumerate(classes):
+        for p in sorted((split_dir / cls).iterdir()):
+            if p.suffix.lower() in IMAGE_EXTENSIONS:
+                samples.append((p, idx))
+    return samples, classes
+
+
+def source_fingerprint(split_dir: Path, samples=None) -> str:
+    """Hash of the split's image names, sizes and mtimes (stat only, nothing is decoded)."""
+    split_dir = Path(split_dir)
+    if samples is None:
+        samples, _ = _scan(split_dir)
+    h = hashlib.blake2b(digest_size=16)
+    for path, label in samples:
+        st = path.stat()
+        h.update(f"{path.relative_to(split_dir).as_posix()}\0{label}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def pack_split(processed_dir, split: str, out_dir=None, img_size: int = IMG_SIZE) -> dict:
+    """Decode one split into <split>_images.npy / _labels.npy / _index.json."""
+    processed_dir = Path(processed_dir)
+    out_dir = Path(out_dir) if out_dir else processed_dir / "packed"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    samples, classes = _scan(processed_dir / split)
+
+    images_path = out_dir / f"{split}_images.npy"
+    tmp_path = out_dir / f"{split}_images.tmp.npy"
+    images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8,
+                                       shape=(len(samples), 3, img_size, img_size))
+    labels = np.empty(len(samples), dtype=np.int64)
+    files = []
+    start = time.perf_counter()
+    for i, (path, label) in enumerate(samples):
+        with Image.open(path) as im:
+            im.draft("RGB", (img_size, img_size))
+            im = im.convert("RGB")
+            if im.size != (img_size, img_size):
+                im = im.resize((img_size, img_size))
+            images[i] = np.asarray(im).transpose(2, 0, 1)
+        labels[i] = label
+        files.append(str(path.relative_to(processed_dir / split)))
+    images.flush()
+    del images
+    tmp_path.replace(images_path)
+    np.save(out_dir / f"{split}_labels.npy", labels)
+
+    index = {"split": split, "count": len(samples), "shape": [3, img_size, img_size],
+             "classes": classes, "files": files,
+             "source": source_fingerprint(processed_dir / split, samples)}
+    with open(out_dir / f"{split}_index.json", "w") as f:
+        json.dump(index, f)
+    print(f"Packed {split}: {len(samples)} images in {time.perf_counter() - start:.1f}s -> {images_path}")
+    return index
+
+
+def pack_dataset(processed_dir, out_dir=None, splits=("train", "val", "test")):
+    processed_dir = Path(processed_dir)
+    return {s: pack_split(processed_dir, s, out_dir) for s in splits if (processed_dir / s).is_dir()}
+
+
+def is_stale(processed_dir, split: str, out_dir=None, img_size: int = IMG_SIZE) -> bool:
+    """True when the split has no packed arrays or its images changed since they were packed."""
+    processed_dir = Path(processed_dir)
+    out_dir = Path(out_dir) if out_dir else processed_dir / "packed"
+    try:
+        with open(out_dir / f"{split}_index.json", "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return True
+    return (index.get("shape") != [3, img_size, img_size]
+            or not (out_dir / f"{split}_images.npy").exists()
+            or index.get("source") != source_fingerprint(processed_dir / split))
+
+
+def ensure_packed(processed_dir, out_dir=None, splits=("train", "val", "test")) -> List[str]:
+    """Pack the splits that are missing or stale; returns the splits that were (re)packed."""
+    processed_dir = Path(processed_dir)
+    repacked = []
+    for s in splits:
+        if (processed_dir / s).is_dir() and is_stale(processed_dir, s, out_dir):
+            pack_split(processed_dir, s, out_dir)
+            repacked.append(s)
+    return repacked
+
+
+def random_affine_batch(x: torch.Tensor,
+                        scale=(0.08, 1.0),
+                        ratio=(3.0 / 4.0, 4.0 / 3.0),
+                        degrees: float = 15.0,
+                        generator: torch.Generator = None) -> torch.Tensor:
+    """
+    Batched version of RandomResizedCrop + RandomHorizontalFlip + RandomRotation(15)
+    (disease_model.get_transforms(train=True)) for a float NCHW batch.
+    Crop, flip and rotation are folded into one affine matrix per sample and applied with a
+    single grid_sample call, instead of three PIL operations per image.
+    """
+    n, _, h, w = x.shape
+    rand = lambda *shape: torch.rand(*shape, generator=generator)
+
+    # crop size as a fraction of the image (RandomResizedCrop's area / log-aspect sampling)
+    area = scale[0] + (scale[1] - scale[0]) * rand(n)
+    log_r = torch.log(torch.tensor(ratio))
+    aspect = torch.exp(log_r[0] + (log_r[1] - log_r[0]) * rand(n))
+    cw = torch.sqrt(area * aspect).clamp(max=1.0)
+    ch = torch.sqrt(area / aspect).clamp(max=1.0)
+    # crop centre in normalized [-1, 1] coordinates, crop kept inside the image
+    cx = (1 - cw) * (2 * rand(n) - 1)
+    cy = (1 - ch) * (2 * rand(n) - 1)
+
+    flip = torch.where(rand(n) < 0.5, -1.0, 1.0)
+    angle = torch.deg2rad((2 * rand(n) - 1) * degrees)
+    cos, sin = torch.cos(angle), torch.sin(angle)
+
+    # input = centre + diag(cw, ch) @ diag(flip, 1) @ R(-angle) @ output
+    theta = torch.empty(n, 2, 3)
+    theta[:, 0, 0] = cw * flip * cos
+    theta[:, 0, 1] = cw * flip * sin
+    theta[:, 1, 0] = -ch * sin
+    theta[:, 1, 1] = ch * cos
+    theta[:, 0, 2] = cx
+    theta[:, 1, 2] = cy
+    grid = F.affine_grid(theta.to(x.dtype), list(x.shape), align_corners=False)
+    return F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+
+
+class PackedImageDataset(Dataset):
+    """
+    Reads samples straight out of the memory-mapped array.
+    DataLoader fetches whole batches through __getitems__: one sorted gather from the memmap,
+    then augmentation and normalization on the batch tensor. Use `collate_fn` with the
+    DataLoader, since batches come back already stacked.
+    """
+
+    def __init__(self, packed_dir, split: str, train: bool = False):
+        packed_dir = Path(packed_dir)
+        with open(packed_dir / f"{split}_index.json", "r") as f:
+            self.index = json.load(f)
+        self.classes = self.index["classes"]
+        self.images_path = packed_dir / f"{split}_images.npy"
+        self.labels = torch.from_numpy(np.load(packed_dir / f"{split}_labels.npy"))
+        self.train = train
+        self._images = None
+
+    @property
+    def images(self) -> np.ndarray:
+        # opened lazily so each DataLoader worker maps the file itself instead of pickling it
+        if self._images is None:
+            self._images = np.load(self.images_path, mmap_mode="r")
+        return self._images
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _prepare(self, batch: torch.Tensor) -> torch.Tensor:
+        x = batch.float().div_(255.0)
+        if self.train:
+            x = random_affine_batch(x)
+        return x.sub_(MEAN).div_(STD)
+
+    def __getitem__(self, i):
+        with warnings.catch_warnings():
+            # the mapping is read-only; the view is only read, never written in place
+            warnings.simplefilter("ignore", UserWarning)
+            img = torch.from_numpy(self.images[i])
+        return self._prepare(img.unsqueeze(0))[0], self.labels[i]
+
+    def __getitems__(self, indices: List[int]):
+        idx = np.asarray(indices)
+        order = np.argsort(idx)
+        # sorted reads walk the file forwards; put the batch back in sampler order afterwards
+        batch = np.empty((len(idx),) + self.images.shape[1:], dtype=np.uint8)
+        batch[order] = self.images[idx[order]]
+        return self._prepare(torch.from_numpy(batch)), self.labels[idx]
+
+    @staticmethod
+    def collate_fn(batch):
+        return batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processed_dir", type=str, default="data/processed/disease")
+    parser.add_argument("--out_dir", type=str, default=None, help="default: <processed_dir>/packed")
+    parser.add_argument("--force", action="store_true", help="repack splits that are up to date too")
+    args = parser.parse_args()
+    if args.force:
+        pack_dataset(args.processed_dir, args.out_dir)
+    else:
+        print("Repacked:", ensure_packed(args.processed_dir, args.out_dir) or "nothing, all splits up to date")
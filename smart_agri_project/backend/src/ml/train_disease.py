@@ -10,8 +10,30 @@ if __name__ == "__main__":
     parser.add_argument("--epochs", type=int, default=6)
     parser.add_argument("--batch_size", type=int, default=32)
     parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--num_workers", type=int, default=4)
+    parser.add_argument("--packed", action="store_true",
+                        help="read pre-decoded memmap arrays (rebuilt when the images change) instead of JPEG files")
+    parser.add_argument("--amp", choices=["none", "bf16"], default="none",
+                        help="bfloat16 autocast (CPU or CUDA)")
+    parser.add_argument("--channels_last", action="store_true")
+    parser.add_argument("--accum_steps", type=int, default=1,
+                        help="gradient accumulation; effective batch = batch_size * accum_steps")
+    parser.add_argument("--scheduler", choices=["cosine", "none"], default="cosine")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                        help="full training checkpoint (default: data/models/disease_train_ckpt.pt)")
+    parser.add_argument("--checkpoint_every", type=int, default=1, help="epochs between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint")
     args = parser.parse_args()
 
     processed_dir = Path(args.processed_dir)
     print("Training with processed dir:", processed_dir)
-    train_model(processed_dir, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr)
+    packed_dir = None
+    if args.packed:
+        packed_dir = processed_dir / "packed"
+        from packed_dataset import ensure_packed
+        ensure_packed(processed_dir, packed_dir, splits=("train", "val"))
+    train_model(processed_dir, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+                num_workers=args.num_workers, packed_dir=packed_dir,
+                amp=args.amp, channels_last=args.channels_last, accum_steps=args.accum_steps,
+                scheduler=args.scheduler, checkpoint_path=args.checkpoint,
+                checkpoint_every=args.checkpoint_every, resume=args.resume)
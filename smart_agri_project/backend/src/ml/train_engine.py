@@ -0,0 +1,200 @@
+# train_engine.py
+# Generic epoch loop used by disease_model.train_model:
+#   - optional bfloat16 autocast (CPU or CUDA; bf16 needs no loss scaling)
+#   - channels_last memory format for model and inputs
+#   - gradient accumulation (effective batch = batch_size * accum_steps)
+#   - cosine LR schedule over optimizer steps
+#   - loss / accuracy accumulated on-device, synchronized once per epoch
+#   - full checkpoints (model, optimizer, scheduler, epoch, RNG states) for resume=True
+#   - per-epoch throughput (images/sec) printed and appended to a JSONL log
+import json
+import math
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+@dataclass
+class TrainConfig:
+    epochs: int = 5
+    lr: float = 1e-4
+    amp: str = "none"                 # "none" or "bf16"
+    channels_last: bool = False
+    accum_steps: int = 1
+    scheduler: str = "cosine"         # "cosine" or "none"
+    checkpoint_path: Optional[str] = None
+    checkpoint_every: int = 1         # epochs
+    resume: bool = False
+    log_path: Optional[str] = None
+
+
+def _rng_state() -> Dict:
+    state = {
+        "torch": torch.get_rng_state(),
+        "numpy": np.random.get_state(),
+        "python": random.getstate(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def _set_rng_state(state: Dict):
+    torch.set_rng_state(state["torch"])
+    np.random.set_state(state["numpy"])
+    random.setstate(state["python"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+def save_checkpoint(path, **state):
+    """Write to a temp file and rename, so a kill during the save keeps the previous checkpoint."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, device):
+    # the checkpoint holds optimizer state and RNG objects, not only tensors
+    return torch.load(path, map_location=device, weights_only=False)
+
+
+def _autocast(device: torch.device, amp: str):
+    return torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=(amp == "bf16"))
+
+
+def _to(x: torch.Tensor, device, channels_last: bool) -> torch.Tensor:
+    if channels_last and x.dim() == 4:
+        return x.to(device, memory_format=torch.channels_last, non_blocking=True)
+    return x.to(device, non_blocking=True)
+
+
+def evaluate(model, loader, device, amp: str = "none", channels_last: bool = False) -> float:
+    model.eval()
+    correct = torch.zeros((), dtype=torch.long, device=device)
+    total = 0
+    with torch.no_grad(), _autocast(device, amp):
+        for imgs, labels in loader:
+            imgs, labels = _to(imgs, device, channels_last), labels.to(device, non_blocking=True)
+            correct += (model(imgs).argmax(dim=1) == labels).sum()
+            total += labels.size(0)
+    return correct.item() / max(total, 1)
+
+
+def fit(model: nn.Module,
+        train_loader,
+        val_loader,
+        device: torch.device,
+        config: TrainConfig,
+        on_best: Optional[Callable[[nn.Module, int, float], None]] = None,
+        extra_state: Optional[Dict] = None) -> List[Dict]:
+    """
+    Train `model` and return per-epoch history. `on_best(model, epoch, val_acc)` is called
+    whenever validation accuracy improves (e.g. to export the serving checkpoint).
+    """
+    accum = max(1, config.accum_steps)
+    if config.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=config.lr)
+    steps_per_epoch = math.ceil(len(train_loader) / accum)
+    scheduler = None
+    if config.scheduler == "cosine":
+        scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, steps_per_epoch * config.epochs))
+
+    start_epoch = 1
+    best_val_acc = 0.0
+    history: List[Dict] = []
+    if config.resume and config.checkpoint_path and Path(config.checkpoint_path).exists():
+        ckpt = load_checkpoint(config.checkpoint_path, device)
+        model.load_state_dict(ckpt["model_state"])
+        optimizer.load_state_dict(ckpt["optimizer_state"])
+        if scheduler is not None and ckpt.get("scheduler_state"):
+            scheduler.load_state_dict(ckpt["scheduler_state"])
+        _set_rng_state(ckpt["rng"])
+        start_epoch = ckpt["epoch"] + 1
+        best_val_acc = ckpt.get("best_val_acc", 0.0)
+        history = ckpt.get("history", [])
+        print(f"Resumed from {config.checkpoint_path} at epoch {start_epoch}")
+    elif config.resume:
+        print("No checkpoint to resume from, starting fresh")
+
+    for epoch in range(start_epoch, config.epochs + 1):
+        model.train()
+        loss_sum = torch.zeros((), device=device)
+        correct = torch.zeros((), dtype=torch.long, device=device)
+        seen = 0
+        optimizer.zero_grad(set_to_none=True)
+        start = time.perf_counter()
+
+        for i, (imgs, labels) in enumerate(train_loader, 1):
+            imgs, labels = _to(imgs, device, config.channels_last), labels.to(device, non_blocking=True)
+            with _autocast(device, config.amp):
+                outputs = model(imgs)
+                loss = criterion(outputs, labels)
+            (loss / accum).backward()
+            if i % accum == 0 or i == len(train_loader):
+                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+                if scheduler is not None:
+                    scheduler.step()
+
+            # no .item() here: stays on device until the end of the epoch
+            loss_sum += loss.detach().float() * labels.size(0)
+            correct += (outputs.detach().argmax(dim=1) == labels).sum()
+            seen += labels.size(0)
+
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        train_seconds = time.perf_counter() - start
+        val_acc = evaluate(model, val_loader, device, config.amp, config.channels_last)
+
+        record = {
+            "epoch": epoch,
+            "train_loss": loss_sum.item() / max(seen, 1),
+            "train_acc": correct.item() / max(seen, 1),
+            "val_acc": val_acc,
+            "lr": optimizer.param_groups[0]["lr"],
+            "images_per_sec": seen / train_seconds if train_seconds > 0 else None,
+            "train_seconds": round(train_seconds, 3),
+            "amp": config.amp,
+            "channels_last": config.channels_last,
+            "effective_batch": (train_loader.batch_size or 0) * accum,
+        }
+        history.append(record)
+        print(f"Epoch {epoch}/{config.epochs} - train_loss: {record['train_loss']:.4f}, "
+              f"train_acc: {record['train_acc']:.4f}, val_acc: {val_acc:.4f}, "
+              f"{record['images_per_sec']:.1f} images/sec")
+        if config.log_path:
+            with open(config.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            if on_best is not None:
+                on_best(model, epoch, val_acc)
+
+        if config.checkpoint_path and (epoch % config.checkpoint_every == 0 or epoch == config.epochs):
+            save_checkpoint(
+                config.checkpoint_path,
+                model_state=model.state_dict(),
+                optimizer_state=optimizer.state_dict(),
+                scheduler_state=scheduler.state_dict() if scheduler is not None else None,
+                epoch=epoch,
+                best_val_acc=best_val_acc,
+                rng=_rng_state(),
+                history=history,
+                config=asdict(config),
+                **(extra_state or {})
+            )
+
+    return history
@@ -0,0 +1,114 @@
+# yield_encoder.py
+# Precompiled feature encoder for the yield model.
+# Built once from the fitted column list (scaler/model feature_names_in_), it replaces the
+# per-request DataFrame + pd.get_dummies + reindex + scaler.transform pipeline with direct
+# writes into a NumPy row. StandardScaler mean/scale are folded into the fill step.
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+CATEGORICAL_MAP_FIELDS = ("crop", "season")
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+class YieldFeatureEncoder:
+    """
+    Encodes yield input dicts into the model's (n, d) feature matrix.
+
+    - Columns present verbatim in the fitted column list are numeric slots.
+    - `crop` / `season` strings are mapped through the lookup tables first (unknown -> NaN).
+    - Other strings set the matching get_dummies column `<field>_<value>` to 1.
+    - Inputs given as None are NaN. Absent inputs named in `nan_when_absent` are NaN too (the
+      pandas path starts its row from EXPECTED_FEATURES set to NaN); any other absent column,
+      one-hot columns included, is 0 (like the reindex fill).
+    """
+
+    def __init__(self,
+                 columns: List[str],
+                 scaler=None,
+                 category_maps: Optional[Dict[str, Dict[str, int]]] = None,
+                 nan_when_absent: Iterable[str] = ()):
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.category_maps = {k: dict(v) for k, v in (category_maps or {}).items()}
+
+        # one-hot lookup: field -> {category value: column index}
+        # every "_" split is registered; only real input fields are ever looked up
+        self.onehot: Dict[str, Dict[str, int]] = {}
+        for i, col in enumerate(self.columns):
+            for pos, ch in enumerate(col):
+                if ch == "_" and 0 < pos < len(col) - 1:
+                    self.onehot.setdefault(col[:pos], {})[col[pos + 1:]] = i
+
+        d = len(self.columns)
+        self._scaler = None
+        mean = np.zeros(d)
+        scale = np.ones(d)
+        if scaler is not None:
+            if hasattr(scaler, "scale_") or hasattr(scaler, "mean_"):
+                if getattr(scaler, "mean_", None) is not None:
+                    mean = np.asarray(scaler.mean_, dtype=np.float64)
+                if getattr(scaler, "scale_", None) is not None:
+                    scale = np.asarray(scaler.scale_, dtype=np.float64)
+            else:
+                # unknown scaler type: apply it after encoding
+                self._scaler = scaler
+        self._mean = mean
+        self._inv_scale = 1.0 / scale
+        # encoding of the empty input (zeros, NaN for nan_when_absent); every input starts from this
+        base = np.zeros(d)
+        base[[self.index[c] for c in nan_when_absent if c in self.index]] = np.nan
+        self._base = (base - mean) * self._inv_scale
+
+    def _fill(self, row: np.ndarray, data: Dict[str, Any]):
+        index = self.index
+        for key, value in data.items():
+            if key in self.category_maps and isinstance(value, str):
+                mapped = self.category_maps[key].get(value.strip().lower())
+                if key in index:
+                    i = index[key]
+                    row[i] = np.nan if mapped is None else (mapped - self._mean[i]) * self._inv_scale[i]
+                    continue
+
+            if key in index:
+                num = None if value is None else _as_number(value)
+                if num is not None or value is None:
+                    i = index[key]
+                    num = np.nan if num is None else num
+                    row[i] = (num - self._mean[i]) * self._inv_scale[i]
+                    continue
+
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            cats = self.onehot.get(key)
+            if cats is not None:
+                i = cats.get(value if isinstance(value, str) else str(value))
+                if i is not None:
+                    row[i] = (1.0 - self._mean[i]) * self._inv_scale[i]
+
+    def encode(self, data: Dict[str, Any]) -> np.ndarray:
+        """Encode one input dict into a (1, d) matrix."""
+        row = self._base.copy()
+        self._fill(row, data)
+        X = row.reshape(1, -1)
+        return self._scaler.transform(X) if self._scaler is not None else X
+
+    def encode_many(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """Encode many input dicts into an (n, d) matrix."""
+        X = np.tile(self._base, (len(records), 1))
+        for row, data in zip(X, records):
+            self._fill(row, data)
+        return self._scaler.transform(X) if self._scaler is not None else X
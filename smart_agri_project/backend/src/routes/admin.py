@@ -0,0 +1,91 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+
+from src.config.settings import settings
+from src.services.model_registry import registry
+from src.services.model_store import store
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+router = APIRouter(prefix="/admin/models", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+class PinRequest(BaseModel):
+    version: str
+
+
+def _known(name: str):
+    if name not in registry.names():
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+
+
+def _describe(name: str):
+    return {
+        "served": registry.status()[name],
+        "pinned": store.pinned(name),
+        "versions": store.versions(name)
+    }
+
+
+async def _reload(name: str) -> bool:
+    """Swap the newly selected version in now instead of waiting for the watcher."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, registry.reload, name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous version still served: {e}")
+
+
+@router.get("")
+async def list_models():
+    """
+    Served version and state of every model, plus the published versions and pin.
+    """
+    return {name: _describe(name) for name in registry.names()}
+
+
+@router.get("/{name}")
+async def get_model(name: str):
+    _known(name)
+    return _describe(name)
+
+
+@router.post("/{name}/pin")
+async def pin_version(name: str, body: PinRequest):
+    """
+    Serve a specific published version (e.g. to roll back) until unpinned.
+    """
+    _known(name)
+    try:
+        store.pin(name, body.version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    swapped = await _reload(name)
+    return {"pinned": body.version, "swapped": swapped, **_describe(name)}
+
+
+@router.delete("/{name}/pin")
+async def unpin_version(name: str):
+    """
+    Go back to serving the newest published version.
+    """
+    _known(name)
+    store.unpin(name)
+    swapped = await _reload(name)
+    return {"pinned": None, "swapped": swapped, **_describe(name)}
+
+
+@router.post("/{name}/reload")
+async def reload_model(name: str):
+    """
+    Check for a new version right away.
+    """
+    _known(name)
+    swapped = await _reload(name)
+    return {"swapped": swapped, **_describe(name)}
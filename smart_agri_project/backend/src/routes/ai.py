@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
-from src.services.ai_service import generate_recommendation
+from src.services.ai_service import recommendation_client
 
 router = APIRouter(prefix="/ai", tags=["AI Recommendations"])
 
@@ -14,9 +14,10 @@ class AIRequest(BaseModel):
 async def get_recommendation(request: AIRequest):
     """
     Get an AI-generated recommendation based on the prediction context.
+    The LLM call runs off the event loop with a bounded concurrency and timeout.
     """
     try:
-        recommendation = generate_recommendation(request.dict())
+        recommendation = await recommendation_client.recommend(request.dict())
         return {"recommendation": recommendation}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+
+from src.routes.admin import require_admin
+from src.services import analytics_service
+from src.services.sensor_service import parse_timestamp
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def _range(since: Optional[str], until: Optional[str]):
+    try:
+        return (parse_timestamp(since) if since else None,
+                parse_timestamp(until) if until else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e}")
+
+
+@router.get("/disease/daily", summary="Disease class counts and mean confidence per day")
+async def disease_daily(since: Optional[str] = None,
+                        until: Optional[str] = None,
+                        predicted_class: Optional[str] = None):
+    start, end = _range(since, until)
+    return {"days": await analytics_service.disease_daily(start, end, predicted_class)}
+
+
+@router.get("/irrigation/recommendations", summary="Irrigation recommendation distribution per sensor")
+async def irrigation_recommendations(since: Optional[str] = None,
+                                     until: Optional[str] = None,
+                                     sensor_id: Optional[str] = None):
+    """Predictions made without a sensor_id are grouped under sensor "none"."""
+    start, end = _range(since, until)
+    return {"sensors": await analytics_service.irrigation_by_sensor(start, end, sensor_id)}
+
+
+@router.get("/yield/percentiles", summary="Predicted yield percentiles per crop and season")
+async def yield_percentiles(since: Optional[str] = None,
+                            until: Optional[str] = None,
+                            crop: Optional[str] = None,
+                            season: Optional[str] = None,
+                            q: str = Query("10,50,90", description="Comma-separated percentiles (0-100)")):
+    start, end = _range(since, until)
+    try:
+        qs = [float(x) for x in q.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid percentiles: {q}")
+    if not qs or any(not 0 <= x <= 100 for x in qs):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100.")
+    return {"groups": await analytics_service.yield_percentiles(start, end, crop, season, qs)}
+
+
+@router.post("/rebuild", dependencies=[Depends(require_admin)], summary="Recompute summaries from raw predictions")
+async def rebuild_summaries(since: Optional[str] = None):
+    """
+    Backfill / repair: recompute every summary bucket from `since` (default: all history)
+    with aggregation pipelines over the raw prediction collections.
+    """
+    start, _ = _range(since, None)
+    return {"buckets": await analytics_service.rebuild(start)}
@@ -1,48 +1,186 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-import os
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from typing import List, Tuple
+import asyncio
+import json
 import uuid
+import zipfile
 
-from src.services.disease_service import predict_disease
+from src.config.settings import settings
 from src.services import db_service
+from src.services.inference_pool import PoolSaturatedError, torch_pool
 
 router = APIRouter(prefix="/predict/disease", tags=["Disease Prediction"])
 
-UPLOAD_DIR = "temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+def _service():
+    # imported on first use so that loading src.main does not pull in torch
+    from src.services import disease_service
+    return disease_service
 
 
 @router.post("/")
 async def predict_leaf_disease(file: UploadFile = File(...)):
     """
     Predict crop disease from an uploaded leaf image.
-    Saves result to MongoDB.
+    The upload is decoded in memory (never written to disk).
+    Queues the result for MongoDB; db_id is assigned up front.
     """
     if file.content_type not in ["image/jpeg", "image/png"]:
         raise HTTPException(status_code=400, detail="Invalid image format. Upload JPG or PNG.")
 
-    # Save temporary image
     file_id = f"{uuid.uuid4()}_{file.filename}"
-    temp_path = os.path.join(UPLOAD_DIR, file_id)
-
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
 
     try:
-        result = predict_disease(temp_path)
+        # UploadFile.file is a SpooledTemporaryFile: small uploads stay in RAM
+        result = await _service().predict_disease_async(file.file)
 
         # Store in DB
         db_doc = {
             "image_name": file_id,
             "predicted_class": result["predicted_class"],
             "confidence": result["confidence"],
+            "model_version": result.get("model_version"),
             "meta": {"original_filename": file.filename}
         }
-        inserted_id = await db_service.insert_disease_prediction(db_doc)
-        result["db_id"] = inserted_id
+        result["db_id"] = db_service.prediction_queue.enqueue("disease_predictions", db_doc)
 
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        os.remove(temp_path)
+        await file.close()
 
     return result
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def _is_zip(upload: UploadFile) -> bool:
+    return (upload.content_type in ("application/zip", "application/x-zip-compressed")
+            or (upload.filename or "").lower().endswith(".zip"))
+
+
+class _Budget:
+    """Image count and uncompressed bytes still allowed in one bulk request."""
+
+    def __init__(self):
+        self.images = settings.DISEASE_BULK_MAX_IMAGES
+        self.bytes = settings.DISEASE_BULK_MAX_TOTAL_BYTES
+
+    def take(self, name: str, size: int):
+        # checked before anything is read or decompressed
+        if self.images <= 0:
+            raise HTTPException(status_code=413, detail=f"Too many images (max {settings.DISEASE_BULK_MAX_IMAGES}).")
+        if size > settings.DISEASE_BULK_MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image too large: {name} "
+                                                        f"(max {settings.DISEASE_BULK_MAX_IMAGE_BYTES} bytes).")
+        if size > self.bytes:
+            raise HTTPException(status_code=413, detail=f"Upload too large (max {settings.DISEASE_BULK_MAX_TOTAL_BYTES} "
+                                                        "bytes uncompressed).")
+        self.images -= 1
+        self.bytes -= size
+
+
+def _extract_zip(upload: UploadFile, budget: _Budget) -> List[Tuple[str, bytes]]:
+    """Read the image entries of a zip upload (blocking: runs on a worker thread)."""
+    sources = []
+    try:
+        with zipfile.ZipFile(upload.file) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                budget.take(info.filename, info.file_size)
+                # ZipExtFile stops at the declared file_size, so the check above bounds the read
+                with archive.open(info) as entry:
+                    sources.append((info.filename, entry.read()))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {upload.filename}")
+    return sources
+
+
+def _upload_size(upload: UploadFile) -> int:
+    """Size of an uploaded part, from the parser or else from its spooled file."""
+    if upload.size is not None:
+        return upload.size
+    f = upload.file
+    pos = f.tell()
+    size = f.seek(0, 2)
+    f.seek(pos)
+    return size
+
+
+async def _collect_sources(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """
+    Flatten multipart images and zip archives into (name, image bytes) pairs.
+    Bytes are read up front so the stream does not depend on the upload objects staying open.
+    Image count and sizes are checked before each read; archives are extracted off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    budget = _Budget()
+    sources = []
+    for upload in files:
+        if _is_zip(upload):
+            sources += await loop.run_in_executor(None, _extract_zip, upload, budget)
+        elif upload.content_type in ["image/jpeg", "image/png"]:
+            budget.take(upload.filename, _upload_size(upload))
+            sources.append((upload.filename, await upload.read()))
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported file: {upload.filename}. Upload JPG, PNG or ZIP.")
+    return sources
+
+
+@router.post("/batch")
+async def predict_leaf_disease_batch(files: List[UploadFile] = File(...)):
+    """
+    Predict many leaf images in one request (multipart images and/or zip archives).
+    Streams one NDJSON line per image as each model batch finishes, followed by a summary line.
+    Predictions are queued for MongoDB (written with insert_many) when the stream ends,
+    including when the client disconnects, so every db_id that was sent gets stored.
+    Answers 503 with Retry-After when the torch inference pool is full.
+    """
+    try:
+        # the stream cannot turn into a 503 once it has started
+        torch_pool.check()
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    sources = await _collect_sources(files)
+    if not sources:
+        raise HTTPException(status_code=400, detail="No images found in upload.")
+
+    async def stream():
+        docs = []
+        failed = 0
+        try:
+            async for item in _service().predict_disease_many(sources):
+                if "error" in item:
+                    failed += 1
+                else:
+                    _id = ObjectId()
+                    item["db_id"] = str(_id)
+                    docs.append({
+                        "_id": _id,
+                        "image_name": f"{uuid.uuid4()}_{item['filename']}",
+                        "predicted_class": item["predicted_class"],
+                        "confidence": item["confidence"],
+                        "model_version": item.get("model_version"),
+                        "meta": {"original_filename": item["filename"], "batch": True}
+                    })
+                yield json.dumps(item) + "\n"
+        except PoolSaturatedError as e:
+            # the pool filled up between the check and the first batch; nothing was predicted
+            yield json.dumps({"error": str(e), "retry_after_s": e.retry_after_s}) + "\n"
+            return
+        finally:
+            # also runs when the client goes away mid-stream
+            db_service.prediction_queue.enqueue_many("disease_predictions", docs)
+
+        summary = {"total": len(sources), "predicted": len(docs), "failed": failed, "stored": len(docs)}
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.config.settings import settings
+from src.services.inference_pool import pool_stats
+from src.services.model_registry import registry
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+def warmup_models():
+    return [m.strip() for m in settings.MODEL_WARMUP.split(",") if m.strip()]
+
+
+@router.get("/live")
+async def liveness():
+    """
+    The process is up and serving requests.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Ready once every model in MODEL_WARMUP has loaded.
+    Returns 503 with per-model state (and load time) until then.
+    """
+    required = warmup_models()
+    ready = registry.is_ready(required)
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "required": required,
+        "models": registry.status()
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
+@router.get("/pools")
+async def inference_pools():
+    """
+    Per-pool load: in-flight / queued calls, totals (incl. 503 rejections) and utilization.
+    """
+    return pool_stats()
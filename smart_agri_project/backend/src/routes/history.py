@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import datetime
+import json
+
+from src.services import db_service
+from src.utils.timestamps import parse_timestamp
+
+router = APIRouter(prefix="/history", tags=["Prediction History"])
+
+
+def _query_args(kind: str, fields: Optional[str], since: Optional[str], until: Optional[str], **filters):
+    if kind not in db_service.HISTORY:
+        raise HTTPException(status_code=404, detail=f"Unknown prediction type: {kind}")
+    try:
+        return {
+            "fields": [f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            "since": parse_timestamp(since) if since else None,
+            "until": parse_timestamp(until) if until else None,
+            "filters": filters,
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e}")
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+@router.get("/{kind}", summary="Predictions newest first, cursor-paginated")
+async def prediction_history(kind: str,
+                             limit: int = Query(50, gt=0, le=500),
+                             cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+                             fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+                             since: Optional[str] = None,
+                             until: Optional[str] = None,
+                             predicted_class: Optional[str] = None,
+                             recommendation: Optional[str] = None,
+                             model_version: Optional[str] = None):
+    """
+    kind is disease, irrigation or yield. Pages follow next_cursor (null on the last page);
+    filters: predicted_class (disease), recommendation (irrigation), model_version, since / until.
+    """
+    args = _query_args(kind, fields, since, until, predicted_class=predicted_class,
+                       recommendation=recommendation, model_version=model_version)
+    try:
+        items, next_cursor = await db_service.find_history(kind, limit=limit, cursor=cursor, **args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(items), "items": items, "next_cursor": next_cursor}
+
+
+@router.get("/{kind}/export", summary="Stream every matching prediction as NDJSON")
+async def export_prediction_history(kind: str,
+                                    fields: Optional[str] = None,
+                                    since: Optional[str] = None,
+                                    until: Optional[str] = None,
+                                    predicted_class: Optional[str] = None,
+                                    recommendation: Optional[str] = None,
+                                    model_version: Optional[str] = None):
+    """
+    Same filters as the paged endpoint; one JSON document per line, read from a server-side
+    cursor so the export never sits in memory as a whole.
+    """
+    args = _query_args(kind, fields, since, until, predicted_class=predicted_class,
+                       recommendation=recommendation, model_version=model_version)
+    try:
+        # validate before the response starts, so bad input is still a 400
+        db_service.history_query(kind, **args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        async for doc in db_service.iter_history(kind, **args):
+            yield json.dumps(doc, default=_json_default) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{kind}_history.ndjson"'})
@@ -1,29 +1,103 @@
 from fastapi import APIRouter, HTTPException
-from src.schemas.irrigation_schema import IrrigationInput
-from src.services.irrigation_service import predict_irrigation
+from typing import List
+from src.schemas.irrigation_schema import IrrigationInput, ScheduleRequest
 from src.services import db_service
+from src.services.feature_store import UnknownSensorError
+from src.services.inference_pool import PoolSaturatedError
 
 router = APIRouter(prefix="/predict/irrigation", tags=["Irrigation Prediction"])
 
 
+def _service():
+    # imported on first use so that loading src.main does not pull in pandas / sklearn
+    from src.services import irrigation_service
+    return irrigation_service
+
+
 @router.post("/")
 async def irrigation_prediction(input_data: IrrigationInput):
     """
     Predict soil moisture & irrigation recommendation.
-    Stores prediction in MongoDB.
+    Queues the prediction for MongoDB; db_id is assigned up front.
     """
     try:
-        result = predict_irrigation(input_data.dict())
+        result = (await _service().predict_irrigation_batch_async([input_data.dict()]))[0]
 
         db_doc = {
             "input_features": input_data.dict(),
             "predicted_moisture": result["predicted_moisture"],
-            "recommendation": result["recommendation"]
+            "recommendation": result["recommendation"],
+            "model_version": result.get("model_version")
         }
-        inserted_id = await db_service.insert_irrigation_prediction(db_doc)
-        result["db_id"] = inserted_id
+        result["db_id"] = db_service.prediction_queue.enqueue("irrigation_predictions", db_doc)
 
         return result
 
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except UnknownSensorError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch")
+async def irrigation_prediction_batch(inputs: List[IrrigationInput]):
+    """
+    Predict soil moisture & recommendations for many plots in one model call.
+    Queues all predictions for MongoDB (written with insert_many).
+    """
+    if not inputs:
+        return {"count": 0, "results": []}
+    try:
+        records = [i.dict() for i in inputs]
+        results = await _service().predict_irrigation_batch_async(records)
+
+        db_docs = [
+            {
+                "input_features": rec,
+                "predicted_moisture": res["predicted_moisture"],
+                "recommendation": res["recommendation"],
+                "model_version": res.get("model_version")
+            }
+            for rec, res in zip(records, results)
+        ]
+        inserted_ids = db_service.prediction_queue.enqueue_many("irrigation_predictions", db_docs)
+        for res, _id in zip(results, inserted_ids):
+            res["db_id"] = _id
+
+        return {"count": len(results), "results": results}
+
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except UnknownSensorError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/schedule")
+async def irrigation_schedule(request: ScheduleRequest):
+    """
+    Irrigation schedule for many plots over a multi-day forecast horizon.
+    Moisture is rolled forward day by day for all plots in one model call per day;
+    water is allocated within the pump capacity / water budget, most urgent plots first.
+    """
+    from src.services.irrigation_scheduler import schedule_irrigation_async
+    if not request.plots:
+        return {"plots": [], "daily": [], "total_water_m3": 0.0, "horizon_days": request.horizon_days}
+    try:
+        return await schedule_irrigation_async(
+            [p.dict() for p in request.plots],
+            [d.dict() for d in request.forecast],
+            horizon_days=request.horizon_days,
+            constraints=request.constraints.dict()
+        )
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except UnknownSensorError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
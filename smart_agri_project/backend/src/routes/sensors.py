@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Dict, Any, Tuple
 from src.config.database import get_database
+from src.services.sensor_service import (
+    write_buffer, BufferFullError, parse_timestamp, after_sensor_insert, query_series
+)
+from src.services.feature_store import feature_store
 import datetime
+import json
 
 router = APIRouter()
 
@@ -14,12 +20,144 @@ class SensorRow(BaseModel):
     soil_moisture_pct: float
     pH: float
 
+# rejected-row reasons returned per request are capped to keep responses small
+MAX_REPORTED_REJECTS = 100
+
 @router.post("/sensor", summary="Ingest one sensor row")
 async def ingest_sensor(row: SensorRow):
     db = get_database()
     collection = db["sensor_readings"]
     doc = row.dict()
-    if not doc.get("timestamp"):
-        doc["timestamp"] = datetime.datetime.utcnow().isoformat()
+    try:
+        doc["timestamp"] = parse_timestamp(doc.get("timestamp"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp: {e}")
     result = await collection.insert_one(doc)
+    await after_sensor_insert([doc])
     return {"inserted_id": str(result.inserted_id)}
+
+
+def _validate_rows(indexed_rows: List[Tuple[int, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate (row index, raw row) pairs against SensorRow.
+    Returns (documents, rejects) where each reject has the row index and a reason.
+    """
+    now = datetime.datetime.utcnow()
+    docs, rejects = [], []
+    for i, raw in indexed_rows:
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError("row must be a JSON object")
+            doc = SensorRow(**raw).dict()
+            doc["timestamp"] = parse_timestamp(doc["timestamp"]) if doc.get("timestamp") else now
+        except (ValidationError, ValueError, TypeError) as e:
+            reason = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ) if isinstance(e, ValidationError) else str(e)
+            rejects.append({"index": i, "reason": reason})
+            continue
+        docs.append(doc)
+    return docs, rejects
+
+
+async def _iter_ndjson(request: Request):
+    """Yield raw NDJSON lines as the body streams in."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+@router.post("/sensors/bulk", summary="Ingest many sensor rows (JSON array or NDJSON)")
+async def ingest_sensors_bulk(request: Request):
+    """
+    Accepts a JSON array of rows (or {"rows": [...]}) or an NDJSON stream (one row per line,
+    Content-Type: application/x-ndjson). Valid rows are buffered and written to MongoDB in
+    batches; the response reports how many were accepted and why the others were rejected.
+    """
+    received = 0
+    accepted = 0
+    rejects: List[Dict[str, Any]] = []
+
+    async def accept(indexed_rows: List[Tuple[int, Any]]):
+        nonlocal accepted
+        docs, bad = _validate_rows(indexed_rows)
+        rejects.extend(bad)
+        if docs:
+            await write_buffer.add(docs)
+            accepted += len(docs)
+
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            batch: List[Tuple[int, Any]] = []
+            async for line in _iter_ndjson(request):
+                try:
+                    batch.append((received, json.loads(line)))
+                except ValueError as e:
+                    rejects.append({"index": received, "reason": f"invalid JSON: {e}"})
+                received += 1
+                if len(batch) >= write_buffer.flush_rows:
+                    await accept(batch)
+                    batch = []
+            if batch:
+                await accept(batch)
+        else:
+            try:
+                body = await request.json()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON.")
+            rows = body.get("rows") if isinstance(body, dict) else body
+            if not isinstance(rows, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON array of sensor rows.")
+            received = len(rows)
+            await accept(list(enumerate(rows)))
+    except BufferFullError as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "1"},
+            content={"detail": str(e), "received": received, "accepted": accepted}
+        )
+
+    rejects.sort(key=lambda r: r["index"])
+    return {
+        "received": received,
+        "accepted": accepted,
+        "rejected": len(rejects),
+        "rejects": rejects[:MAX_REPORTED_REJECTS]
+    }
+
+
+@router.get("/sensors/buffer", summary="Write-behind buffer status")
+async def sensor_buffer_status():
+    return {"pending": len(write_buffer), **write_buffer.stats}
+
+
+@router.get("/sensors/{sensor_id}/features", summary="Lag / rolling features from recent readings")
+async def sensor_features(sensor_id: str):
+    feats = feature_store.features(sensor_id)
+    if feats is None:
+        raise HTTPException(status_code=404, detail=f"No readings for sensor '{sensor_id}'")
+    return feats
+
+
+@router.get("/sensors/{sensor_id}/series", summary="Sensor readings over a time range")
+async def sensor_series(sensor_id: str,
+                        start: str,
+                        end: Optional[str] = None,
+                        resolution_s: float = Query(0, ge=0, description="Desired point spacing in seconds"),
+                        limit: int = Query(10000, gt=0, le=100000)):
+    """
+    Returns raw readings, or 1-min / 1-hour / 1-day min/max/mean buckets when the
+    requested resolution allows it (the coarsest rollup that fits is used).
+    """
+    try:
+        start_ts = parse_timestamp(start)
+        end_ts = parse_timestamp(end) if end else datetime.datetime.utcnow()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e}")
+    return await query_series(sensor_id, start_ts, end_ts, resolution_s=resolution_s, limit=limit)
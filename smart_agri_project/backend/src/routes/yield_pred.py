@@ -1,30 +1,38 @@
 from fastapi import APIRouter, HTTPException
 from src.schemas.yield_schema import YieldInput
-from src.services.yield_service import predict_yield
 from src.services import db_service
+from src.services.inference_pool import PoolSaturatedError
 
 router = APIRouter(prefix="/predict/yield", tags=["Crop Yield Prediction"])
 
 
+def _service():
+    # imported on first use so that loading src.main does not pull in pandas / sklearn
+    from src.services import yield_service
+    return yield_service
+
+
 @router.post("/")
 async def yield_prediction(input_data: YieldInput):
     """
     Predict crop yield based on inputs.
-    Stores output in MongoDB.
+    Queues the output for MongoDB; db_id is assigned up front.
     """
     try:
-        result = predict_yield(input_data.dict())
+        result = await _service().predict_yield_async(input_data.dict())
 
         db_doc = {
             "input_features": input_data.dict(),
             "predicted_yield": result["predicted_yield"],
-            "unit": result.get("unit", "tons")
+            "unit": result.get("unit", "tons"),
+            "model_version": result.get("model_version")
         }
 
-        inserted_id = await db_service.insert_yield_prediction(db_doc)
-        result["db_id"] = inserted_id
+        result["db_id"] = db_service.prediction_queue.enqueue("yield_predictions", db_doc)
 
         return result
 
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
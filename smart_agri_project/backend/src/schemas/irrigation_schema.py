@@ -1,8 +1,11 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class IrrigationInput(BaseModel):
+    # With a sensor_id, missing readings and previous moisture come from the sensor feature store.
+    sensor_id: Optional[str] = None
+
     # Accept both the original frontend field names and processed dataset names.
     # Fields are optional to allow flexible inputs; service will map aliases.
     temperature: Optional[float] = None
@@ -19,3 +22,42 @@ class IrrigationInput(BaseModel):
     Soil_Temp: Optional[float] = None
     Soil_Moisture: Optional[float] = None
     Dew_Point: Optional[float] = None
+
+
+class WeatherDay(BaseModel):
+    # One forecast day; humidity / temperature feed the model, rainfall is added as water (mm)
+    temperature: float
+    humidity: float
+    rainfall: float = 0.0
+    Soil_Temp: Optional[float] = None
+    Dew_Point: Optional[float] = None
+
+
+class PlotInput(BaseModel):
+    plot_id: str
+    # Starting moisture: previous_moisture if given, else the sensor's latest reading
+    sensor_id: Optional[str] = None
+    previous_moisture: Optional[float] = None
+    area_m2: float = Field(1000.0, gt=0)
+    # Soil moisture (%) gained per mm of water (irrigation or rain); soil dependent
+    moisture_per_mm: float = Field(1.0, gt=0)
+    # Irrigate when predicted moisture falls below trigger, up to target
+    trigger_moisture: Optional[float] = None
+    target_moisture: Optional[float] = None
+    # Per-plot forecast overriding the farm-wide one
+    forecast: Optional[List[WeatherDay]] = None
+
+
+class ScheduleConstraints(BaseModel):
+    # Farm-wide pump / water limits (None = unlimited)
+    pump_capacity_m3_per_day: Optional[float] = Field(None, ge=0)
+    water_budget_m3: Optional[float] = Field(None, ge=0)
+    # Largest single irrigation event
+    max_irrigation_mm: float = Field(40.0, gt=0)
+
+
+class ScheduleRequest(BaseModel):
+    plots: List[PlotInput]
+    forecast: List[WeatherDay] = []
+    horizon_days: int = Field(7, ge=1, le=14)
+    constraints: ScheduleConstraints = ScheduleConstraints()
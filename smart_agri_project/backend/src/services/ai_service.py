@@ -1,24 +1,35 @@
+import asyncio
+import hashlib
+import json
+import math
 import os
-import google.generativeai as genai
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from src.config.settings import settings
+from src.utils.metrics import metrics
+from src.utils.prediction_cache import PredictionCache
 
-# Configure API key if available
 API_KEY = os.getenv("GOOGLE_API_KEY")
-if API_KEY:
-    genai.configure(api_key=API_KEY)
 
-def generate_recommendation(context: Dict[str, Any]) -> str:
-    """
-    Generate a recommendation based on the context (input data + prediction result).
-    Uses Google Generative AI if available, otherwise falls back to rule-based logic.
-    """
-    
-    # Prepare a prompt context
+_model = None
+
+def _get_model():
+    """Shared GenerativeModel instance (created once, reused for every call)."""
+    global _model
+    if _model is None:
+        # the SDK is slow to import, so it is only loaded when an API key is actually used
+        import google.generativeai as genai
+        genai.configure(api_key=API_KEY)
+        _model = genai.GenerativeModel(settings.AI_MODEL_NAME)
+    return _model
+
+def _build_prompt(context: Dict[str, Any]) -> str:
     task_type = context.get("task_type", "General Agriculture")
     inputs = context.get("inputs", {})
     prediction = context.get("prediction", {})
-    
-    prompt = f"""
+
+    return f"""
     You are an expert agricultural consultant. Analyze the following data and provide a concise, actionable recommendation for the farmer.
     
     Task: {task_type}
@@ -37,10 +48,18 @@ def generate_recommendation(context: Dict[str, Any]) -> str:
     Keep the tone professional yet encouraging.
     """
 
+def generate_recommendation(context: Dict[str, Any]) -> str:
+    """
+    Generate a recommendation based on the context (input data + prediction result).
+    Uses Google Generative AI if available, otherwise falls back to rule-based logic.
+    Blocking; async code should use `recommendation_client.recommend`.
+    """
+    task_type = context.get("task_type", "General Agriculture")
+    prediction = context.get("prediction", {})
+
     if API_KEY:
         try:
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            response = _get_model().generate_content(_build_prompt(context))
             return response.text
         except Exception as e:
             print(f"AI Generation failed: {e}")
@@ -48,6 +67,143 @@ def generate_recommendation(context: Dict[str, Any]) -> str:
     else:
         return _fallback_recommendation(task_type, prediction)
 
+def _bucket(value: Any) -> Any:
+    """
+    Coarsen a context value so near-identical inputs share a cache entry:
+    numbers keep two significant digits, strings are case/whitespace-normalized.
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        if value == 0 or not math.isfinite(value):
+            return value
+        step = 10 ** (math.floor(math.log10(abs(value))) - 1)
+        return round(round(value / step) * step, 10)
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {str(k): _bucket(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_bucket(v) for v in value]
+    return str(value)
+
+def semantic_key(context: Dict[str, Any]) -> str:
+    """Cache key from task type plus bucketed inputs/prediction."""
+    payload = {
+        "task_type": _bucket(context.get("task_type", "General Agriculture")),
+        "inputs": _bucket(context.get("inputs", {})),
+        "prediction": _bucket(context.get("prediction", {})),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class RecommendationClient:
+    """
+    Async wrapper around the Gemini model.
+    - Calls run on a dedicated thread pool, never on the event loop.
+    - At most `max_concurrency` LLM calls are in flight; callers wait at most `timeout_s`, and a
+      call that timed out keeps its slot until its thread actually returns.
+    - Timeouts and API errors fall back to `_fallback_recommendation`.
+    - LLM answers are cached by `semantic_key`, so near-identical contexts reuse them.
+    `model` can be any object with `generate_content(prompt) -> obj.text` (e.g. a fake in tests).
+    """
+
+    def __init__(self,
+                 model: Optional[Any] = None,
+                 enabled: Optional[bool] = None,
+                 max_concurrency: int = 4,
+                 timeout_s: float = 20.0,
+                 cache: Optional[PredictionCache] = None):
+        self._model = model
+        self.enabled = bool(API_KEY) if enabled is None else enabled
+        self.timeout_s = timeout_s
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ai-client")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.stats = {"calls": 0, "timeouts": 0, "errors": 0, "fallbacks": 0, "cache_hits": 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = _get_model()
+        return self._model
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _release(self, semaphore: asyncio.Semaphore):
+        # runs on the executor thread that finished the call
+        try:
+            self._loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # event loop already closed
+            pass
+
+    def _generate(self, prompt: str) -> str:
+        with metrics.stage("ai", "llm"):
+            return self.model.generate_content(prompt).text
+
+    async def recommend(self, context: Dict[str, Any]) -> str:
+        task_type = context.get("task_type", "General Agriculture")
+        prediction = context.get("prediction", {})
+
+        if not self.enabled:
+            self.stats["fallbacks"] += 1
+            return _fallback_recommendation(task_type, prediction)
+
+        key = semantic_key(context)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+
+        semaphore = self._get_semaphore()
+        try:
+            # every slot may be held by calls that already timed out: do not queue behind them
+            await asyncio.wait_for(semaphore.acquire(), self.timeout_s)
+        except asyncio.TimeoutError:
+            print(f"AI Generation: no free slot within {self.timeout_s}s")
+            self.stats["timeouts"] += 1
+            self.stats["fallbacks"] += 1
+            return _fallback_recommendation(task_type, prediction)
+        self.stats["calls"] += 1
+        try:
+            future = self._executor.submit(self._generate, _build_prompt(context))
+        except BaseException:
+            semaphore.release()
+            raise
+        # the slot is freed when the call really ends, not when we stop waiting for it:
+        # a timed-out call keeps its thread busy, so it still counts against max_concurrency
+        future.add_done_callback(lambda _: self._release(semaphore))
+        try:
+            text = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_s)
+        except asyncio.TimeoutError:
+            print(f"AI Generation timed out after {self.timeout_s}s")
+            self.stats["timeouts"] += 1
+            self.stats["fallbacks"] += 1
+            return _fallback_recommendation(task_type, prediction)
+        except Exception as e:
+            print(f"AI Generation failed: {e}")
+            self.stats["errors"] += 1
+            self.stats["fallbacks"] += 1
+            return _fallback_recommendation(task_type, prediction)
+
+        if self.cache is not None and text:
+            self.cache.set(key, text)
+        return text
+
+recommendation_client = RecommendationClient(
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    timeout_s=settings.AI_TIMEOUT_S,
+    cache=PredictionCache(max_entries=settings.AI_CACHE_MAX_ENTRIES, ttl_s=settings.AI_CACHE_TTL_S, name="ai")
+)
+
 def _fallback_recommendation(task_type: str, prediction: Dict[str, Any]) -> str:
     """
     Simple rule-based fallback if AI is unavailable.
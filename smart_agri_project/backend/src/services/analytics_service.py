@@ -0,0 +1,406 @@
+"""
+Prediction analytics
+- Daily summary collections, kept up to date incrementally: every batch the prediction queue
+  writes is pre-aggregated per bucket and folded in with one $inc upsert per bucket, the same
+  way sensor readings feed their rollups.
+    disease_summary_1d     (day, predicted_class)              count, confidence sum / min / max
+    irrigation_summary_1d  (day, sensor_id, recommendation)    count, predicted moisture sum
+    yield_summary_1d       (day, crop, season)                 count, sum / min / max, histogram
+- Dashboard queries aggregate summary documents only, so they cost O(days x groups), not
+  O(predictions).
+- Yield percentiles come from a log-spaced histogram (BINS_PER_DECADE bins per factor of 10,
+  about 6% relative error at 40 bins), interpolated within the bin and clamped to min / max.
+- rebuild() recomputes the summaries from the raw prediction collections with aggregation
+  pipelines ($group + $merge), for backfill or repair. Predictions written while a rebuild
+  runs can be counted twice; run it when traffic is low or rebuild from a recent `since`.
+"""
+
+import datetime
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from src.config.database import get_database
+
+DISEASE_SUMMARY = "disease_summary_1d"
+IRRIGATION_SUMMARY = "irrigation_summary_1d"
+YIELD_SUMMARY = "yield_summary_1d"
+
+SUMMARY_KEYS = {
+    DISEASE_SUMMARY: ["day", "predicted_class"],
+    IRRIGATION_SUMMARY: ["day", "sensor_id", "recommendation"],
+    YIELD_SUMMARY: ["day", "crop", "season"],
+}
+
+BINS_PER_DECADE = 40
+# histogram key for predictions <= 0 (no log)
+ZERO_BIN = "z"
+NO_SENSOR = "none"
+
+
+def _day(ts: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(ts.year, ts.month, ts.day)
+
+
+def yield_bin(value: float) -> str:
+    if value <= 0:
+        return ZERO_BIN
+    return str(math.floor(math.log10(value) * BINS_PER_DECADE))
+
+
+def _bin_bounds(key: str) -> Tuple[float, float]:
+    if key == ZERO_BIN:
+        return 0.0, 0.0
+    i = int(key)
+    return 10 ** (i / BINS_PER_DECADE), 10 ** ((i + 1) / BINS_PER_DECADE)
+
+
+def _label(value: Any, default: str = "unknown") -> str:
+    """Group label as the rebuild's _label_expr spells it: 2.0 -> "2", True -> "true"."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# ---------------------------------------------------------
+# INCREMENTAL FOLD
+# ---------------------------------------------------------
+def _disease_updates(docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+    groups = defaultdict(lambda: {"count": 0, "sum": 0.0, "min": None, "max": None})
+    for doc in docs:
+        g = groups[(_day(doc["created_at"]), _label(doc.get("predicted_class")))]
+        conf = float(doc.get("confidence") or 0.0)
+        g["count"] += 1
+        g["sum"] += conf
+        g["min"] = conf if g["min"] is None else min(conf, g["min"])
+        g["max"] = conf if g["max"] is None else max(conf, g["max"])
+    return [
+        UpdateOne(
+            {"day": day, "predicted_class": cls},
+            {"$inc": {"count": g["count"], "confidence_sum": g["sum"]},
+             "$min": {"confidence_min": g["min"]}, "$max": {"confidence_max": g["max"]}},
+            upsert=True
+        )
+        for (day, cls), g in groups.items()
+    ]
+
+
+def _irrigation_updates(docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+    groups = defaultdict(lambda: {"count": 0, "sum": 0.0})
+    for doc in docs:
+        sensor_id = _label((doc.get("input_features") or {}).get("sensor_id"), NO_SENSOR)
+        g = groups[(_day(doc["created_at"]), sensor_id, _label(doc.get("recommendation")))]
+        g["count"] += 1
+        g["sum"] += float(doc.get("predicted_moisture") or 0.0)
+    return [
+        UpdateOne(
+            {"day": day, "sensor_id": sensor_id, "recommendation": rec},
+            {"$inc": {"count": g["count"], "moisture_sum": g["sum"]}},
+            upsert=True
+        )
+        for (day, sensor_id, rec), g in groups.items()
+    ]
+
+
+def _yield_updates(docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+    groups = defaultdict(lambda: {"count": 0, "sum": 0.0, "min": None, "max": None, "hist": defaultdict(int)})
+    for doc in docs:
+        features = doc.get("input_features") or {}
+        g = groups[(_day(doc["created_at"]), _label(features.get("crop")), _label(features.get("season")))]
+        v = float(doc.get("predicted_yield") or 0.0)
+        g["count"] += 1
+        g["sum"] += v
+        g["min"] = v if g["min"] is None else min(v, g["min"])
+        g["max"] = v if g["max"] is None else max(v, g["max"])
+        g["hist"][yield_bin(v)] += 1
+    ops = []
+    for (day, crop, season), g in groups.items():
+        inc = {"count": g["count"], "sum": g["sum"]}
+        inc.update({f"hist.{k}": n for k, n in g["hist"].items()})
+        ops.append(UpdateOne(
+            {"day": day, "crop": crop, "season": season},
+            {"$inc": inc, "$min": {"min": g["min"]}, "$max": {"max": g["max"]}},
+            upsert=True
+        ))
+    return ops
+
+
+SUMMARIES = {
+    "disease_predictions": (DISEASE_SUMMARY, _disease_updates),
+    "irrigation_predictions": (IRRIGATION_SUMMARY, _irrigation_updates),
+    "yield_predictions": (YIELD_SUMMARY, _yield_updates),
+}
+
+
+async def fold_predictions(collection: str, docs: List[Dict[str, Any]], db=None):
+    """Fold newly written prediction documents into their daily summary (one upsert per bucket)."""
+    if not docs or collection not in SUMMARIES:
+        return
+    summary, build = SUMMARIES[collection]
+    ops = build(docs)
+    if ops:
+        db = db if db is not None else get_database()
+        await db[summary].bulk_write(ops, ordered=False)
+
+
+# ---------------------------------------------------------
+# REBUILD FROM RAW PREDICTIONS
+# ---------------------------------------------------------
+_DAY = {"$dateTrunc": {"date": "$created_at", "unit": "day"}}
+
+
+def _label_expr(path: str, default: str = "unknown") -> Dict[str, Any]:
+    """Same labels as _label: whole numbers lose their ".0" and missing / empty values use the default."""
+    return {"$let": {
+        "vars": {"v": {"$ifNull": [path, ""]}},
+        "in": {"$switch": {"branches": [
+            {"case": {"$eq": ["$$v", ""]}, "then": default},
+            # $and short-circuits, so $trunc only sees numbers
+            {"case": {"$and": [{"$isNumber": "$$v"}, {"$eq": ["$$v", {"$trunc": "$$v"}]}]},
+             "then": {"$toString": {"$toLong": "$$v"}}},
+        ], "default": {"$toString": "$$v"}}},
+    }}
+
+
+def rebuild_pipelines() -> Dict[str, Tuple[str, List[Dict[str, Any]]]]:
+    """Raw collection -> (summary collection, $group pipeline ending in $merge)."""
+    def merge(summary):
+        return {"$merge": {"into": summary, "on": SUMMARY_KEYS[summary],
+                           "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+    disease = [
+        {"$group": {
+            "_id": {"day": _DAY, "predicted_class": _label_expr("$predicted_class")},
+            "count": {"$sum": 1},
+            "confidence_sum": {"$sum": "$confidence"},
+            "confidence_min": {"$min": "$confidence"},
+            "confidence_max": {"$max": "$confidence"},
+        }},
+        {"$replaceWith": {"$mergeObjects": ["$_id", {
+            "count": "$count", "confidence_sum": "$confidence_sum",
+            "confidence_min": "$confidence_min", "confidence_max": "$confidence_max"}]}},
+        merge(DISEASE_SUMMARY),
+    ]
+    irrigation = [
+        {"$group": {
+            "_id": {"day": _DAY,
+                    "sensor_id": _label_expr("$input_features.sensor_id", NO_SENSOR),
+                    "recommendation": _label_expr("$recommendation")},
+            "count": {"$sum": 1},
+            "moisture_sum": {"$sum": "$predicted_moisture"},
+        }},
+        {"$replaceWith": {"$mergeObjects": ["$_id", {"count": "$count", "moisture_sum": "$moisture_sum"}]}},
+        merge(IRRIGATION_SUMMARY),
+    ]
+    yield_bin_expr = {"$cond": [
+        {"$gt": ["$predicted_yield", 0]},
+        {"$toString": {"$floor": {"$multiply": [{"$log10": "$predicted_yield"}, BINS_PER_DECADE]}}},
+        ZERO_BIN,
+    ]}
+    group_key = {"day": _DAY, "crop": _label_expr("$input_features.crop"),
+                 "season": _label_expr("$input_features.season")}
+    yields = [
+        # per bin first, then per (day, crop, season) with the bins folded into a map
+        {"$group": {
+            "_id": {**group_key, "bin": yield_bin_expr},
+            "n": {"$sum": 1}, "sum": {"$sum": "$predicted_yield"},
+            "min": {"$min": "$predicted_yield"}, "max": {"$max": "$predicted_yield"},
+        }},
+        {"$group": {
+            "_id": {"day": "$_id.day", "crop": "$_id.crop", "season": "$_id.season"},
+            "count": {"$sum": "$n"}, "sum": {"$sum": "$sum"},
+            "min": {"$min": "$min"}, "max": {"$max": "$max"},
+            "hist": {"$push": {"k": "$_id.bin", "v": "$n"}},
+        }},
+        {"$replaceWith": {"$mergeObjects": ["$_id", {
+            "count": "$count", "sum": "$sum", "min": "$min", "max": "$max",
+            "hist": {"$arrayToObject": "$hist"}}]}},
+        merge(YIELD_SUMMARY),
+    ]
+    return {
+        "disease_predictions": (DISEASE_SUMMARY, disease),
+        "irrigation_predictions": (IRRIGATION_SUMMARY, irrigation),
+        "yield_predictions": (YIELD_SUMMARY, yields),
+    }
+
+
+async def rebuild(since: Optional[datetime.datetime] = None, db=None) -> Dict[str, int]:
+    """
+    Recompute the summaries from raw predictions (all of them, or from the day of `since`).
+    Returns the number of summary buckets per collection afterwards.
+    """
+    db = db if db is not None else get_database()
+    start = _day(since) if since is not None else None
+    out = {}
+    for raw, (summary, pipeline) in rebuild_pipelines().items():
+        if start is None:
+            await db[summary].delete_many({})
+        else:
+            await db[summary].delete_many({"day": {"$gte": start}})
+            pipeline = [{"$match": {"created_at": {"$gte": start}}}] + pipeline
+        cursor = db[raw].aggregate(pipeline)
+        # $merge returns no documents; iterating runs the pipeline
+        async for _ in cursor:
+            pass
+        out[summary] = await db[summary].count_documents({})
+    return out
+
+
+# ---------------------------------------------------------
+# DASHBOARD QUERIES (summary collections only)
+# ---------------------------------------------------------
+def _day_range(since: Optional[datetime.datetime], until: Optional[datetime.datetime]) -> Dict[str, Any]:
+    q = {}
+    if since is not None:
+        q["$gte"] = _day(since)
+    if until is not None:
+        q["$lt"] = until
+    return {"day": q} if q else {}
+
+
+async def disease_daily(since: Optional[datetime.datetime] = None,
+                        until: Optional[datetime.datetime] = None,
+                        predicted_class: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per day: prediction count and mean confidence per disease class."""
+    match = _day_range(since, until)
+    if predicted_class:
+        match["predicted_class"] = predicted_class
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"day": 1, "predicted_class": 1}},
+        {"$group": {
+            "_id": "$day",
+            "total": {"$sum": "$count"},
+            "classes": {"$push": {
+                "predicted_class": "$predicted_class",
+                "count": "$count",
+                "mean_confidence": {"$divide": ["$confidence_sum", "$count"]},
+                "min_confidence": "$confidence_min",
+                "max_confidence": "$confidence_max",
+            }},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    days = []
+    async for d in get_database()[DISEASE_SUMMARY].aggregate(pipeline):
+        days.append({"day": d["_id"].date().isoformat(), "total": d["total"], "classes": d["classes"]})
+    return days
+
+
+async def irrigation_by_sensor(since: Optional[datetime.datetime] = None,
+                               until: Optional[datetime.datetime] = None,
+                               sensor_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per sensor: how often each recommendation was given, and the mean predicted moisture."""
+    match = _day_range(since, until)
+    if sensor_id:
+        match["sensor_id"] = sensor_id
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"sensor_id": "$sensor_id", "recommendation": "$recommendation"},
+                    "count": {"$sum": "$count"}, "moisture_sum": {"$sum": "$moisture_sum"}}},
+        {"$group": {"_id": "$_id.sensor_id",
+                    "total": {"$sum": "$count"}, "moisture_sum": {"$sum": "$moisture_sum"},
+                    "recommendations": {"$push": {"k": "$_id.recommendation", "v": "$count"}}}},
+        {"$sort": {"_id": 1}},
+    ]
+    sensors = []
+    async for d in get_database()[IRRIGATION_SUMMARY].aggregate(pipeline):
+        total = d["total"]
+        sensors.append({
+            "sensor_id": d["_id"],
+            "total": total,
+            "mean_predicted_moisture": d["moisture_sum"] / total if total else None,
+            "recommendations": {
+                r["k"]: {"count": r["v"], "share": r["v"] / total if total else 0.0}
+                for r in sorted(d["recommendations"], key=lambda r: -r["v"])
+            },
+        })
+    return sensors
+
+
+def histogram_percentiles(hist: Dict[str, int], qs: List[float],
+                          lo: Optional[float] = None, hi: Optional[float] = None) -> Dict[str, Optional[float]]:
+    """Percentiles (0..100) from log-spaced bin counts, log-interpolated within the bin."""
+    bins = sorted(((k, n) for k, n in hist.items() if n > 0),
+                  key=lambda kv: -math.inf if kv[0] == ZERO_BIN else int(kv[0]))
+    total = sum(n for _, n in bins)
+    out = {}
+    for q in qs:
+        name = f"p{q:g}"
+        if not total:
+            out[name] = None
+            continue
+        rank = q / 100.0 * total
+        seen = 0
+        value = None
+        for k, n in bins:
+            if seen + n >= rank:
+                low, high = _bin_bounds(k)
+                frac = (rank - seen) / n
+                value = low if k == ZERO_BIN else low * (high / low) ** frac
+                break
+            seen += n
+        if value is None:
+            value = _bin_bounds(bins[-1][0])[1]
+        if lo is not None:
+            value = max(value, lo)
+        if hi is not None:
+            value = min(value, hi)
+        out[name] = value
+    return out
+
+
+async def yield_percentiles(since: Optional[datetime.datetime] = None,
+                            until: Optional[datetime.datetime] = None,
+                            crop: Optional[str] = None,
+                            season: Optional[str] = None,
+                            qs: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+    """Per (crop, season): count, mean, min, max and percentiles of predicted yield."""
+    qs = qs or [10, 50, 90]
+    match = _day_range(since, until)
+    if crop:
+        match["crop"] = crop
+    if season:
+        match["season"] = season
+    pipeline = [
+        {"$match": match},
+        {"$project": {"crop": 1, "season": 1, "count": 1, "sum": 1, "min": 1, "max": 1,
+                      "hist": {"$objectToArray": "$hist"}}},
+        {"$unwind": "$hist"},
+        # one row per (crop, season, bin); every day's counts for the bin summed
+        {"$group": {"_id": {"crop": "$crop", "season": "$season", "bin": "$hist.k"},
+                    "n": {"$sum": "$hist.v"}}},
+        {"$group": {"_id": {"crop": "$_id.crop", "season": "$_id.season"},
+                    "hist": {"$push": {"k": "$_id.bin", "v": "$n"}}}},
+    ]
+    totals_pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"crop": "$crop", "season": "$season"},
+                    "count": {"$sum": "$count"}, "sum": {"$sum": "$sum"},
+                    "min": {"$min": "$min"}, "max": {"$max": "$max"}}},
+    ]
+    db = get_database()
+    totals = {}
+    async for d in db[YIELD_SUMMARY].aggregate(totals_pipeline):
+        totals[(d["_id"]["crop"], d["_id"]["season"])] = d
+    groups = []
+    async for d in db[YIELD_SUMMARY].aggregate(pipeline):
+        key = (d["_id"]["crop"], d["_id"]["season"])
+        t = totals.get(key, {})
+        count = t.get("count", 0)
+        groups.append({
+            "crop": key[0],
+            "season": key[1],
+            "count": count,
+            "mean": t.get("sum", 0.0) / count if count else None,
+            "min": t.get("min"),
+            "max": t.get("max"),
+            "percentiles": histogram_percentiles({h["k"]: h["v"] for h in d["hist"]}, qs, t.get("min"), t.get("max")),
+        })
+    return sorted(groups, key=lambda g: (g["crop"], g["season"]))
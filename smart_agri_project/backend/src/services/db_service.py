@@ -1,9 +1,50 @@
-from src.config.database import get_database
+"""
+Prediction persistence
+- insert_* functions write straight to MongoDB and return the new id.
+- prediction_queue takes the write off the request path: routes enqueue() the document and
+  answer right away with a pre-generated ObjectId; a background task writes the queue with one
+  unordered insert_many per collection, flushed by size or time.
+- Failed writes are retried with exponential backoff. Documents that still cannot be written
+  (Mongo down) or that arrive while the queue is full are appended to a local JSONL spill file,
+  which is replayed once Mongo accepts writes again. Replays are idempotent: every document
+  carries its _id, and duplicate-key errors count as already written.
+- Spill-file work runs on a worker thread, never on the event loop: a full queue hands documents
+  to a bounded overflow list that the background task spills, and replay reads the file
+  flush_rows lines at a time instead of loading it whole.
+- close() (shutdown hook) writes everything still queued, spilling what Mongo will not take.
+- Written documents are folded into the daily analytics summaries (analytics_service.py).
+
+Prediction history
+- created_at is a BSON date; find_history() pages newest first with a keyset cursor on
+  (created_at, _id), so page N costs the same as page 1 (no skip), and takes projections and
+  equality filters that are covered by the compound indexes in create_indexes().
+- iter_history() streams the same query for NDJSON exports.
+- migrate_created_at() converts documents written with ISO-string created_at.
+"""
+
+import asyncio
+import base64
 import datetime
-from bson import ObjectId
-from typing import Dict, Any, List, Optional
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator, NamedTuple, Tuple
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
 
-db = get_database()
+from src.config.database import get_database
+from src.config.settings import settings
+from src.services.analytics_service import fold_predictions
+from src.services.model_store import backend_path
+from src.utils.metrics import metrics
+
+def _db():
+    # resolved per call so importing this module does not create a Mongo client
+    return get_database()
 
 def _serialize_id(doc: Dict[str, Any]) -> Dict[str, Any]:
     if doc and "_id" in doc:
@@ -12,27 +53,542 @@ def _serialize_id(doc: Dict[str, Any]) -> Dict[str, Any]:
 
 
 async def insert_disease_prediction(doc: Dict[str, Any]) -> str:
-    doc["created_at"] = datetime.datetime.utcnow().isoformat()
-    result = await db.disease_predictions.insert_one(doc)
+    doc["created_at"] = datetime.datetime.utcnow()
+    with metrics.stage("disease", "db_write"):
+        result = await _db().disease_predictions.insert_one(doc)
     return str(result.inserted_id)
 
+async def insert_disease_predictions(docs: List[Dict[str, Any]]) -> List[str]:
+    """
+    Insert many disease predictions in one round trip.
+    Documents may carry a pre-generated `_id` so callers can report ids before the write.
+    """
+    if not docs:
+        return []
+    created_at = datetime.datetime.utcnow()
+    for doc in docs:
+        doc["created_at"] = created_at
+    with metrics.stage("disease", "db_write"):
+        result = await _db().disease_predictions.insert_many(docs, ordered=False)
+    return [str(i) for i in result.inserted_ids]
+
 async def get_disease_prediction(pred_id: str) -> Optional[Dict[str, Any]]:
-    doc = await db.disease_predictions.find_one({"_id": ObjectId(pred_id)})
+    doc = await _db().disease_predictions.find_one({"_id": ObjectId(pred_id)})
     return _serialize_id(doc)
 
 
 async def insert_irrigation_prediction(doc: Dict[str, Any]) -> str:
-    doc["created_at"] = datetime.datetime.utcnow().isoformat()
-    result = await db.irrigation_predictions.insert_one(doc)
+    doc["created_at"] = datetime.datetime.utcnow()
+    with metrics.stage("irrigation", "db_write"):
+        result = await _db().irrigation_predictions.insert_one(doc)
     return str(result.inserted_id)
 
 
+async def insert_irrigation_predictions(docs: List[Dict[str, Any]]) -> List[str]:
+    if not docs:
+        return []
+    created_at = datetime.datetime.utcnow()
+    for doc in docs:
+        doc["created_at"] = created_at
+    with metrics.stage("irrigation", "db_write"):
+        result = await _db().irrigation_predictions.insert_many(docs, ordered=False)
+    return [str(i) for i in result.inserted_ids]
+
+
 async def insert_yield_prediction(doc: Dict[str, Any]) -> str:
-    doc["created_at"] = datetime.datetime.utcnow().isoformat()
-    result = await db.yield_predictions.insert_one(doc)
+    doc["created_at"] = datetime.datetime.utcnow()
+    with metrics.stage("yield", "db_write"):
+        result = await _db().yield_predictions.insert_one(doc)
     return str(result.inserted_id)
 
 
 async def get_recent_predictions(collection: str, limit: int = 20) -> List[Dict[str, Any]]:
-    docs = await db[collection].find().sort("created_at", -1).to_list(length=limit)
+    kind = collection.split("_")[0]
+    if kind in HISTORY:
+        return (await find_history(kind, limit=limit))[0]
+    docs = await _db()[collection].find().sort([("created_at", -1), ("_id", -1)]).to_list(length=limit)
     return [_serialize_id(d) for d in docs]
+
+
+# ---------------------------------------------------------
+# HISTORY QUERIES
+# ---------------------------------------------------------
+class HistorySpec(NamedTuple):
+    collection: str
+    # top-level fields a caller may project
+    fields: List[str]
+    # equality filters, each backed by a (field, created_at, _id) index
+    filters: List[str]
+
+
+HISTORY = {
+    "disease": HistorySpec("disease_predictions",
+                           ["image_name", "predicted_class", "confidence", "model_version", "meta"],
+                           ["predicted_class", "model_version"]),
+    "irrigation": HistorySpec("irrigation_predictions",
+                              ["input_features", "predicted_moisture", "recommendation", "model_version"],
+                              ["recommendation", "model_version"]),
+    "yield": HistorySpec("yield_predictions",
+                         ["input_features", "predicted_yield", "unit", "model_version"],
+                         ["model_version"]),
+}
+
+NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+
+
+def history_indexes() -> Dict[str, List[List[Tuple[str, int]]]]:
+    """Compound indexes per collection: the keyset sort, and each filter followed by it."""
+    return {spec.collection: [NEWEST_FIRST] + [[(f, 1)] + NEWEST_FIRST for f in spec.filters]
+            for spec in HISTORY.values()}
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = json.dumps({"t": doc["created_at"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, ObjectId]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.datetime.fromisoformat(raw["t"]), ObjectId(raw["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def history_query(kind: str,
+                  filters: Optional[Dict[str, Any]] = None,
+                  since: Optional[datetime.datetime] = None,
+                  until: Optional[datetime.datetime] = None,
+                  cursor: Optional[str] = None,
+                  fields: Optional[List[str]] = None) -> Tuple[HistorySpec, Dict[str, Any], Optional[Dict[str, int]]]:
+    """(spec, Mongo filter, projection) for one history request. Raises ValueError on bad input."""
+    if kind not in HISTORY:
+        raise ValueError(f"Unknown prediction type: {kind}")
+    spec = HISTORY[kind]
+    query: Dict[str, Any] = {}
+    for name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if name not in spec.filters:
+            raise ValueError(f"Cannot filter {kind} history by {name} (allowed: {', '.join(spec.filters)})")
+        query[name] = value
+
+    created: Dict[str, Any] = {}
+    if since is not None:
+        created["$gte"] = since
+    if until is not None:
+        created["$lt"] = until
+    if created:
+        query["created_at"] = created
+    if cursor:
+        t, _id = decode_cursor(cursor)
+        after = {"$or": [{"created_at": {"$lt": t}}, {"created_at": t, "_id": {"$lt": _id}}]}
+        query = {"$and": [query, after]} if query else after
+
+    projection = None
+    if fields:
+        unknown = [f for f in fields if f not in spec.fields and f not in ("_id", "created_at")]
+        if unknown:
+            raise ValueError(f"Unknown {kind} fields: {', '.join(unknown)} (allowed: {', '.join(spec.fields)})")
+        # the cursor needs created_at and _id
+        projection = {f: 1 for f in fields}
+        projection["created_at"] = 1
+    return spec, query, projection
+
+
+async def find_history(kind: str,
+                       limit: int = 50,
+                       cursor: Optional[str] = None,
+                       fields: Optional[List[str]] = None,
+                       filters: Optional[Dict[str, Any]] = None,
+                       since: Optional[datetime.datetime] = None,
+                       until: Optional[datetime.datetime] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of predictions, newest first, and the cursor for the next page (None on the last).
+    """
+    spec, query, projection = history_query(kind, filters, since, until, cursor, fields)
+    docs = await (_db()[spec.collection].find(query, projection)
+                  .sort(NEWEST_FIRST).limit(limit + 1).to_list(length=limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return [_serialize_id(d) for d in docs[:limit]], next_cursor
+
+
+async def iter_history(kind: str,
+                       fields: Optional[List[str]] = None,
+                       filters: Optional[Dict[str, Any]] = None,
+                       since: Optional[datetime.datetime] = None,
+                       until: Optional[datetime.datetime] = None,
+                       batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """Every matching prediction, newest first, fetched from the server batch_size at a time."""
+    spec, query, projection = history_query(kind, filters, since, until, None, fields)
+    cursor = _db()[spec.collection].find(query, projection).sort(NEWEST_FIRST).batch_size(batch_size)
+    async for doc in cursor:
+        yield _serialize_id(doc)
+
+
+async def migrate_created_at(db=None) -> Dict[str, Dict[str, int]]:
+    """
+    Convert ISO-string created_at values (written before it became a date) in place.
+    Unparseable strings are left as they are and counted as invalid; a collection that
+    fails does not stop the others.
+    """
+    db = db if db is not None else _db()
+    report = {}
+    for spec in HISTORY.values():
+        coll = db[spec.collection]
+        try:
+            result = await coll.update_many(
+                {"created_at": {"$type": "string"}},
+                [{"$set": {"created_at": {"$dateFromString": {
+                    "dateString": "$created_at", "timezone": "UTC",
+                    "onError": "$created_at", "onNull": "$created_at"
+                }}}}]
+            )
+            invalid = await coll.count_documents({"created_at": {"$type": "string"}})
+            report[spec.collection] = {"converted": result.modified_count, "invalid": invalid}
+        except Exception as e:
+            print(f"created_at migration of {spec.collection} failed: {e}")
+            report[spec.collection] = {"converted": 0, "invalid": 0, "error": str(e)}
+    return report
+
+
+# ---------------------------------------------------------
+# WRITE-BEHIND PERSISTENCE QUEUE
+# ---------------------------------------------------------
+DUPLICATE_KEY = 11000
+
+persisted_docs = metrics.counter(
+    "smartagri_persist_docs", "Queued prediction documents by outcome.", ("collection", "result"))
+
+
+class PersistenceQueue:
+    def __init__(self,
+                 get_db: Callable[[], Any] = _db,
+                 after_insert: Optional[Callable[[str, List[Dict[str, Any]]], Awaitable[None]]] = None,
+                 spill_path: Optional[Path] = None,
+                 flush_rows: int = 500,
+                 flush_interval_ms: float = 200.0,
+                 max_rows: int = 50000,
+                 max_overflow_rows: Optional[int] = None,
+                 retries: int = 3,
+                 backoff_s: float = 0.5,
+                 backoff_max_s: float = 10.0,
+                 replay_interval_s: float = 30.0):
+        self.get_db = get_db
+        self.after_insert = after_insert
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(0.001, float(flush_interval_ms) / 1000.0)
+        self.max_rows = max(self.flush_rows, int(max_rows))
+        self.max_overflow_rows = self.max_rows if max_overflow_rows is None else max(0, int(max_overflow_rows))
+        self.retries = max(0, int(retries))
+        self.backoff_s = float(backoff_s)
+        self.backoff_max_s = float(backoff_max_s)
+        self.replay_interval_s = float(replay_interval_s)
+
+        self._queues: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._rows = 0
+        # documents that arrived while the queue was full, waiting to be spilled by _run
+        self._overflow: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self._overflow_rows = 0
+        self._spill_lock = threading.Lock()
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._replay_lock: Optional[asyncio.Lock] = None
+        self._last_replay = 0.0
+
+        self.stats = {"queued": 0, "written": 0, "duplicates": 0, "dropped": 0, "spilled": 0,
+                      "replayed": 0, "retries": 0, "last_error": None}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._replay_lock = asyncio.Lock()
+            self._worker = loop.create_task(self._run())
+
+    def __len__(self):
+        return self._rows
+
+    def enqueue(self, collection: str, doc: Dict[str, Any]) -> str:
+        """Queue one document for `collection` and return its (pre-generated) id."""
+        return self.enqueue_many(collection, [doc])[0]
+
+    def enqueue_many(self, collection: str, docs: List[Dict[str, Any]]) -> List[str]:
+        """
+        Queue documents without waiting for Mongo. Never blocks: when the queue is full the
+        documents are handed to the background task for the spill file, and dropped if that
+        overflow is full too.
+        """
+        if not docs:
+            return []
+        self._ensure_started()
+        created_at = datetime.datetime.utcnow()
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            doc.setdefault("created_at", created_at)
+        if self._rows + len(docs) > self.max_rows:
+            if self._overflow_rows + len(docs) > self.max_overflow_rows:
+                self.stats["dropped"] += len(docs)
+                persisted_docs.inc(collection, "dropped", amount=len(docs))
+                print(f"Prediction queue and overflow full, {len(docs)} {collection} documents dropped")
+            else:
+                self._overflow.append((collection, docs))
+                self._overflow_rows += len(docs)
+                self._wake.set()
+        else:
+            self._queues[collection].extend(docs)
+            self._rows += len(docs)
+            self.stats["queued"] += len(docs)
+            if self._rows >= self.flush_rows:
+                self._wake.set()
+        return [str(doc["_id"]) for doc in docs]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._spill_overflow()
+                await self.flush()
+                if self._spill_pending() and time.monotonic() - self._last_replay >= self.replay_interval_s:
+                    await self.replay()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                print(f"Prediction queue flush failed: {e}")
+
+    async def _insert(self, collection: str, docs: List[Dict[str, Any]]):
+        """
+        One unordered insert_many. Duplicate keys mean the document is already stored (replay
+        after a partial write); other per-document errors would fail again, so they are dropped.
+        Connection-level errors propagate for retry.
+        """
+        service = collection.split("_")[0]
+        try:
+            with metrics.stage(service, "db_write"):
+                await self.get_db()[collection].insert_many(docs, ordered=False)
+            inserted, duplicates, dropped = docs, 0, 0
+        except BulkWriteError as e:
+            errors = (e.details or {}).get("writeErrors", [])
+            duplicates = sum(1 for err in errors if err.get("code") == DUPLICATE_KEY)
+            dropped = len(errors) - duplicates
+            failed = {err.get("index") for err in errors}
+            inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+            if dropped:
+                self.stats["last_error"] = next(err.get("errmsg") for err in errors if err.get("code") != DUPLICATE_KEY)
+        written = len(inserted)
+        self.stats["written"] += written
+        self.stats["duplicates"] += duplicates
+        self.stats["dropped"] += dropped
+        persisted_docs.inc(collection, "written", amount=written)
+        if dropped:
+            persisted_docs.inc(collection, "dropped", amount=dropped)
+        if self.after_insert is not None and inserted:
+            # only documents new to Mongo: a replayed duplicate was already counted
+            try:
+                await self.after_insert(collection, inserted)
+            except Exception as e:
+                self.stats["last_error"] = f"after_insert: {e}"
+                print(f"Prediction summary update failed: {e}")
+
+    async def _insert_with_retry(self, collection: str, docs: List[Dict[str, Any]]) -> bool:
+        delay = self.backoff_s
+        for attempt in range(self.retries + 1):
+            try:
+                await self._insert(collection, docs)
+                return True
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                if attempt == self.retries:
+                    print(f"Prediction write to {collection} failed after {attempt + 1} attempts: {e}")
+                    return False
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.backoff_max_s)
+        return False
+
+    async def flush(self):
+        """Write everything queued, one insert_many per collection and flush_rows documents."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            for collection, queue in list(self._queues.items()):
+                while queue:
+                    batch = queue[:self.flush_rows]
+                    if not await self._insert_with_retry(collection, batch):
+                        await self._spill_async(collection, batch)
+                    del queue[:len(batch)]
+                    self._rows -= len(batch)
+
+    # ---------------- spill file ----------------
+    def _replaying_path(self) -> Path:
+        return self.spill_path.with_name(self.spill_path.name + ".replaying")
+
+    def _spill_pending(self) -> bool:
+        return self.spill_path is not None and (self.spill_path.exists() or self._replaying_path().exists())
+
+    async def _spill_async(self, collection: str, docs: List[Dict[str, Any]]):
+        await asyncio.get_running_loop().run_in_executor(None, self._spill, collection, docs)
+
+    async def _spill_overflow(self):
+        while self._overflow:
+            collection, docs = self._overflow.pop(0)
+            self._overflow_rows -= len(docs)
+            await self._spill_async(collection, docs)
+
+    def _spill(self, collection: str, docs: List[Dict[str, Any]]):
+        """Append documents to the spill file (blocking; called on a worker thread)."""
+        with self._spill_lock:
+            self._write_spill(collection, docs)
+
+    def _write_spill(self, collection: str, docs: List[Dict[str, Any]]):
+        if self.spill_path is None:
+            self.stats["dropped"] += len(docs)
+            persisted_docs.inc(collection, "dropped", amount=len(docs))
+            print(f"Prediction queue: no spill file, {len(docs)} {collection} documents dropped")
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        # extended JSON keeps ObjectId / datetime types through the round trip
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(json_util.dumps({"collection": collection, "doc": doc}) + "\n" for doc in docs)
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats["spilled"] += len(docs)
+        persisted_docs.inc(collection, "spilled", amount=len(docs))
+
+    def _start_replay(self, replaying: Path):
+        """Open the file to replay, renaming the spill file first (blocking; worker thread)."""
+        with self._spill_lock:
+            if not replaying.exists():
+                if not self.spill_path.exists():
+                    return None
+                os.replace(self.spill_path, replaying)
+        return open(replaying, encoding="utf-8")
+
+    def _read_spilled(self, f) -> List[str]:
+        """Up to flush_rows non-empty lines from the replay file (blocking; worker thread)."""
+        lines = []
+        while len(lines) < self.flush_rows:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                lines.append(line)
+        return lines
+
+    def _finish_replay(self, f, replaying: Path, unwritten: Optional[List[str]]):
+        """
+        Unless the replay completed (unwritten is None), put the unwritten lines and the unread
+        rest of the replay file back into the spill file, copied in blocks, then remove the
+        replay file (blocking; worker thread).
+        """
+        if unwritten is not None:
+            with self._spill_lock:
+                with open(self.spill_path, "a", encoding="utf-8") as out:
+                    out.writelines(unwritten)
+                    for block in iter(lambda: f.read(1 << 20), ""):
+                        out.write(block)
+                    out.flush()
+                    os.fsync(out.fileno())
+        f.close()
+        replaying.unlink()
+
+    async def replay(self) -> int:
+        """
+        Write spilled documents back to Mongo. The spill file is renamed first so new spills
+        start a fresh file; if Mongo fails again, the unwritten rest goes back to the spill file.
+        The file is read flush_rows lines at a time and all file work runs on a worker thread.
+        Returns the number of documents replayed.
+        """
+        if self.spill_path is None:
+            return 0
+        if self._replay_lock is None:
+            self._replay_lock = asyncio.Lock()
+        # the background task and an explicit call must not share the replay file
+        async with self._replay_lock:
+            return await self._replay()
+
+    async def _replay(self) -> int:
+        self._last_replay = time.monotonic()
+        loop = asyncio.get_running_loop()
+        replaying = self._replaying_path()
+        f = await loop.run_in_executor(None, self._start_replay, replaying)
+        if f is None:
+            return 0
+
+        replayed = 0
+        lines: List[str] = []
+        unwritten: Optional[List[str]] = None
+        try:
+            while True:
+                lines = await loop.run_in_executor(None, self._read_spilled, f)
+                if not lines:
+                    break
+                by_collection: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+                for line in lines:
+                    entry = json_util.loads(line)
+                    by_collection[entry["collection"]].append(entry["doc"])
+                try:
+                    for collection, docs in by_collection.items():
+                        await self._insert(collection, docs)
+                except Exception as e:
+                    # still down: keep the rest (this chunk included, replays are idempotent)
+                    self.stats["last_error"] = str(e)
+                    unwritten = lines
+                    print(f"Prediction spill replay stopped after {replayed} documents: {e}")
+                    break
+                replayed += len(lines)
+                for collection, docs in by_collection.items():
+                    persisted_docs.inc(collection, "replayed", amount=len(docs))
+                lines = []
+        except BaseException:
+            # cancelled or a bad line: nothing may be lost with the replay file
+            unwritten = lines
+            raise
+        finally:
+            await loop.run_in_executor(None, self._finish_replay, f, replaying, unwritten)
+        self.stats["replayed"] += replayed
+        if replayed and unwritten is None:
+            print(f"Prediction spill replayed: {replayed} documents")
+        return replayed
+
+    async def close(self):
+        """Write everything still queued (spilling what fails) and stop the background worker."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._worker = None
+        try:
+            await self._spill_overflow()
+            await self.flush()
+        except Exception as e:
+            print(f"Prediction queue final flush failed, {self._rows} documents dropped: {e}")
+
+
+prediction_queue = PersistenceQueue(
+    after_insert=fold_predictions,
+    spill_path=backend_path(settings.PERSIST_SPILL_PATH) if settings.PERSIST_SPILL_PATH else None,
+    flush_rows=settings.PERSIST_FLUSH_ROWS,
+    flush_interval_ms=settings.PERSIST_FLUSH_INTERVAL_MS,
+    max_rows=settings.PERSIST_QUEUE_MAX_ROWS,
+    retries=settings.PERSIST_RETRIES,
+    backoff_s=settings.PERSIST_BACKOFF_S,
+    backoff_max_s=settings.PERSIST_BACKOFF_MAX_S,
+    replay_interval_s=settings.PERSIST_REPLAY_INTERVAL_S
+)
+
+
+@metrics.collector
+def _queue_gauges():
+    return [("smartagri_persist_queue_depth", "gauge", "Prediction documents waiting to be written.",
+             [("smartagri_persist_queue_depth", {}, float(len(prediction_queue)))])]
@@ -2,15 +2,31 @@ import torch
 import torch.nn as nn
 from torchvision import transforms, models
 from PIL import Image
+import asyncio
+import io
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Union, BinaryIO, Tuple, AsyncIterator
+
+from src.config.settings import settings
+from src.services.inference_pool import torch_pool
+from src.services.model_registry import HotSwapModel, Served, registry
+from src.services.model_store import Artifact, backend_path, file_sha256, store
+from src.utils.batcher import MicroBatcher
+from src.utils.metrics import metrics
 
 # ---------------------------------------------------------
 # PATH SETUP
 # ---------------------------------------------------------
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "data", "models", "disease_resnet18.pth")
-LABELS_PATH = os.path.join(BASE_DIR, "data", "models", "disease_labels.json")
+MODEL_PATH = backend_path(settings.DISEASE_MODEL_PATH)
+MODEL_DIR = MODEL_PATH.parent
+LABELS_PATH = MODEL_DIR / "disease_labels.json"
+# Optimized artifacts written by src/ml/export_disease.py
+TORCHSCRIPT_PATH = MODEL_DIR / "disease_resnet18_fp32.ts"
+INT8_PATH = MODEL_DIR / "disease_resnet18_int8.ts"
+EXPORT_REPORT_PATH = MODEL_DIR / "disease_export_report.json"
 
 # ---------------------------------------------------------
 # DEVICE CONFIGURATION
@@ -20,11 +36,9 @@ device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 # ---------------------------------------------------------
 # LOAD LABELS CORRECTLY
 # ---------------------------------------------------------
-with open(LABELS_PATH, "r") as f:
-    LABELS = json.load(f)["classes"]   # FIXED: extract the list only
-
-# convert to index→label map
-IDX_TO_LABEL = {i: label for i, label in enumerate(LABELS)}
+def _read_labels(path) -> List[str]:
+    with open(path, "r") as f:
+        return json.load(f)["classes"]   # FIXED: extract the list only
 
 # ---------------------------------------------------------
 # IMAGE TRANSFORMS
@@ -41,11 +55,13 @@ transform = transforms.Compose([
 # ---------------------------------------------------------
 # MODEL LOADING FUNCTION
 # ---------------------------------------------------------
-def load_disease_model():
+def load_disease_model(model_path=MODEL_PATH, num_classes: int = None):
+    if num_classes is None:
+        num_classes = len(_read_labels(LABELS_PATH))
     model = models.resnet18(weights=None)
-    model.fc = nn.Linear(512, len(LABELS))   # must be 29, now fixed
+    model.fc = nn.Linear(512, num_classes)   # must be 29, now fixed
 
-    checkpoint = torch.load(MODEL_PATH, map_location=device)
+    checkpoint = torch.load(model_path, map_location=device)
 
     # Handle both save formats
     if isinstance(checkpoint, dict) and "model_state" in checkpoint:
@@ -58,27 +74,277 @@ def load_disease_model():
     model.eval()
     return model
 
-model = load_disease_model()
+
+def _configure_threads():
+    if settings.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(settings.TORCH_NUM_THREADS)
+    if settings.TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(settings.TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            # only allowed before the first inter-op parallel work has started
+            print(f"Could not set inter-op threads: {e}")
+
+
+def _export_report(files: Dict[str, Path]) -> Dict[str, Any]:
+    """disease_export_report.json of this version ({} when missing or unreadable)."""
+    try:
+        with open(files["export_report"], "r") as f:
+            return json.load(f)
+    except (KeyError, OSError, ValueError):
+        return {}
+
+
+def _quantized_engine(files: Dict[str, Path]) -> str:
+    """Engine the int8 artifact was calibrated for (recorded in the export report)."""
+    return _export_report(files).get("quantized_engine", "x86")
+
+
+def _exported_from_current(files: Dict[str, Path], report: Dict[str, Any]) -> bool:
+    """True when the .ts files were exported from the .pth being served, not an older one."""
+    if "model" not in files or not report.get("source_sha256"):
+        return False
+    try:
+        return file_sha256(files["model"]) == report["source_sha256"]
+    except OSError:
+        return False
+
+
+def _select_variant(files: Dict[str, Path]) -> str:
+    """
+    Resolve DISEASE_MODEL_VARIANT to an artifact that exists.
+    int8 kernels are CPU-only, so it is skipped when serving on CUDA. TorchScript exports
+    are only used if the export report matches the current .pth, and "auto" skips int8
+    when its recorded accuracy drop exceeds DISEASE_INT8_MAX_TOP1_DROP.
+    """
+    variant = settings.DISEASE_MODEL_VARIANT.lower()
+    candidates = {
+        "auto": ["int8", "torchscript", "eager"],
+        "int8": ["int8", "eager"],
+        "torchscript": ["torchscript", "eager"],
+    }.get(variant, ["eager"])
+    report = None
+    for name in candidates:
+        if name == "eager":
+            return name
+        if name == "int8" and device.type != "cpu":
+            continue
+        if name not in files or not os.path.exists(files[name]):
+            continue
+        if report is None:
+            report = _export_report(files)
+            if not _exported_from_current(files, report):
+                print("Disease TorchScript exports do not match the current .pth, serving eager")
+                return "eager"
+        if name == "int8" and variant == "auto":
+            drop = report.get("int8_top1_drop")
+            if drop is None or drop > settings.DISEASE_INT8_MAX_TOP1_DROP:
+                print(f"Disease int8 top-1 drop {drop} exceeds {settings.DISEASE_INT8_MAX_TOP1_DROP}, skipping int8")
+                continue
+        return name
+    return "eager"
+
+
+class DiseaseModel(NamedTuple):
+    net: Any
+    variant: str
+    idx_to_label: Dict[int, str]
+
+
+def _resolve() -> Artifact:
+    return store.resolve("disease", {
+        "model": MODEL_PATH,
+        "labels": LABELS_PATH,
+        "torchscript": TORCHSCRIPT_PATH,
+        "int8": INT8_PATH,
+        "export_report": EXPORT_REPORT_PATH,
+    })
+
+
+def _build(artifact: Artifact) -> DiseaseModel:
+    """
+    Load the fastest available artifact of this version; falls back to the eager float model.
+    """
+    _configure_threads()
+    labels = _read_labels(artifact.files.get("labels", LABELS_PATH))
+    variant = _select_variant(artifact.files)
+    if variant == "int8":
+        engine = _quantized_engine(artifact.files)
+        if engine in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = engine
+        net = torch.jit.load(str(artifact.files["int8"]), map_location="cpu")
+    elif variant == "torchscript":
+        net = torch.jit.load(str(artifact.files["torchscript"]), map_location=device)
+    else:
+        net = load_disease_model(artifact.path, len(labels))
+    net.eval()
+    print(f"Disease model {artifact.version}: {variant}")
+    return DiseaseModel(net, variant, dict(enumerate(labels)))
+
+
+# Loaded on first use or by the registry warmup, not at import time
+_served = HotSwapModel("disease", _resolve, _build)
+
+
+def _current() -> Served:
+    return _served.get()
+
+
+def _load_model():
+    return _current().value.net
+
+
+def _reload() -> bool:
+    return _served.reload()
+
+
+def served_version() -> Optional[str]:
+    """Version currently served (None before the first load)."""
+    return _served.current.version if _served.current else None
 
 # ---------------------------------------------------------
-# PREDICTION FUNCTION
+# PREDICTION FUNCTIONS
 # ---------------------------------------------------------
-def predict_disease(image_path: str):
+# Raw upload bytes, a file object (e.g. UploadFile.file) or a path on disk
+ImageSource = Union[bytes, bytearray, memoryview, BinaryIO, str, os.PathLike]
+
+IMG_SIZE = (224, 224)
+
+
+def _decode_image(source: ImageSource) -> Image.Image:
+    """
+    Decode an image fully in memory.
+    For JPEGs, draft() lets libjpeg decode at a reduced scale that is still >= 224x224,
+    which skips most of the IDCT work on large camera photos.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        fp = io.BytesIO(source)
+    elif hasattr(source, "read"):
+        fp = source
+        if hasattr(fp, "seek"):
+            fp.seek(0)
+    else:
+        fp = source
+
     try:
-        img = Image.open(image_path).convert("RGB")
+        img = Image.open(fp)
+        img.draft("RGB", IMG_SIZE)
+        return img.convert("RGB")
     except Exception as e:
         raise ValueError(f"Invalid image file: {str(e)}")
 
-    img_tensor = transform(img).unsqueeze(0).to(device)
 
-    with torch.no_grad():
-        outputs = model(img_tensor)
+def _load_image_tensor(source: ImageSource) -> torch.Tensor:
+    with metrics.stage("disease", "decode"):
+        img = _decode_image(source)
+    with metrics.stage("disease", "preprocess"):
+        return transform(img)
+
+
+def _predict_tensors(tensors: List[torch.Tensor]) -> List[Dict[str, Any]]:
+    """
+    Run one forward pass over a list of (3, 224, 224) tensors.
+    """
+    served = _current()
+    bundle: DiseaseModel = served.value
+    batch = torch.stack(tensors).to(device)
+
+    with metrics.stage("disease", "inference"), torch.no_grad():
+        outputs = bundle.net(batch)
         probabilities = torch.softmax(outputs, dim=1)
         confidence, predicted_idx = torch.max(probabilities, 1)
 
-    predicted_label = IDX_TO_LABEL[predicted_idx.item()]
+    return [
+        {
+            "predicted_class": bundle.idx_to_label[int(idx)],
+            "confidence": float(conf),
+            "model_version": served.version
+        }
+        for conf, idx in zip(confidence.tolist(), predicted_idx.tolist())
+    ]
+
+
+def predict_disease_bytes(source: ImageSource) -> Dict[str, Any]:
+    """
+    Predict from an in-memory image (bytes, memoryview or file object).
+    """
+    return _predict_tensors([_load_image_tensor(source)])[0]
+
+
+def predict_disease(image_path: str):
+    # Path-based wrapper kept for scripts
+    return _predict_tensors([_load_image_tensor(image_path)])[0]
+
+
+# ---------------------------------------------------------
+# MICRO-BATCHED ASYNC PREDICTION
+# ---------------------------------------------------------
+# forward passes run on the shared torch inference pool
+batcher = MicroBatcher(
+    _predict_tensors,
+    max_batch_size=settings.DISEASE_BATCH_MAX_SIZE,
+    max_wait_ms=settings.DISEASE_BATCH_MAX_WAIT_MS,
+    name="disease-batcher",
+    execute=torch_pool.execute
+)
+registry.on_shutdown(batcher.stop)
+
+_decode_pool = ThreadPoolExecutor(
+    max_workers=max(1, settings.DISEASE_DECODE_WORKERS),
+    thread_name_prefix="disease-decode"
+)
+
+
+async def predict_disease_async(source: ImageSource) -> Dict[str, Any]:
+    """
+    Decode off the event loop, then join the shared batch for the forward pass.
+    Raises PoolSaturatedError when the torch pool already holds its limit of requests.
+    """
+    async with torch_pool.admit():
+        loop = asyncio.get_running_loop()
+        img_tensor = await loop.run_in_executor(_decode_pool, _load_image_tensor, source)
+        return await batcher.submit(img_tensor)
+
+
+# ---------------------------------------------------------
+# MULTI-IMAGE SCANS
+# ---------------------------------------------------------
+
+
+async def predict_disease_many(
+    sources: List[Tuple[str, ImageSource]],
+    batch_size: int = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Predict many (name, image) pairs, yielding one result per image as each batch finishes.
+    Images are decoded in parallel on a thread pool, at most two batches ahead of the
+    model so memory stays bounded, and run through the network in fixed-size batches.
+    Undecodable images yield an "error" entry instead of a prediction.
+    The whole scan holds one torch pool slot; raises PoolSaturatedError if none is free.
+    """
+    batch_size = max(1, batch_size or settings.DISEASE_BULK_BATCH_SIZE)
+    loop = asyncio.get_running_loop()
+
+    def submit(start: int):
+        return [
+            loop.run_in_executor(_decode_pool, _load_image_tensor, src)
+            for _, src in sources[start:start + batch_size]
+        ]
+
+    async with torch_pool.admit():
+        pending = [submit(0), submit(batch_size)]
+        for start in range(0, len(sources), batch_size):
+            decodes = pending.pop(0)
+            pending.append(submit(start + 2 * batch_size))
+
+            tensors = await asyncio.gather(*decodes, return_exceptions=True)
+            good = [i for i, t in enumerate(tensors) if not isinstance(t, Exception)]
+            preds = await batcher.run_batch([tensors[i] for i in good]) if good else []
+            by_pos = dict(zip(good, preds))
 
-    return {
-        "predicted_class": predicted_label,
-        "confidence": float(confidence.item())
-    }
+            for i, t in enumerate(tensors):
+                name = sources[start + i][0]
+                if i in by_pos:
+                    yield {"index": start + i, "filename": name, **by_pos[i]}
+                else:
+                    yield {"index": start + i, "filename": name, "error": str(t)}
@@ -0,0 +1,169 @@
+"""
+Sensor feature store
+- In-process, keyed by sensor_id: a fixed-size ring buffer of the most recent readings per
+  sensor (SENSOR_FEATURE_WINDOW rows), so memory per sensor never grows.
+- Updated as readings are written (sensor routes / write-behind buffer) and rebuilt at startup
+  from MongoDB with one aggregation ($topN per sensor).
+- features(sensor_id) is O(1): latest values, previous moisture (the Previous_Soil_Moisture lag
+  the irrigation model expects), moisture delta and rolling means kept as running sums.
+- Readings older than a sensor's newest one (or without soil moisture) are ignored, so the
+  buffer stays in time order and the running sums stay finite. Timestamps are normalized with
+  parse_timestamp (older rows store ISO strings); readings whose timestamp cannot be parsed are skipped.
+"""
+
+import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.config.settings import settings
+from src.utils.timestamps import parse_timestamp
+
+METRICS = ["temp_C", "humidity_pct", "soil_moisture_pct", "pH"]
+MOISTURE = METRICS.index("soil_moisture_pct")
+# rolling means over the last N readings (capped at the buffer size)
+ROLLING_WINDOWS = (3, 12)
+
+
+def _timestamp(value: Any) -> Optional[datetime.datetime]:
+    """Naive UTC datetime, or None when the reading has no usable timestamp."""
+    if value is None or value == "":
+        return None
+    try:
+        return parse_timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+class UnknownSensorError(LookupError):
+    pass
+
+
+class _Ring:
+    __slots__ = ("values", "times", "head", "count", "windows", "sums")
+
+    def __init__(self, capacity: int, windows: List[int]):
+        self.values = np.full((capacity, len(METRICS)), np.nan)
+        self.times: List[Optional[datetime.datetime]] = [None] * capacity
+        self.head = 0
+        self.count = 0
+        self.windows = windows
+        self.sums = np.zeros(len(windows))
+
+    @property
+    def capacity(self) -> int:
+        return len(self.values)
+
+    def _at(self, back: int) -> np.ndarray:
+        """Reading `back` steps before the newest (0 = newest)."""
+        return self.values[(self.head - 1 - back) % self.capacity]
+
+    def push(self, ts: datetime.datetime, row: np.ndarray):
+        moisture = row[MOISTURE]
+        for j, w in enumerate(self.windows):
+            if self.count >= w:
+                self.sums[j] -= self._at(w - 1)[MOISTURE]
+            self.sums[j] += moisture
+        self.values[self.head] = row
+        self.times[self.head] = ts
+        self.head = (self.head + 1) % self.capacity
+        self.count += 1
+
+    @property
+    def last_timestamp(self) -> Optional[datetime.datetime]:
+        return self.times[(self.head - 1) % self.capacity] if self.count else None
+
+
+class SensorFeatureStore:
+    def __init__(self, capacity: int = 24, windows=ROLLING_WINDOWS):
+        self.capacity = max(2, int(capacity))
+        self.windows = [min(int(w), self.capacity) for w in windows]
+        self._rings: Dict[str, _Ring] = {}
+        self.stats = {"updates": 0, "stale": 0, "invalid": 0, "rebuilt_sensors": 0}
+
+    def __len__(self):
+        return len(self._rings)
+
+    def __contains__(self, sensor_id: str):
+        return sensor_id in self._rings
+
+    def add(self, doc: Dict[str, Any]):
+        sensor_id = doc.get("sensor_id")
+        if sensor_id is None or doc.get("timestamp") is None or doc.get("soil_moisture_pct") is None:
+            return
+        ts = _timestamp(doc["timestamp"])
+        if ts is None:
+            self.stats["invalid"] += 1
+            return
+        ring = self._rings.get(sensor_id)
+        if ring is None:
+            ring = self._rings[sensor_id] = _Ring(self.capacity, self.windows)
+        elif ts < ring.last_timestamp:
+            self.stats["stale"] += 1
+            return
+        ring.push(ts, np.array([np.nan if doc.get(m) is None else float(doc[m]) for m in METRICS]))
+        self.stats["updates"] += 1
+
+    def add_many(self, docs: Iterable[Dict[str, Any]]):
+        for doc in sorted(docs, key=lambda d: _timestamp(d.get("timestamp")) or datetime.datetime.min):
+            self.add(doc)
+
+    def features(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        """Lag / rolling features from the buffered readings, or None for an unknown sensor."""
+        ring = self._rings.get(sensor_id)
+        if ring is None or not ring.count:
+            return None
+        latest = ring._at(0)
+        moisture = float(latest[MOISTURE])
+        previous = float(ring._at(1)[MOISTURE]) if ring.count > 1 else None
+        out = {
+            "sensor_id": sensor_id,
+            "last_timestamp": ring.last_timestamp.isoformat(),
+            "readings": min(ring.count, ring.capacity),
+            **{m: float(latest[i]) for i, m in enumerate(METRICS)},
+            # the newest reading is the lag for the next step's prediction
+            "previous_moisture": moisture,
+            "moisture_delta": moisture - previous if previous is not None else None,
+        }
+        for w, s in zip(ring.windows, ring.sums):
+            out[f"moisture_mean_{w}"] = float(s) / min(ring.count, w)
+        return out
+
+    def require(self, sensor_id: str) -> Dict[str, Any]:
+        feats = self.features(sensor_id)
+        if feats is None:
+            raise UnknownSensorError(f"No readings for sensor '{sensor_id}'")
+        return feats
+
+    async def rebuild(self, db, collection: str = "sensor_readings") -> int:
+        """Reload the newest `capacity` readings of every sensor with one aggregation."""
+        pipeline = [
+            {"$group": {
+                "_id": "$sensor_id",
+                "rows": {"$topN": {
+                    "n": self.capacity,
+                    "sortBy": {"timestamp": -1},
+                    "output": {"timestamp": "$timestamp", **{m: f"${m}" for m in METRICS}},
+                }},
+            }},
+        ]
+        rings: Dict[str, _Ring] = {}
+        async for group in db[collection].aggregate(pipeline, allowDiskUse=True):
+            # BSON sorts strings before dates, so mixed rows are re-sorted after normalizing
+            rows = []
+            for row in group["rows"]:
+                ts = _timestamp(row.get("timestamp"))
+                if ts is None or row.get("soil_moisture_pct") is None:
+                    continue
+                rows.append((ts, row))
+            if not rows:
+                continue
+            ring = rings[group["_id"]] = _Ring(self.capacity, self.windows)
+            for ts, row in sorted(rows, key=lambda r: r[0]):
+                ring.push(ts, np.array([np.nan if row.get(m) is None else float(row[m]) for m in METRICS]))
+        self._rings = rings
+        self.stats["rebuilt_sensors"] = len(rings)
+        return len(rings)
+
+
+feature_store = SensorFeatureStore(settings.SENSOR_FEATURE_WINDOW)
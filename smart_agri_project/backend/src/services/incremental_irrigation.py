@@ -0,0 +1,284 @@
+"""
+Incremental irrigation retraining from live sensor_readings.
+Run from backend/:  python -m src.services.incremental_irrigation [--mode window]
+
+- Reads only readings after the stored watermark (timestamp, plus the ids already seen at
+  that exact timestamp), in timestamp order, batch by batch.
+- Previous_Soil_Moisture is the previous reading of the same sensor_id. The last moisture per
+  sensor is kept in the state, so the lag carries across batches and runs.
+- Features go through irrigation_service._build_feature_matrix, the same mapping serving uses.
+- ~15% of rows (hash of sensor_id/timestamp) go to a bounded holdout buffer. The rest feed either
+  "warm_start" (new trees added to the served forest, oldest dropped past the max) or
+  "window" (a fresh forest on the most recent rows).
+- The candidate is published to the model store only if its holdout RMSE is not worse than the
+  served model's. The registry watcher then hot-swaps it into serving.
+- Each run costs the new rows plus the bounded buffers, never the whole history.
+
+State lives in <MODEL_STORE_DIR>/irrigation_incremental/ (state.json + buffers.npz).
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from src.config.settings import settings
+from src.services.irrigation_service import EXPECTED_FEATURES, MODEL_PATH, _build_feature_matrix
+from src.services.model_store import ModelStore, backend_path, store
+
+STATE_DIR = backend_path(settings.MODEL_STORE_DIR) / "irrigation_incremental"
+TARGET = "soil_moisture_pct"
+HOLDOUT_FRACTION = 0.15
+# no publish decision is made on fewer holdout rows than this
+MIN_HOLDOUT_ROWS = 20
+FETCH_BATCH_ROWS = 10000
+
+READING_FIELDS = ["_id", "sensor_id", "timestamp", "temp_C", "humidity_pct", TARGET]
+
+
+@dataclass
+class RetrainState:
+    watermark: Optional[str] = None
+    # ids already consumed at exactly the watermark timestamp ($gte query, so ties are not lost)
+    watermark_ids: List[str] = field(default_factory=list)
+    last_moisture: Dict[str, float] = field(default_factory=dict)
+    model_version: Optional[str] = None
+    runs: int = 0
+
+
+def _empty_buffers() -> Dict[str, np.ndarray]:
+    k = len(EXPECTED_FEATURES)
+    return {"holdout_X": np.empty((0, k)), "holdout_y": np.empty(0),
+            "window_X": np.empty((0, k)), "window_y": np.empty(0)}
+
+
+def load_state(state_dir: Path = STATE_DIR) -> Tuple[RetrainState, Dict[str, np.ndarray]]:
+    state = RetrainState()
+    buffers = _empty_buffers()
+    try:
+        with open(state_dir / "state.json", "r") as f:
+            state = RetrainState(**json.load(f))
+        with np.load(state_dir / "buffers.npz") as data:
+            buffers = {k: data[k] for k in buffers}
+    except FileNotFoundError:
+        pass
+    return state, buffers
+
+
+def save_state(state: RetrainState, buffers: Dict[str, np.ndarray], state_dir: Path = STATE_DIR):
+    """Buffers first, state.json last: the watermark only moves once the data it covers is saved."""
+    state_dir.mkdir(parents=True, exist_ok=True)
+    tmp = state_dir / "buffers.tmp.npz"
+    np.savez(tmp, **buffers)
+    os.replace(tmp, state_dir / "buffers.npz")
+    tmp = state_dir / "state.tmp.json"
+    with open(tmp, "w") as f:
+        json.dump(asdict(state), f, indent=2)
+    os.replace(tmp, state_dir / "state.json")
+
+
+async def iter_new_readings(collection,
+                            watermark: Optional[datetime.datetime],
+                            seen_ids: List[str],
+                            batch_rows: int = FETCH_BATCH_ROWS) -> AsyncIterator[pd.DataFrame]:
+    """Readings after the watermark in timestamp order, as DataFrames of up to batch_rows."""
+    query = {"timestamp": {"$gte": watermark}} if watermark else {}
+    seen = set(seen_ids)
+    cursor = collection.find(query, {f: 1 for f in READING_FIELDS}) \
+        .sort([("timestamp", 1), ("_id", 1)]).batch_size(batch_rows)
+    batch = []
+    async for doc in cursor:
+        if str(doc["_id"]) in seen:
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_rows:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def lagged_features(batch: pd.DataFrame, last_moisture: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    (X, y, rows) for one timestamp-ordered batch. `last_moisture` is updated in place with the
+    newest moisture per sensor; a sensor's very first reading has no lag and is dropped.
+    """
+    batch = batch.dropna(subset=[TARGET]).reset_index(drop=True)
+    prev = batch.groupby("sensor_id", sort=False)[TARGET].shift(1)
+    prev = prev.fillna(batch["sensor_id"].map(last_moisture))
+    last_moisture.update(batch.groupby("sensor_id", sort=False)[TARGET].last().astype(float).to_dict())
+
+    keep = prev.notna().to_numpy()
+    rows = batch[keep].reset_index(drop=True)
+    records = pd.DataFrame({
+        "humidity": rows["humidity_pct"],
+        "temperature": rows["temp_C"],
+        "previous_soil_moisture": prev[keep].to_numpy(),
+    }).to_dict("records")
+    X = _build_feature_matrix(records)
+    return X, rows[TARGET].to_numpy(dtype=float), rows
+
+
+def is_holdout(rows: pd.DataFrame) -> np.ndarray:
+    """Stable holdout membership from sensor_id + timestamp."""
+    h = pd.util.hash_pandas_object(rows[["sensor_id", "timestamp"]].astype(str), index=False).to_numpy()
+    return h / float(2 ** 64) < HOLDOUT_FRACTION
+
+
+def _frame(X: np.ndarray) -> pd.DataFrame:
+    # the forest was fitted on a DataFrame; keep its feature names
+    return pd.DataFrame(X, columns=EXPECTED_FEATURES)
+
+
+def rmse(model, X: np.ndarray, y: np.ndarray) -> float:
+    return float(np.sqrt(np.mean((model.predict(_frame(X)) - y) ** 2)))
+
+
+def grow_forest(model: RandomForestRegressor, X: np.ndarray, y: np.ndarray,
+                trees: int, max_trees: int) -> RandomForestRegressor:
+    """Add `trees` trees fitted on the new rows only; keep at most the newest `max_trees`."""
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees)
+    model.fit(_frame(X), y)
+    if len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+    model.set_params(warm_start=False)
+    return model
+
+
+def refit_window(X: np.ndarray, y: np.ndarray, trees: int = 100) -> RandomForestRegressor:
+    model = RandomForestRegressor(n_estimators=trees, random_state=42, n_jobs=-1)
+    model.fit(_frame(X), y)
+    return model
+
+
+def _tail(a: np.ndarray, b: np.ndarray, limit: int) -> np.ndarray:
+    out = np.concatenate([a, b]) if len(b) else a
+    return out[-limit:] if limit and len(out) > limit else out
+
+
+async def run_incremental(batches: Optional[AsyncIterator[pd.DataFrame]] = None,
+                          model_store: ModelStore = store,
+                          state_dir: Path = STATE_DIR,
+                          mode: str = settings.IRRIGATION_RETRAIN_MODE,
+                          trees_per_run: int = settings.IRRIGATION_RETRAIN_TREES_PER_RUN,
+                          max_trees: int = settings.IRRIGATION_RETRAIN_MAX_TREES,
+                          window_rows: int = settings.IRRIGATION_RETRAIN_WINDOW_ROWS,
+                          holdout_rows: int = settings.IRRIGATION_RETRAIN_HOLDOUT_ROWS,
+                          min_rows: int = settings.IRRIGATION_RETRAIN_MIN_ROWS) -> Dict[str, Any]:
+    """One retraining run. `batches` defaults to new rows from MongoDB sensor_readings."""
+    if mode not in ("warm_start", "window"):
+        raise ValueError(f"Unknown retrain mode: {mode}")
+    state, buffers = load_state(state_dir)
+    if batches is None:
+        from src.config.database import get_database
+        watermark = datetime.datetime.fromisoformat(state.watermark) if state.watermark else None
+        batches = iter_new_readings(get_database()["sensor_readings"], watermark, state.watermark_ids)
+
+    last_moisture = dict(state.last_moisture)
+    watermark, watermark_ids = state.watermark, list(state.watermark_ids)
+    train_X, train_y, hold_X, hold_y = [], [], [], []
+    new_rows = 0
+    async for batch in batches:
+        if batch.empty:
+            continue
+        new_rows += len(batch)
+        newest = batch["timestamp"].max()
+        at_newest = batch.loc[batch["timestamp"] == newest, "_id"].astype(str).tolist()
+        newest = newest.isoformat()
+        watermark_ids = (watermark_ids + at_newest) if newest == watermark else at_newest
+        watermark = newest
+
+        X, y, rows = lagged_features(batch, last_moisture)
+        hold = is_holdout(rows) if len(rows) else np.zeros(0, dtype=bool)
+        train_X.append(X[~hold])
+        train_y.append(y[~hold])
+        hold_X.append(X[hold])
+        hold_y.append(y[hold])
+
+    k = len(EXPECTED_FEATURES)
+    train_X = np.concatenate(train_X) if train_X else np.empty((0, k))
+    train_y = np.concatenate(train_y) if train_y else np.empty(0)
+    summary: Dict[str, Any] = {"new_rows": new_rows, "train_rows": len(train_y),
+                               "watermark": watermark, "published": None}
+    if len(train_y) < min_rows:
+        # watermark stays put: these rows are read again next run, together with newer ones
+        summary["status"] = "waiting"
+        print(f"Incremental irrigation: {len(train_y)} new training rows (< {min_rows}), nothing to do")
+        return summary
+
+    buffers["holdout_X"] = _tail(buffers["holdout_X"], np.concatenate(hold_X), holdout_rows)
+    buffers["holdout_y"] = _tail(buffers["holdout_y"], np.concatenate(hold_y), holdout_rows)
+    buffers["window_X"] = _tail(buffers["window_X"], train_X, window_rows)
+    buffers["window_y"] = _tail(buffers["window_y"], train_y, window_rows)
+    hX, hy = buffers["holdout_X"], buffers["holdout_y"]
+
+    try:
+        artifact = model_store.resolve("irrigation", {"model": MODEL_PATH})
+        current = joblib.load(artifact.path)
+        base_version = artifact.version
+    except FileNotFoundError:
+        current, base_version = None, None
+
+    if current is not None and mode == "warm_start" and hasattr(current, "estimators_"):
+        # the loaded copy is ours to modify; score it before it grows
+        current_rmse = rmse(current, hX, hy) if len(hy) else None
+        candidate = grow_forest(current, train_X, train_y, trees_per_run, max_trees)
+        method = "warm_start"
+    else:
+        current_rmse = rmse(current, hX, hy) if current is not None and len(hy) else None
+        candidate = refit_window(buffers["window_X"], buffers["window_y"])
+        method = "window"
+    candidate_rmse = rmse(candidate, hX, hy) if len(hy) else None
+
+    summary.update({"mode": method, "base_version": base_version, "holdout_rows": len(hy),
+                    "holdout_rmse": candidate_rmse, "previous_holdout_rmse": current_rmse})
+    if len(hy) < MIN_HOLDOUT_ROWS:
+        summary["status"] = "not_enough_holdout"
+    elif current_rmse is not None and candidate_rmse > current_rmse:
+        summary["status"] = "rejected"
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            model_file = Path(tmp) / "irrigation_rf.pkl"
+            joblib.dump(candidate, model_file)
+            manifest = model_store.publish(
+                "irrigation", {"model": model_file},
+                features=EXPECTED_FEATURES,
+                metrics={"holdout_rmse": candidate_rmse, "previous_holdout_rmse": current_rmse,
+                         "holdout_rows": len(hy), "train_rows": len(train_y)},
+                extra={"incremental": {"mode": method, "base_version": base_version,
+                                       "watermark": watermark, "trees": len(candidate.estimators_)}}
+            )
+        summary["status"] = "published"
+        summary["published"] = state.model_version = manifest["version"]
+
+    # the new rows now live in the buffers (and in the model if published): move past them
+    state.watermark, state.watermark_ids = watermark, watermark_ids
+    state.last_moisture = last_moisture
+    state.runs += 1
+    save_state(state, buffers, state_dir)
+    print(f"Incremental irrigation: {summary['status']} ({len(train_y)} new training rows, "
+          f"holdout RMSE {candidate_rmse} vs {current_rmse})")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the irrigation model on new sensor readings")
+    parser.add_argument("--mode", choices=["warm_start", "window"], default=settings.IRRIGATION_RETRAIN_MODE)
+    parser.add_argument("--trees", type=int, default=settings.IRRIGATION_RETRAIN_TREES_PER_RUN)
+    parser.add_argument("--max_trees", type=int, default=settings.IRRIGATION_RETRAIN_MAX_TREES)
+    parser.add_argument("--min_rows", type=int, default=settings.IRRIGATION_RETRAIN_MIN_ROWS)
+    args = parser.parse_args()
+    result = asyncio.run(run_incremental(mode=args.mode, trees_per_run=args.trees,
+                                         max_trees=args.max_trees, min_rows=args.min_rows))
+    print(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,230 @@
+"""
+Inference executor pools
+- CPU-bound model calls run here instead of on the event loop, one pool per model type:
+  "torch" is a thread pool (torch releases the GIL in its kernels) and "sklearn" a process
+  pool (forest prediction holds the GIL), each sized from Settings.
+- Admission control: a pool accepts at most workers + max_queue calls at once. Beyond that
+  run() / admit() raise PoolSaturatedError, which routes answer with 503 + Retry-After, so a
+  saturated model type sheds load instead of queueing without bound and slowing every endpoint.
+- stats() reports in-flight / queued calls, totals, mean run time and utilization
+  (busy worker-seconds / available worker-seconds since the pool started).
+- Process pools use the "spawn" start method (the server process has torch / motor threads
+  that must not be forked), start on first use and are recreated if a worker dies. Workers send
+  the metrics they recorded back with each result, so stage timings and cache hits in workers
+  reach /metrics; queue wait and run time per pool are recorded here.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config.settings import settings
+from src.services.model_registry import registry
+from src.utils.metrics import metrics
+
+pool_wait_seconds = metrics.histogram(
+    "smartagri_pool_wait_seconds", "Time a call waited for a free pool worker.", ("pool",))
+pool_run_seconds = metrics.histogram(
+    "smartagri_pool_run_seconds", "Time a call ran on a pool worker.", ("pool",))
+
+
+class PoolSaturatedError(Exception):
+    def __init__(self, pool: str, pending: int, retry_after_s: float):
+        super().__init__(f"{pool} inference pool is saturated ({pending} calls pending), retry later")
+        self.pool = pool
+        self.retry_after_s = retry_after_s
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, int(round(self.retry_after_s))))}
+
+
+def _timed(fn: Callable, args: Tuple, in_process: bool) -> Tuple[Any, float, Optional[dict]]:
+    # runs in the worker; the duration excludes time spent waiting in the executor queue
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    return result, seconds, metrics.drain() if in_process else None
+
+
+def _init_sklearn_worker():
+    """Load the forests once per worker process instead of on its first request."""
+    for module in ("src.services.irrigation_service", "src.services.yield_service"):
+        try:
+            __import__(module, fromlist=["_load_model"])._load_model()
+        except Exception as e:
+            print(f"sklearn worker: {module} not loaded: {e}")
+
+
+class InferencePool:
+    def __init__(self,
+                 name: str,
+                 kind: str = "thread",
+                 workers: int = 1,
+                 max_queue: int = 64,
+                 retry_after_s: float = 1.0,
+                 initializer: Optional[Callable[[], None]] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after_s = retry_after_s
+        self.initializer = initializer
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._started = time.monotonic()
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._busy_s = 0.0
+
+    @property
+    def limit(self) -> int:
+        return self.workers + self.max_queue
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=self.initializer
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix=f"{self.name}-pool",
+                        initializer=self.initializer
+                    )
+            return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.limit:
+                self.counters["rejected"] += 1
+                raise PoolSaturatedError(self.name, self._pending, self.retry_after_s)
+            self._pending += 1
+            self.counters["submitted"] += 1
+
+    def check(self):
+        """
+        Raise PoolSaturatedError if a call would be refused right now, without taking a slot.
+        For streaming routes, which must answer 503 before the response starts.
+        """
+        with self._lock:
+            if self._pending >= self.limit:
+                self.counters["rejected"] += 1
+                raise PoolSaturatedError(self.name, self._pending, self.retry_after_s)
+
+    def _release(self, ok: bool):
+        with self._lock:
+            self._pending -= 1
+            self.counters["completed" if ok else "failed"] += 1
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Count a request against the pool limit without running it here, for work that reaches
+        the pool in another shape (e.g. disease requests coalesced by the micro-batcher).
+        """
+        self._acquire()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self._release(ok)
+
+    async def execute(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool with timing, without admission control."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            result, seconds, recorded = await loop.run_in_executor(
+                self.executor, _timed, fn, args, self.kind == "process")
+        except BrokenExecutor:
+            # a worker process died; start a fresh pool for the next call
+            with self._lock:
+                self._executor = None
+            raise
+        with self._lock:
+            self._busy_s += seconds
+        if recorded:
+            metrics.merge(recorded)
+        pool_run_seconds.observe(seconds, self.name)
+        pool_wait_seconds.observe(max(0.0, time.perf_counter() - start - seconds), self.name)
+        return result
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Admit, then run fn(*args). Raises PoolSaturatedError when the pool is full."""
+        async with self.admit():
+            return await self.execute(fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started, 1e-9)
+            done = self.counters["completed"] + self.counters["failed"]
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._pending,
+                "queued": max(0, self._pending - self.workers),
+                "busy_workers": min(self._pending, self.workers),
+                **self.counters,
+                "busy_seconds": round(self._busy_s, 3),
+                "mean_run_ms": round(self._busy_s / done * 1000.0, 3) if done else None,
+                "utilization": round(min(1.0, self._busy_s / (elapsed * self.workers)), 4),
+            }
+
+    async def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+torch_pool = InferencePool(
+    "torch",
+    kind="thread",
+    workers=settings.TORCH_POOL_WORKERS,
+    max_queue=settings.TORCH_POOL_MAX_QUEUE,
+    retry_after_s=settings.INFERENCE_RETRY_AFTER_S
+)
+sklearn_pool = InferencePool(
+    "sklearn",
+    kind=settings.SKLEARN_POOL_KIND,
+    workers=settings.SKLEARN_POOL_WORKERS,
+    max_queue=settings.SKLEARN_POOL_MAX_QUEUE,
+    retry_after_s=settings.INFERENCE_RETRY_AFTER_S,
+    initializer=_init_sklearn_worker if settings.SKLEARN_POOL_KIND == "process" else None
+)
+pools = {p.name: p for p in (torch_pool, sklearn_pool)}
+
+registry.on_shutdown(torch_pool.shutdown)
+registry.on_shutdown(sklearn_pool.shutdown)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+@metrics.collector
+def _pool_gauges():
+    stats = pool_stats()
+    gauges = [
+        ("smartagri_pool_in_flight", "gauge", "Calls admitted and not yet finished.", "in_flight"),
+        ("smartagri_pool_queued", "gauge", "Admitted calls waiting for a worker.", "queued"),
+        ("smartagri_pool_utilization", "gauge", "Busy worker-seconds / available worker-seconds since start.", "utilization"),
+        ("smartagri_pool_rejected_total", "counter", "Calls refused with 503 because the pool was full.", "rejected"),
+    ]
+    return [(name, kind, help, [(name, {"pool": p}, float(s[key])) for p, s in stats.items()])
+            for name, kind, help, key in gauges]
@@ -0,0 +1,188 @@
+"""
+Whole-farm irrigation scheduling
+- Rolls soil moisture forward over a multi-day horizon for every plot at once: each day is one
+  model call over an (n_plots, features) matrix, and that day's moisture (after rain and
+  irrigation) becomes the next day's Previous_Soil_Moisture. One model step = one forecast day.
+- Rain and irrigation add `moisture_per_mm` % per mm of water (per plot, soil dependent).
+- Plots whose predicted moisture falls below their trigger are topped up to their target
+  (capped at max_irrigation_mm per event). When the daily pump capacity or the remaining water
+  budget cannot cover every plot, the most urgent plots (furthest below trigger) are served first
+  and the rest carry their deficit into the next day's prediction.
+- schedule_irrigation_async() resolves sensor start moisture in the server process and runs
+  the roll-forward on the sklearn inference pool.
+"""
+
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.services import irrigation_service
+from src.services.feature_store import feature_store
+from src.services.inference_pool import sklearn_pool
+from src.services.irrigation_service import (
+    IRRIGATION_NEEDED_BELOW, MONITOR_BELOW, feature_matrix_from_columns
+)
+from src.utils.metrics import metrics
+
+WEATHER_FIELDS = {
+    "temperature": "Atmospheric_Temp",
+    "humidity": "Humidity",
+    "Soil_Temp": "Soil_Temp",
+    "Dew_Point": "Dew_Point",
+}
+
+
+def _plot_array(plots: List[Dict[str, Any]], key: str, default: float) -> np.ndarray:
+    return np.array([default if p.get(key) is None else p[key] for p in plots], dtype=float)
+
+
+def _start_moisture(plots: List[Dict[str, Any]]) -> np.ndarray:
+    """previous_moisture if given, else the sensor's newest reading from the feature store."""
+    out = np.empty(len(plots))
+    for i, p in enumerate(plots):
+        if p.get("previous_moisture") is not None:
+            out[i] = p["previous_moisture"]
+        elif p.get("sensor_id"):
+            out[i] = feature_store.require(p["sensor_id"])["previous_moisture"]
+        else:
+            raise ValueError(f"Plot {p.get('plot_id')}: needs previous_moisture or a sensor_id")
+    return out
+
+
+def _weather(plots: List[Dict[str, Any]], forecast: List[Dict[str, Any]], horizon: int) -> Dict[str, np.ndarray]:
+    """(n_plots, horizon) arrays per weather field: the farm forecast, with per-plot overrides."""
+    def table(days: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        days = days[:horizon]
+        return {f: np.array([np.nan if d.get(f) is None else d[f] for d in days], dtype=float)
+                for f in list(WEATHER_FIELDS) + ["rainfall"]}
+
+    n = len(plots)
+    farm = table(forecast or [])
+    out = {f: np.full((n, horizon), np.nan) for f in farm}
+    if len(forecast or []) >= horizon:
+        for f, values in farm.items():
+            out[f][:] = values
+    for i, p in enumerate(plots):
+        days = p.get("forecast")
+        if days:
+            if len(days) < horizon:
+                raise ValueError(f"Plot {p.get('plot_id')}: forecast covers {len(days)} of {horizon} days")
+            for f, values in table(days).items():
+                out[f][i] = values
+        elif len(forecast or []) < horizon:
+            raise ValueError(f"Farm forecast covers {len(forecast or [])} of {horizon} days "
+                             f"and plot {p.get('plot_id')} has none of its own")
+    out["rainfall"] = np.nan_to_num(out["rainfall"], nan=0.0)
+    return out
+
+
+def _allocate(need_m3: np.ndarray, urgency: np.ndarray, limit: float) -> np.ndarray:
+    """Water per plot within `limit`, most urgent (lowest urgency value) first; one plot may get a partial share."""
+    if not np.isfinite(limit) or need_m3.sum() <= limit:
+        return need_m3
+    order = np.argsort(urgency, kind="stable")
+    wanted = need_m3[order]
+    before = np.cumsum(wanted) - wanted
+    served = np.empty_like(need_m3)
+    served[order] = np.clip(limit - before, 0.0, wanted)
+    return served
+
+
+def schedule_irrigation(plots: List[Dict[str, Any]],
+                        forecast: List[Dict[str, Any]],
+                        horizon_days: int = 7,
+                        constraints: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    start = time.perf_counter()
+    constraints = constraints or {}
+    n, horizon = len(plots), int(horizon_days)
+    if not n:
+        return {"plots": [], "daily": [], "total_water_m3": 0.0, "horizon_days": horizon}
+
+    moisture = _start_moisture(plots)
+    weather = _weather(plots, forecast, horizon)
+    area = _plot_array(plots, "area_m2", 1000.0)
+    gain = _plot_array(plots, "moisture_per_mm", 1.0)
+    trigger = _plot_array(plots, "trigger_moisture", IRRIGATION_NEEDED_BELOW)
+    target = np.maximum(_plot_array(plots, "target_moisture", MONITOR_BELOW), trigger)
+    max_mm = float(constraints.get("max_irrigation_mm") or 40.0)
+    capacity = constraints.get("pump_capacity_m3_per_day")
+    capacity = np.inf if capacity is None else float(capacity)
+    budget = constraints.get("water_budget_m3")
+    budget = np.inf if budget is None else float(budget)
+
+    served = irrigation_service._current()
+    model = served.value
+
+    predicted = np.empty((n, horizon))
+    after = np.empty((n, horizon))
+    irrigation_mm = np.zeros((n, horizon))
+    daily = []
+    for d in range(horizon):
+        cols = {feature: weather[field][:, d] for field, feature in WEATHER_FIELDS.items()}
+        cols["Previous_Soil_Moisture"] = moisture
+        X = feature_matrix_from_columns(cols)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            with metrics.stage("irrigation_schedule", "inference"):
+                pred = np.asarray(model.predict(X), dtype=float)
+        pred = np.clip(pred + weather["rainfall"][:, d] * gain, 0.0, 100.0)
+
+        need_mm = np.where(pred < trigger, np.minimum((target - pred) / gain, max_mm), 0.0)
+        need_m3 = need_mm * area / 1000.0
+        limit = min(capacity, budget)
+        water_m3 = _allocate(need_m3, pred - trigger, limit)
+        budget -= water_m3.sum()
+
+        mm = water_m3 * 1000.0 / area
+        moisture = np.clip(pred + mm * gain, 0.0, 100.0)
+        predicted[:, d], after[:, d], irrigation_mm[:, d] = pred, moisture, mm
+        daily.append({
+            "day": d,
+            "water_m3": round(float(water_m3.sum()), 3),
+            "plots_irrigated": int(np.count_nonzero(mm > 0)),
+            "plots_short": int(np.count_nonzero(water_m3 < need_m3 - 1e-9)),
+            "limit_m3": None if not np.isfinite(limit) else round(float(limit), 3),
+        })
+
+    water_per_plot = (irrigation_mm * area[:, None] / 1000.0).sum(axis=1)
+    below = (after < trigger[:, None]).sum(axis=1)
+    result_plots = [
+        {
+            "plot_id": p["plot_id"],
+            "sensor_id": p.get("sensor_id"),
+            "predicted_moisture": np.round(predicted[i], 2).tolist(),
+            "irrigation_mm": np.round(irrigation_mm[i], 2).tolist(),
+            "moisture_after": np.round(after[i], 2).tolist(),
+            "water_m3": round(float(water_per_plot[i]), 3),
+            "days_below_trigger": int(below[i]),
+        }
+        for i, p in enumerate(plots)
+    ]
+    return {
+        "model_version": served.version,
+        "horizon_days": horizon,
+        "plots": result_plots,
+        "daily": daily,
+        "total_water_m3": round(float(water_per_plot.sum()), 3),
+        "plot_days_below_trigger": int(below.sum()),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 1),
+    }
+
+
+def _schedule_in_worker(plots, forecast, horizon_days, constraints, version):
+    if version is not None and irrigation_service.served_version() != version:
+        irrigation_service._reload()
+    return schedule_irrigation(plots, forecast, horizon_days, constraints)
+
+
+async def schedule_irrigation_async(plots: List[Dict[str, Any]],
+                                    forecast: List[Dict[str, Any]],
+                                    horizon_days: int = 7,
+                                    constraints: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """schedule_irrigation on the sklearn pool; the feature store is read here, not in the worker."""
+    start = _start_moisture(plots)
+    plots = [{**p, "previous_moisture": float(m)} for p, m in zip(plots, start)]
+    return await sklearn_pool.run(_schedule_in_worker, plots, forecast, horizon_days, constraints,
+                                  irrigation_service.target_version())
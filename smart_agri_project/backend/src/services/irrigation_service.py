@@ -2,18 +2,35 @@
 Irrigation service
 - Loads a trained sklearn regressor from backend/data/models/irrigation_rf.pkl
 - Accepts a dict input with expected keys and returns predicted moisture + recommendation.
+- predict_irrigation_batch() builds one NumPy feature matrix for many inputs and calls predict once.
+- The model is resolved through the model store (published version, else IRRIGATION_MODEL_PATH)
+  and hot-swapped by the registry watcher when a new version appears; predictions are cached per
+  (model version, feature row) so a swap invalidates old entries.
+- Inputs with a sensor_id take any missing humidity / temperature / previous moisture from the
+  sensor feature store (latest buffered readings) and get its rolling features in the result.
+- Routes call predict_irrigation_batch_async(): sensor features are resolved here, in the
+  server process, and the forest runs on the sklearn inference pool (worker processes that
+  reload when the server's served version moves on).
 - Uses a robust Random Forest model trained on:
   ['Humidity', 'Atmospheric_Temp', 'Soil_Temp', 'Dew_Point', 'Previous_Soil_Moisture']
 """
 
-from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+import warnings
 import joblib
 import pandas as pd
 import numpy as np
 
-BASE_DIR = Path(__file__).resolve().parents[2]
-MODEL_PATH = BASE_DIR / "data" / "models" / "irrigation_rf.pkl"
+from src.config.settings import settings
+from src.ml.compiled_forest import compile_forest
+from src.services.feature_store import feature_store
+from src.services.inference_pool import sklearn_pool
+from src.services.model_registry import HotSwapModel, Served, registry
+from src.services.model_store import Artifact, backend_path, store
+from src.utils.metrics import metrics
+from src.utils.prediction_cache import build_cache, feature_key
+
+MODEL_PATH = backend_path(settings.IRRIGATION_MODEL_PATH)
 
 # Features expected by the NEW model
 EXPECTED_FEATURES = [
@@ -24,92 +41,227 @@ EXPECTED_FEATURES = [
     "Previous_Soil_Moisture"
 ]
 
-_model = None
+_cache = build_cache(settings, "irrigation")
+if _cache is not None:
+    registry.on_shutdown(_cache.shutdown)
+
+
+def _resolve() -> Artifact:
+    return store.resolve("irrigation", {"model": MODEL_PATH})
+
+
+def _build(artifact: Artifact):
+    model = joblib.load(artifact.path)
+    if settings.IRRIGATION_INFERENCE_BACKEND == "compiled":
+        model = compile_forest(model, max_rows=settings.COMPILED_FOREST_MAX_ROWS)
+    return model
+
+
+_served = HotSwapModel("irrigation", _resolve, _build)
+
+
+def _current() -> Served:
+    try:
+        return _served.get()
+    except FileNotFoundError:
+        raise RuntimeError(f"Irrigation model not found at {MODEL_PATH}. Train model first.")
+
 
 def _load_model():
-    global _model
-    if _model is None:
-        if not MODEL_PATH.exists():
-            raise RuntimeError(f"Irrigation model not found at {MODEL_PATH}. Train model first.")
-        _model = joblib.load(MODEL_PATH)
-    return _model
+    return _current().value
+
+
+def _reload() -> bool:
+    return _served.reload()
+
+
+def served_version() -> Optional[str]:
+    """Version currently served (None before the first load)."""
+    return _served.current.version if _served.current else None
+
+
+def target_version() -> Optional[str]:
+    """
+    Version the store selects (pin or newest), as last resolved by the registry watcher.
+    Sent with pool calls so workers follow hot swaps even if this process never loaded the model.
+    """
+    return _served.target
+
+# Accepted input names per model feature, in priority order (matched case-insensitively).
+# The first non-null value wins, so dataset-style names override frontend aliases.
+FEATURE_ALIASES = {
+    "Humidity": ["humidity"],
+    "Atmospheric_Temp": ["atmospheric_temp", "temperature"],
+    "Soil_Temp": ["soil_temp"],
+    "Dew_Point": ["dew_point"],
+    "Previous_Soil_Moisture": ["previous_soil_moisture", "previous_moisture", "soil_moisture"]
+}
+
+# Recommendation thresholds on predicted moisture (%)
+IRRIGATION_NEEDED_BELOW = 25.0
+MONITOR_BELOW = 40.0
+
+
+def _column(records: List[Dict[str, Any]], names: List[str]) -> np.ndarray:
+    """
+    Coalesce the first non-null value among `names` for every record into a float column.
+    """
+    col = np.full(len(records), np.nan)
+    for name in names:
+        missing = np.isnan(col)
+        if not missing.any():
+            break
+        values = np.array([r.get(name) for r in records], dtype=float)
+        col = np.where(missing, values, col)
+    return col
+
+
+def _build_feature_matrix(records: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Build the (n, len(EXPECTED_FEATURES)) model input for many records at once.
+    Alias mapping and Dew_Point / Soil_Temp estimation are column operations.
+    """
+    lowered = [{k.lower(): v for k, v in r.items() if v is not None} for r in records]
+    cols = {f: _column(lowered, names) for f, names in FEATURE_ALIASES.items()}
+    return feature_matrix_from_columns(cols)
+
+
+def feature_matrix_from_columns(cols: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Model input from per-feature arrays (NaN = missing). Dew_Point / Soil_Temp are
+    estimated where missing; arrays of any shape work (the last axis becomes features).
+    """
+    cols = dict(cols)
+    T = cols["Atmospheric_Temp"]
+    RH = cols["Humidity"]
+    # 1. Estimate Dew Point if missing: T - ((100 - RH)/5)
+    cols["Dew_Point"] = np.where(np.isnan(cols["Dew_Point"]), T - ((100 - RH) / 5.0), cols["Dew_Point"])
+    # 2. Estimate Soil Temp if missing: T - 2.0 (heuristic)
+    cols["Soil_Temp"] = np.where(np.isnan(cols["Soil_Temp"]), T - 2.0, cols["Soil_Temp"])
+
+    X = np.stack([np.asarray(cols[f], dtype=float) for f in EXPECTED_FEATURES], axis=-1)
+    # Default to 0.0 if still missing to prevent crash
+    return np.nan_to_num(X, nan=0.0)
+
+
+# feature store value used for a model feature when the caller gave none of its aliases
+SENSOR_FEATURES = {
+    "Humidity": "humidity_pct",
+    "Atmospheric_Temp": "temp_C",
+    "Previous_Soil_Moisture": "previous_moisture",
+}
+
+
+def _with_sensor_features(records: List[Dict[str, Any]]):
+    """
+    (records, sensor features) with inputs filled in from the feature store for records
+    that carry a sensor_id. Raises UnknownSensorError for a sensor without readings.
+    """
+    filled, feats = [], []
+    for r in records:
+        sensor_id = r.get("sensor_id")
+        if sensor_id is None:
+            filled.append(r)
+            feats.append(None)
+            continue
+        f = feature_store.require(sensor_id)
+        given = {k.lower() for k, v in r.items() if v is not None}
+        r = dict(r)
+        for feature, source in SENSOR_FEATURES.items():
+            if not given.intersection(FEATURE_ALIASES[feature]) and f.get(source) is not None:
+                r[FEATURE_ALIASES[feature][0]] = f[source]
+        filled.append(r)
+        feats.append(f)
+    return filled, feats
+
 
 def _prepare_dataframe(input_dict: Dict[str, Any]) -> pd.DataFrame:
     """
     Convert input dict into a single-row DataFrame with proper feature mapping.
     """
-    # Map frontend aliases to model features
-    alias_map = {
-        "temperature": "Atmospheric_Temp",
-        "humidity": "Humidity",
-        "previous_moisture": "Previous_Soil_Moisture",
-        "soil_moisture": "Previous_Soil_Moisture", # In case user sends this
-        "dew_point": "Dew_Point",
-        "soil_temp": "Soil_Temp"
-    }
-    
-    src = dict(input_dict)
-    
-    # Apply alias mapping
-    for k, v in list(src.items()):
-        lk = k.lower()
-        if lk in alias_map and alias_map[lk] not in src:
-            src[alias_map[lk]] = src.pop(k)
-            
-    # FEATURE ESTIMATION
-    # 1. Estimate Dew Point if missing: T - ((100 - RH)/5)
-    if "Dew_Point" not in src and "Atmospheric_Temp" in src and "Humidity" in src:
-        try:
-            T = float(src["Atmospheric_Temp"])
-            RH = float(src["Humidity"])
-            src["Dew_Point"] = T - ((100 - RH) / 5.0)
-        except Exception:
-            pass
+    return pd.DataFrame(_build_feature_matrix([input_dict]), columns=EXPECTED_FEATURES)
+
+
+def _recommend(predicted: np.ndarray) -> np.ndarray:
+    # Thresholds can be adjusted based on crop/soil knowledge
+    return np.select(
+        [predicted < IRRIGATION_NEEDED_BELOW, predicted < MONITOR_BELOW],
+        ["Irrigation Needed", "Monitor - Low"],
+        default="No Irrigation Required"
+    )
+
+
+def predict_irrigation_batch(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Predict soil moisture and recommendations for many inputs with a single model call.
+    """
+    if not records:
+        return []
+    records, sensor_feats = _with_sensor_features(records)
+    # one reference for the whole call: a concurrent hot swap does not mix versions
+    served = _current()
+    model = served.value
+
+    with metrics.stage("irrigation", "preprocess"):
+        X = _build_feature_matrix(records)
+    preds = np.empty(len(records))
+    todo = np.arange(len(records))
+
+    keys = None
+    if _cache is not None:
+        keys = [feature_key("irrigation", served.version, row) for row in X]
+        cached = _cache.get_many(keys)
+        hit = np.array([c is not None for c in cached])
+        preds[hit] = [c for c in cached if c is not None]
+        todo = np.flatnonzero(~hit)
+
+    if len(todo):
+        with warnings.catch_warnings():
+            # model was fitted on a DataFrame; columns are already in EXPECTED_FEATURES order
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            with metrics.stage("irrigation", "inference"):
+                preds[todo] = model.predict(X[todo])
+        if keys is not None:
+            _cache.set_many({keys[i]: float(preds[i]) for i in todo})
+
+    recs = _recommend(preds)
+
+    results = [
+        {"predicted_moisture": p, "recommendation": r, "model_version": served.version}
+        for p, r in zip(preds.tolist(), recs.tolist())
+    ]
+    for res, feats in zip(results, sensor_feats):
+        if feats is not None:
+            res["sensor_features"] = feats
+    return results
 
-    # 2. Estimate Soil Temp if missing: T - 2.0 (heuristic)
-    if "Soil_Temp" not in src and "Atmospheric_Temp" in src:
-        try:
-            T = float(src["Atmospheric_Temp"])
-            src["Soil_Temp"] = T - 2.0
-        except Exception:
-            pass
-            
-    # Build row
-    row = {}
-    for k in EXPECTED_FEATURES:
-        row[k] = src.get(k, 0.0) # Default to 0.0 if missing to prevent crash
-        
-    return pd.DataFrame([row])
 
 def predict_irrigation(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Predict soil moisture and give a simple irrigation recommendation.
     """
-    model = _load_model()
-    
-    df = _prepare_dataframe(data)
-    
-    # Ensure columns are in correct order for the model
-    # The model was trained with specific feature order
-    X = df[EXPECTED_FEATURES]
-    
-    # Prediction
-    preds = model.predict(X)
-    predicted = float(preds[0])
-
-    # Recommendation Logic
-    # Thresholds can be adjusted based on crop/soil knowledge
-    try:
-        if predicted < 25.0:
-            rec = "Irrigation Needed"
-        elif predicted < 40.0:
-            rec = "Monitor - Low"
-        else:
-            rec = "No Irrigation Required"
-    except Exception:
-        rec = "No Recommendation"
-
-    return {
-        "predicted_moisture": predicted,
-        "recommendation": rec
-    }
+    return predict_irrigation_batch([data])[0]
+
+
+def _predict_in_worker(records: List[Dict[str, Any]], version: Optional[str]) -> List[Dict[str, Any]]:
+    """Pool entry point: catch up with the server's model version, then predict."""
+    if version is not None and served_version() != version:
+        _reload()
+    return predict_irrigation_batch(records)
+
+
+async def predict_irrigation_batch_async(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    predict_irrigation_batch on the sklearn pool. The feature store only lives in this
+    process, so sensor features are filled in before the records are sent to a worker.
+    Raises PoolSaturatedError when the pool is full.
+    """
+    if not records:
+        return []
+    records, sensor_feats = _with_sensor_features(records)
+    records = [{k: v for k, v in r.items() if k != "sensor_id"} for r in records]
+    results = await sklearn_pool.run(_predict_in_worker, records, target_version())
+    for res, feats in zip(results, sensor_feats):
+        if feats is not None:
+            res["sensor_features"] = feats
+    return results
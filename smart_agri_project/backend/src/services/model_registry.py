@@ -0,0 +1,297 @@
+"""
+Model registry
+- Tracks load state and load time of every served model (disease, irrigation, yield).
+- Models load lazily on first use, or ahead of time via warmup() started from the startup hook.
+- Services stay unimported until needed: loaders are referenced as "module:function" strings,
+  so importing src.main does not pull in torch / sklearn.
+- Each service serves its model through a HotSwapModel: a watcher task periodically asks
+  loaded services to reload, the new version is built in the background and swapped in with
+  one assignment, so in-flight requests finish on the model they already hold.
+- The watcher also records the version the store currently selects for every imported service
+  (HotSwapModel.target), so requests can tell pool workers which version to serve without
+  reading the store themselves.
+"""
+
+import asyncio
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from src.utils.metrics import metrics, model_load_seconds
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelEntry:
+    def __init__(self, name: str, loader: str, reloader: str = ""):
+        self.name = name
+        self.loader = loader
+        self.reloader = reloader
+        self.state = NOT_LOADED
+        self.load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.version: Optional[str] = None
+        self.previous_version: Optional[str] = None
+        self.reload_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "version": self.version,
+            "previous_version": self.previous_version,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+            "reload_error": self.reload_error,
+        }
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: Dict[str, ModelEntry] = {}
+        self._models: Dict[str, "HotSwapModel"] = {}
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: str, reloader: str = ""):
+        """
+        Register a model by name with "package.module:function" references to its loader
+        and (optionally) to a reloader that swaps in a newer version and returns True if it did.
+        """
+        self._entries[name] = ModelEntry(name, loader, reloader)
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    @contextmanager
+    def loading(self, name: str):
+        """
+        Wrap the actual load inside a service so state and timing are recorded
+        no matter whether it was triggered by warmup or by the first request.
+        """
+        entry = self._entries.setdefault(name, ModelEntry(name, ""))
+        entry.state = LOADING
+        entry.error = None
+        start = time.perf_counter()
+        try:
+            yield entry
+        except Exception as e:
+            entry.state = FAILED
+            entry.error = str(e)
+            raise
+        seconds = time.perf_counter() - start
+        model_load_seconds.observe(seconds, name, "load")
+        entry.load_seconds = round(seconds, 4)
+        entry.loaded_at = time.time()
+        entry.state = READY
+        print(f"Model '{name}' loaded in {entry.load_seconds:.2f}s")
+
+    def entry(self, name: str) -> ModelEntry:
+        return self._entries[name]
+
+    def swapped(self, name: str, version: str):
+        """Record the version now being served."""
+        entry = self._entries.setdefault(name, ModelEntry(name, ""))
+        if entry.version != version:
+            entry.previous_version = entry.version
+            entry.version = version
+        entry.reload_error = None
+
+    @staticmethod
+    def _resolve(ref: str) -> Callable[[], Any]:
+        module_name, func_name = ref.split(":")
+        return getattr(importlib.import_module(module_name), func_name)
+
+    def track(self, model: "HotSwapModel"):
+        """Called by HotSwapModel so the watcher can refresh its target version."""
+        self._models[model.name] = model
+
+    async def refresh_targets(self):
+        """Resolve the selected version of every tracked model off the event loop."""
+        loop = asyncio.get_running_loop()
+        for name, model in list(self._models.items()):
+            try:
+                await loop.run_in_executor(None, model.refresh_target)
+            except Exception as e:
+                print(f"Resolving the version of model '{name}' failed: {e}")
+
+    def load(self, name: str) -> Any:
+        """Import the service and run its loader (no-op if already loaded)."""
+        return self._resolve(self._entries[name].loader)()
+
+    def reload(self, name: str) -> bool:
+        """
+        Ask a loaded service to swap in the currently selected version.
+        Services that were never imported load the right version on first use anyway.
+        """
+        entry = self._entries[name]
+        if not entry.reloader or entry.reloader.split(":")[0] not in sys.modules:
+            return False
+        return bool(self._resolve(entry.reloader)())
+
+    async def watch(self, interval_s: float):
+        """Poll loaded models for new / pinned versions and hot-swap them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.refresh_targets()
+            await asyncio.sleep(interval_s)
+            for name, entry in self._entries.items():
+                if entry.state != READY:
+                    continue
+                try:
+                    await loop.run_in_executor(None, self.reload, name)
+                except Exception as e:
+                    entry.reload_error = str(e)
+                    print(f"Reload of model '{name}' failed, still serving {entry.version}: {e}")
+
+    def start_watcher(self, interval_s: float) -> asyncio.Task:
+        self._watch_task = asyncio.get_running_loop().create_task(self.watch(interval_s))
+        return self._watch_task
+
+    async def warmup(self, names: Optional[List[str]] = None):
+        """Load models one after another in a worker thread, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        for name in names or self.names():
+            if name not in self._entries:
+                print(f"Unknown model in warmup list: {name}")
+                continue
+            try:
+                await loop.run_in_executor(None, self.load, name)
+            except Exception as e:
+                # the first request will retry the load
+                entry = self._entries[name]
+                if entry.state != READY:
+                    entry.state = FAILED
+                    entry.error = str(e)
+                print(f"Warmup of model '{name}' failed: {e}")
+
+    def start_warmup(self, names: Optional[List[str]] = None) -> asyncio.Task:
+        self._warmup_task = asyncio.get_running_loop().create_task(self.warmup(names))
+        return self._warmup_task
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: entry.to_dict() for name, entry in self._entries.items()}
+
+    def is_ready(self, names: Optional[List[str]] = None) -> bool:
+        return all(self._entries[n].state == READY for n in (names or self.names()) if n in self._entries)
+
+    def on_shutdown(self, hook: Callable[[], Awaitable[None]]):
+        """Register an async cleanup callback (e.g. stopping a service's worker task)."""
+        self._shutdown_hooks.append(hook)
+
+    async def shutdown(self):
+        for task in (self._warmup_task, self._watch_task):
+            if task is not None and not task.done():
+                task.cancel()
+        for hook in self._shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                print(f"Shutdown hook failed: {e}")
+
+
+registry = ModelRegistry()
+
+
+@metrics.collector
+def _model_gauges():
+    status = registry.status()
+    return [("smartagri_model_ready", "gauge", "1 when the model is loaded and serving.",
+             [("smartagri_model_ready", {"model": name}, 1.0 if s["state"] == READY else 0.0)
+              for name, s in status.items()])]
+
+
+class Served(NamedTuple):
+    """One loaded model version; services read all of it from a single reference."""
+    value: Any
+    version: str
+    artifact: Any = None
+
+
+class HotSwapModel:
+    """
+    Holds the model a service is serving.
+    - get() loads on first use (recorded in the registry like any other load).
+    - reload() resolves the artifact again and, if the version changed, builds the new model
+      without holding up readers, then replaces the reference in one assignment.
+    `resolve()` returns an artifact with .version (and optionally .verify()); `build(artifact)`
+    returns whatever the service needs to predict.
+    """
+
+    def __init__(self, name: str, resolve: Callable[[], Any], build: Callable[[Any], Any]):
+        self.name = name
+        self.resolve = resolve
+        self.build = build
+        self.current: Optional[Served] = None
+        # version the store selects, refreshed by the registry watcher (None until known)
+        self.target: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        registry.track(self)
+
+    def refresh_target(self) -> Optional[str]:
+        """Resolve the selected version (blocking: reads the store) and remember it."""
+        try:
+            self.target = self.resolve().version
+        except FileNotFoundError:
+            self.target = None
+        return self.target
+
+    def _build(self, artifact) -> Served:
+        if hasattr(artifact, "verify"):
+            artifact.verify()
+        return Served(self.build(artifact), artifact.version, artifact)
+
+    def get(self) -> Served:
+        served = self.current
+        if served is None:
+            with self._load_lock:
+                served = self.current
+                if served is None:
+                    with registry.loading(self.name):
+                        served = self._build(self.resolve())
+                    self.swap(served)
+        return served
+
+    def swap(self, served: Served):
+        self.current = served
+        self.target = served.version
+        registry.swapped(self.name, served.version)
+
+    def reload(self) -> bool:
+        if self.current is None:
+            return False
+        with self._reload_lock:
+            try:
+                artifact = self.resolve()
+            except FileNotFoundError:
+                # artifact removed: keep serving what is loaded
+                return False
+            if artifact.version == self.current.version:
+                return False
+            start = time.perf_counter()
+            try:
+                served = self._build(artifact)
+            except Exception as e:
+                registry.entry(self.name).reload_error = str(e)
+                raise
+            seconds = time.perf_counter() - start
+            model_load_seconds.observe(seconds, self.name, "reload")
+            old = self.current.version
+            self.swap(served)
+            print(f"Model '{self.name}' swapped {old} -> {served.version} "
+                  f"(built in {seconds:.2f}s)")
+            return True
+
+
+registry.register("disease", "src.services.disease_service:_load_model", "src.services.disease_service:_reload")
+registry.register("irrigation", "src.services.irrigation_service:_load_model", "src.services.irrigation_service:_reload")
+registry.register("yield", "src.services.yield_service:_load_model", "src.services.yield_service:_reload")
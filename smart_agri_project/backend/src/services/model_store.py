@@ -0,0 +1,229 @@
+"""
+Model store
+- Versioned artifacts live in data/models/<name>/<version>/ next to a manifest.json
+  (sha256 per file, feature list, metrics, created_at).
+- The served version is the pinned one (data/models/<name>/PINNED) or else the newest.
+  The pin is a file, so every worker's watcher picks it up.
+- publish() builds the version in a temp dir and renames it into place, so a watcher
+  never sees a half-written version.
+- Until a model has a published version, the flat file from Settings
+  (e.g. data/models/irrigation_rf.pkl) is served, versioned by mtime/size,
+  so the existing training scripts keep working.
+
+CLI (from backend/):
+  python -m src.services.model_store publish irrigation --file model=data/models/irrigation_rf.pkl \
+      --features Humidity,Atmospheric_Temp --metrics '{"rmse": 4.2}'
+  python -m src.services.model_store list irrigation
+  python -m src.services.model_store pin irrigation <version>
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import settings
+from src.utils.prediction_cache import model_version
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+MANIFEST = "manifest.json"
+PIN_FILE = "PINNED"
+
+
+def backend_path(path: str) -> Path:
+    """Resolve a Settings path; relative paths are taken from the backend directory."""
+    p = Path(path)
+    return p if p.is_absolute() else BACKEND_DIR / p
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class Artifact:
+    name: str
+    version: str
+    # role -> file, e.g. {"model": ..., "scaler": ...}
+    files: Dict[str, Path]
+    manifest: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def path(self) -> Path:
+        return self.files["model"]
+
+    def verify(self):
+        """Check file hashes against the manifest (legacy artifacts have none)."""
+        for role, expected in self.manifest.get("sha256", {}).items():
+            if role in self.files and file_sha256(self.files[role]) != expected:
+                raise ValueError(f"{self.name} {self.version}: checksum mismatch for '{role}'")
+
+
+class ModelStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _dir(self, name: str) -> Path:
+        return self.root / name
+
+    def versions(self, name: str) -> List[Dict[str, Any]]:
+        """Manifests of every published version, oldest first."""
+        base = self._dir(name)
+        if not base.is_dir():
+            return []
+        manifests = []
+        for d in base.iterdir():
+            manifest_path = d / MANIFEST
+            if d.name.startswith(".") or not manifest_path.is_file():
+                continue
+            try:
+                with open(manifest_path, "r") as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable manifest {manifest_path}: {e}")
+        return sorted(manifests, key=lambda m: (m.get("created_at", ""), m["version"]))
+
+    def manifest(self, name: str, version: str) -> Dict[str, Any]:
+        path = self._dir(name) / version / MANIFEST
+        if not path.is_file():
+            raise KeyError(f"Unknown {name} version: {version}")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def publish(self,
+                name: str,
+                files: Dict[str, Any],
+                features: Optional[List[str]] = None,
+                metrics: Optional[Dict[str, Any]] = None,
+                extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Copy `files` ({role: path}, must include "model") into a new version and return its manifest.
+        """
+        if "model" not in files:
+            raise ValueError("files must include a 'model' entry")
+        hashes = {role: file_sha256(Path(p)) for role, p in files.items()}
+        now = datetime.datetime.utcnow()
+        version = f"{now.strftime('%Y%m%dT%H%M%S')}-{hashes['model'][:8]}"
+
+        base = self._dir(name)
+        tmp = base / f".tmp-{version}"
+        tmp.mkdir(parents=True, exist_ok=False)
+        try:
+            stored = {}
+            for role, p in files.items():
+                p = Path(p)
+                shutil.copy2(p, tmp / p.name)
+                stored[role] = p.name
+            manifest = {
+                "name": name,
+                "version": version,
+                "created_at": now.isoformat(),
+                "files": stored,
+                "sha256": hashes,
+                "features": list(features) if features else [],
+                "metrics": metrics or {},
+                **(extra or {})
+            }
+            with open(tmp / MANIFEST, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(tmp, base / version)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        print(f"Published {name} version {version}")
+        return manifest
+
+    def pinned(self, name: str) -> Optional[str]:
+        try:
+            return (self._dir(name) / PIN_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def pin(self, name: str, version: str):
+        self.manifest(name, version)  # raises KeyError for unknown versions
+        pin_path = self._dir(name) / PIN_FILE
+        tmp = pin_path.with_suffix(".tmp")
+        tmp.write_text(version)
+        os.replace(tmp, pin_path)
+
+    def unpin(self, name: str):
+        try:
+            (self._dir(name) / PIN_FILE).unlink()
+        except FileNotFoundError:
+            pass
+
+    def resolve(self, name: str, legacy: Optional[Dict[str, Path]] = None) -> Artifact:
+        """
+        The artifact that should be served now: pinned version, newest version,
+        or the legacy flat files. Raises FileNotFoundError when none exists.
+        """
+        pinned = self.pinned(name)
+        manifest = None
+        if pinned:
+            try:
+                manifest = self.manifest(name, pinned)
+            except KeyError:
+                print(f"Pinned {name} version {pinned} not found, serving the newest")
+        if manifest is None:
+            published = self.versions(name)
+            manifest = published[-1] if published else None
+
+        if manifest is not None:
+            vdir = self._dir(name) / manifest["version"]
+            files = {role: vdir / fname for role, fname in manifest["files"].items()}
+            return Artifact(name, manifest["version"], files, manifest)
+
+        files = {role: Path(p) for role, p in (legacy or {}).items() if Path(p).exists()}
+        if "model" not in files:
+            raise FileNotFoundError(f"No {name} model published and no file at {(legacy or {}).get('model')}")
+        version = "file-" + "/".join(model_version(files[role]) for role in sorted(files))
+        return Artifact(name, version, files, {"name": name, "version": version, "legacy": True})
+
+
+store = ModelStore(backend_path(settings.MODEL_STORE_DIR))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_publish = sub.add_parser("publish")
+    p_publish.add_argument("name")
+    p_publish.add_argument("--file", action="append", required=True, help="role=path, e.g. model=irrigation_rf.pkl")
+    p_publish.add_argument("--features", type=str, default="")
+    p_publish.add_argument("--metrics", type=str, default="{}", help="JSON object")
+
+    p_list = sub.add_parser("list")
+    p_list.add_argument("name")
+
+    p_pin = sub.add_parser("pin")
+    p_pin.add_argument("name")
+    p_pin.add_argument("version")
+
+    p_unpin = sub.add_parser("unpin")
+    p_unpin.add_argument("name")
+
+    args = parser.parse_args()
+    if args.command == "publish":
+        files = dict(f.split("=", 1) for f in args.file)
+        features = [c for c in args.features.split(",") if c]
+        print(json.dumps(store.publish(args.name, files, features, json.loads(args.metrics)), indent=2))
+    elif args.command == "list":
+        pinned = store.pinned(args.name)
+        for m in store.versions(args.name):
+            mark = " (pinned)" if m["version"] == pinned else ""
+            print(f"{m['version']}{mark}  {m['created_at']}  {json.dumps(m.get('metrics', {}))}")
+    elif args.command == "pin":
+        store.pin(args.name, args.version)
+    elif args.command == "unpin":
+        store.unpin(args.name)
@@ -0,0 +1,338 @@
+"""
+Sensor service
+- Write-behind buffer for sensor rows: rows are acknowledged once buffered and written to
+  MongoDB with unordered insert_many, flushed by size or time threshold.
+- When the buffer is full, producers wait (backpressure) and give up with BufferFullError
+  after SENSOR_BUFFER_PUT_TIMEOUT_S so the route can answer 503.
+- close() flushes everything that is still buffered (called from the shutdown hook).
+- Readings carry real datetime timestamps and feed incremental 1-min / 1-hour / 1-day
+  min/max/mean rollups per sensor; query_series() reads the coarsest one that fits.
+- Written readings also update the in-process feature store (feature_store.py).
+- migrate_sensor_timestamps() converts readings stored with string timestamps (before they
+  became dates) so range queries see them, and folds them into the rollups.
+"""
+
+import asyncio
+import datetime
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.config.database import get_database
+from src.config.settings import settings
+from src.services.feature_store import feature_store
+from src.utils.timestamps import EPOCH, parse_timestamp
+from src.utils.metrics import metrics
+
+
+class BufferFullError(Exception):
+    pass
+
+
+SENSOR_COLLECTION = "sensor_readings"
+METRICS = ["temp_C", "humidity_pct", "soil_moisture_pct", "pH"]
+
+# (name, bucket seconds, collection), finest first
+ROLLUPS = [
+    ("1m", 60, "sensor_rollup_1m"),
+    ("1h", 3600, "sensor_rollup_1h"),
+    ("1d", 86400, "sensor_rollup_1d"),
+]
+
+
+def _sensor_collection():
+    return get_database()[SENSOR_COLLECTION]
+
+
+def _bucket_start(ts: datetime.datetime, seconds: int) -> datetime.datetime:
+    elapsed = int((ts - EPOCH).total_seconds())
+    return EPOCH + datetime.timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _rollup_updates(docs: List[Dict[str, Any]]) -> Dict[str, List[UpdateOne]]:
+    """
+    Pre-aggregate a batch of readings per (sensor, bucket) for every rollup level,
+    so each bucket costs one upsert per flush instead of one per reading.
+    """
+    updates = {}
+    for _, seconds, collection in ROLLUPS:
+        groups: Dict[Tuple[str, datetime.datetime], Dict[str, Any]] = defaultdict(
+            lambda: {"count": 0, "sum": defaultdict(float), "min": {}, "max": {}}
+        )
+        for doc in docs:
+            g = groups[(doc["sensor_id"], _bucket_start(doc["timestamp"], seconds))]
+            g["count"] += 1
+            for m in METRICS:
+                v = doc.get(m)
+                if v is None:
+                    continue
+                g["sum"][m] += v
+                g["min"][m] = min(v, g["min"].get(m, v))
+                g["max"][m] = max(v, g["max"].get(m, v))
+
+        ops = []
+        for (sensor_id, bucket), g in groups.items():
+            inc = {"count": g["count"]}
+            inc.update({f"sum.{m}": v for m, v in g["sum"].items()})
+            ops.append(UpdateOne(
+                {"sensor_id": sensor_id, "bucket": bucket},
+                {
+                    "$inc": inc,
+                    "$min": {f"min.{m}": v for m, v in g["min"].items()},
+                    "$max": {f"max.{m}": v for m, v in g["max"].items()},
+                },
+                upsert=True
+            ))
+        updates[collection] = ops
+    return updates
+
+
+async def update_rollups(docs: List[Dict[str, Any]], db=None):
+    """Fold newly inserted readings into the 1m/1h/1d rollup collections."""
+    if not docs:
+        return
+    db = db if db is not None else get_database()
+    for collection, ops in _rollup_updates(docs).items():
+        if ops:
+            await db[collection].bulk_write(ops, ordered=False)
+
+
+async def after_sensor_insert(docs: List[Dict[str, Any]]):
+    """
+    Everything derived from newly written readings: feature store first (in-process), then rollups.
+    The readings are already stored, so a feature store failure is logged and never skips the rollups.
+    """
+    try:
+        feature_store.add_many(docs)
+    except Exception as e:
+        print(f"Sensor feature store update failed: {e}")
+    await update_rollups(docs)
+
+
+async def _fold_converted(db, docs: List[Optional[Dict[str, Any]]]) -> int:
+    docs = [d for d in docs if d is not None and d.get("sensor_id") is not None]
+    await update_rollups(docs, db)
+    return len(docs)
+
+
+async def migrate_sensor_timestamps(db=None, batch_size: int = 500) -> Dict[str, int]:
+    """
+    One-off conversion of string timestamps to dates, with the converted readings folded into
+    the rollups (they were never counted). Each reading is claimed by an update that still
+    matches its string value, so concurrent runs (one per server worker) count it only once.
+    Unparseable timestamps are left as they are.
+    """
+    db = db if db is not None else get_database()
+    readings = db[SENSOR_COLLECTION]
+    stats = {"converted": 0, "invalid": 0}
+
+    async def convert(doc) -> Optional[Dict[str, Any]]:
+        try:
+            # an empty string would parse as "now"
+            ts = parse_timestamp(doc["timestamp"]) if doc["timestamp"].strip() else None
+        except (ValueError, TypeError, OverflowError):
+            ts = None
+        if ts is None:
+            stats["invalid"] += 1
+            return None
+        result = await readings.update_one({"_id": doc["_id"], "timestamp": doc["timestamp"]},
+                                           {"$set": {"timestamp": ts}})
+        return {**doc, "timestamp": ts} if result.modified_count else None
+
+    batch = []
+    cursor = readings.find({"timestamp": {"$type": "string"}})
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            stats["converted"] += await _fold_converted(db, await asyncio.gather(*map(convert, batch)))
+            batch = []
+    if batch:
+        stats["converted"] += await _fold_converted(db, await asyncio.gather(*map(convert, batch)))
+    return stats
+
+
+def pick_rollup(resolution_s: float) -> Optional[Tuple[str, int, str]]:
+    """Coarsest rollup whose bucket is no wider than the requested resolution (None = raw)."""
+    chosen = None
+    for level in ROLLUPS:
+        if level[1] <= resolution_s:
+            chosen = level
+    return chosen
+
+
+async def query_series(sensor_id: str,
+                       start: datetime.datetime,
+                       end: datetime.datetime,
+                       resolution_s: float = 0,
+                       limit: int = 10000) -> Dict[str, Any]:
+    """
+    Readings for one sensor in [start, end), served from the coarsest rollup that
+    satisfies `resolution_s`, or from raw readings when it is finer than one minute.
+    """
+    db = get_database()
+    level = pick_rollup(resolution_s)
+
+    if level is None:
+        cursor = db[SENSOR_COLLECTION].find(
+            {"sensor_id": sensor_id, "timestamp": {"$gte": start, "$lt": end}},
+            {"_id": 0, "timestamp": 1, **{m: 1 for m in METRICS}}
+        ).sort("timestamp", 1).limit(limit)
+        points = [
+            {"t": d["timestamp"].isoformat(), **{m: d.get(m) for m in METRICS}}
+            async for d in cursor
+        ]
+        return {"sensor_id": sensor_id, "resolution": "raw", "points": points}
+
+    name, _, collection = level
+    cursor = db[collection].find(
+        {"sensor_id": sensor_id, "bucket": {"$gte": start, "$lt": end}},
+        {"_id": 0}
+    ).sort("bucket", 1).limit(limit)
+    points = []
+    async for d in cursor:
+        count = d.get("count", 0) or 1
+        points.append({
+            "t": d["bucket"].isoformat(),
+            "count": d.get("count", 0),
+            **{
+                m: {
+                    "mean": d.get("sum", {}).get(m, 0.0) / count,
+                    "min": d.get("min", {}).get(m),
+                    "max": d.get("max", {}).get(m),
+                }
+                for m in METRICS if m in d.get("min", {})
+            }
+        })
+    return {"sensor_id": sensor_id, "resolution": name, "points": points}
+
+
+class SensorWriteBuffer:
+    def __init__(self,
+                 get_collection: Callable[[], Any] = _sensor_collection,
+                 after_insert: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+                 flush_rows: int = 500,
+                 flush_interval_ms: float = 1000.0,
+                 max_rows: int = 20000,
+                 put_timeout_s: float = 5.0):
+        self.get_collection = get_collection
+        self.after_insert = after_insert
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(0.001, float(flush_interval_ms) / 1000.0)
+        self.max_rows = max(self.flush_rows, int(max_rows))
+        self.put_timeout = float(put_timeout_s)
+
+        self._rows: List[Dict[str, Any]] = []
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        self.stats = {"buffered": 0, "inserted": 0, "failed": 0, "flushes": 0, "last_error": None}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._flush_lock = asyncio.Lock()
+            self._worker = loop.create_task(self._run())
+
+    def __len__(self):
+        return len(self._rows)
+
+    async def add(self, docs: List[Dict[str, Any]]):
+        """
+        Buffer rows, waiting for space if the buffer is full.
+        Raises BufferFullError if no space frees up within the put timeout.
+        """
+        self._ensure_started()
+        for start in range(0, len(docs), self.flush_rows):
+            chunk = docs[start:start + self.flush_rows]
+            async with self._space:
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._rows) + len(chunk) <= self.max_rows),
+                        self.put_timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise BufferFullError(f"Sensor buffer full ({len(self._rows)} rows pending)")
+                self._rows.extend(chunk)
+                self.stats["buffered"] += len(chunk)
+            if len(self._rows) >= self.flush_rows:
+                self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # rows stay buffered; retried on the next tick
+                self.stats["last_error"] = str(e)
+                print(f"Sensor buffer flush failed: {e}")
+
+    async def flush(self):
+        """Write everything currently buffered, in insert_many batches of flush_rows."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            while self._rows:
+                batch = self._rows[:self.flush_rows]
+                inserted = await self._insert(batch)
+                del self._rows[:len(batch)]
+                self.stats["inserted"] += len(inserted)
+                self.stats["failed"] += len(batch) - len(inserted)
+                if self.after_insert is not None and inserted:
+                    try:
+                        await self.after_insert(inserted)
+                    except Exception as e:
+                        self.stats["last_error"] = f"after_insert: {e}"
+                        print(f"Sensor rollup update failed: {e}")
+                self.stats["flushes"] += 1
+                async with self._space:
+                    self._space.notify_all()
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a batch and return the documents that were written."""
+        try:
+            with metrics.stage("sensors", "db_write"):
+                await self.get_collection().insert_many(batch, ordered=False)
+            return batch
+        except BulkWriteError as e:
+            # unordered: everything except the reported write errors went in
+            errors = (e.details or {}).get("writeErrors", [])
+            if errors:
+                self.stats["last_error"] = errors[0].get("errmsg")
+            failed = {err.get("index") for err in errors}
+            return [doc for i, doc in enumerate(batch) if i not in failed]
+
+    async def close(self):
+        """Flush remaining rows and stop the background worker."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._worker = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Sensor buffer final flush failed, {len(self._rows)} rows dropped: {e}")
+
+
+write_buffer = SensorWriteBuffer(
+    after_insert=after_sensor_insert,
+    flush_rows=settings.SENSOR_FLUSH_ROWS,
+    flush_interval_ms=settings.SENSOR_FLUSH_INTERVAL_MS,
+    max_rows=settings.SENSOR_BUFFER_MAX_ROWS,
+    put_timeout_s=settings.SENSOR_BUFFER_PUT_TIMEOUT_S
+)
@@ -3,21 +3,35 @@ Yield service
 - Loads a trained sklearn regressor from backend/data/models/yield_rf.pkl
 - Optionally loads a scaler from backend/data/models/yield_scaler.pkl
 - Handles simple categorical encoding (via provided maps or one-hot fallback)
+- Builds a YieldFeatureEncoder once per loaded model so requests skip pandas entirely
+- Model + scaler are resolved through the model store (published version, else YIELD_MODEL_PATH)
+  and hot-swapped together by the registry watcher
+- Caches predictions per (model version, encoded row), so a swap invalidates old entries
 - Returns predicted yield and unit
+- Routes call predict_yield_async(), which runs on the sklearn inference pool
 
 This service is robust to minor variations in input (strings or integers for categorical features).
 """
 
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, NamedTuple, Optional
+import warnings
 import joblib
 import pandas as pd
 import numpy as np
 import os
 
-BASE_DIR = Path(__file__).resolve().parents[2]
-MODEL_PATH = BASE_DIR / "data" / "models" / "yield_rf.pkl"
-SCALER_PATH = BASE_DIR / "data" / "models" / "yield_scaler.pkl"
+from src.config.settings import settings
+from src.ml.compiled_forest import compile_forest
+from src.ml.yield_encoder import YieldFeatureEncoder
+from src.services.inference_pool import sklearn_pool
+from src.services.model_registry import HotSwapModel, Served, registry
+from src.services.model_store import Artifact, backend_path, store
+from src.utils.metrics import metrics
+from src.utils.prediction_cache import build_cache, feature_key
+
+MODEL_PATH = backend_path(settings.YIELD_MODEL_PATH)
+SCALER_PATH = MODEL_PATH.parent / "yield_scaler.pkl"
 # your uploaded crop dataset for reference
 DEFAULT_RAW_CSV_PATH = Path("/mnt/data/e1cb9f46-e091-4a44-8f35-4cd14be6e3ab.csv")
 
@@ -51,26 +65,95 @@ DEFAULT_SEASON_MAP = {
     "whole_year": 4
 }
 
-# load model and scaler lazily
-_model = None
-_scaler = None
+_cache = build_cache(settings, "yield")
+if _cache is not None:
+    registry.on_shutdown(_cache.shutdown)
+
+
+class YieldModel(NamedTuple):
+    model: Any
+    scaler: Any
+    # None when the model exposes no feature names (pandas fallback path)
+    encoder: Optional[YieldFeatureEncoder]
+
+
+def _resolve() -> Artifact:
+    return store.resolve("yield", {"model": MODEL_PATH, "scaler": SCALER_PATH})
+
+
+def _build(artifact: Artifact) -> YieldModel:
+    model = joblib.load(artifact.path)
+    if settings.YIELD_INFERENCE_BACKEND == "compiled":
+        model = compile_forest(model, max_rows=settings.COMPILED_FOREST_MAX_ROWS)
+    scaler = joblib.load(artifact.files["scaler"]) if "scaler" in artifact.files else None
+    return YieldModel(model, scaler, _build_encoder(model, scaler))
+
+
+_served = HotSwapModel("yield", _resolve, _build)
+
+
+def _current() -> Served:
+    try:
+        return _served.get()
+    except FileNotFoundError:
+        raise RuntimeError(f"Yield model not found at {MODEL_PATH}. Train the model first.")
+
 
 def _load_model():
-    global _model
-    if _model is None:
-        if not MODEL_PATH.exists():
-            raise RuntimeError(f"Yield model not found at {MODEL_PATH}. Train the model first.")
-        _model = joblib.load(MODEL_PATH)
-    return _model
-
-def _load_scaler():
-    global _scaler
-    if _scaler is None:
-        if SCALER_PATH.exists():
-            _scaler = joblib.load(SCALER_PATH)
-        else:
-            _scaler = None
-    return _scaler
+    return _current().value.model
+
+
+def _reload() -> bool:
+    return _served.reload()
+
+
+def served_version() -> Optional[str]:
+    """Version currently served (None before the first load)."""
+    return _served.current.version if _served.current else None
+
+
+def target_version() -> Optional[str]:
+    """
+    Version the store selects (pin or newest), as last resolved by the registry watcher.
+    Sent with pool calls so workers follow hot swaps even if this process never loaded the model.
+    """
+    return _served.target
+
+def _feature_columns(model, scaler) -> Optional[List[str]]:
+    if scaler is not None and hasattr(scaler, "feature_names_in_"):
+        return list(scaler.feature_names_in_)
+    if getattr(model, "feature_names_in_", None) is not None:
+        return list(model.feature_names_in_)
+    return None
+
+def _build_encoder(model, scaler,
+                   crop_map: Optional[Dict[str,int]] = None,
+                   season_map: Optional[Dict[str,int]] = None) -> Optional[YieldFeatureEncoder]:
+    columns = _feature_columns(model, scaler)
+    if columns is None:
+        return None
+    if scaler is not None and getattr(scaler, "n_features_in_", len(columns)) != len(columns):
+        scaler = None
+    return YieldFeatureEncoder(
+        columns,
+        scaler=scaler,
+        category_maps={
+            "crop": crop_map or DEFAULT_CROP_MAP,
+            "season": season_map or DEFAULT_SEASON_MAP
+        },
+        nan_when_absent=EXPECTED_FEATURES
+    )
+
+def _encoder_for(bundle: YieldModel,
+                 crop_map: Optional[Dict[str,int]] = None,
+                 season_map: Optional[Dict[str,int]] = None) -> Optional[YieldFeatureEncoder]:
+    """
+    Encoder for the served model/scaler. None when the model exposes no feature names,
+    in which case the pandas path below is used.
+    """
+    if crop_map or season_map:
+        return _build_encoder(bundle.model, bundle.scaler, crop_map, season_map)
+    return bundle.encoder
 
 def _prepare_input(data: Dict[str, Any],
                    crop_map: Optional[Dict[str,int]] = None,
@@ -160,6 +243,31 @@ def _align_features(df: pd.DataFrame, scaler, model_feature_names=None) -> pd.Da
             return df_enc[numeric_cols]
     return df_enc[numeric_cols]
 
+def _predict_matrix(model, X: np.ndarray) -> np.ndarray:
+    with warnings.catch_warnings():
+        # model was fitted on a DataFrame; encoder columns follow feature_names_in_
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        with metrics.stage("yield", "inference"):
+            return np.asarray(model.predict(X), dtype=float)
+
+def _predict_encoded(model, version: str, X: np.ndarray) -> np.ndarray:
+    """Predict encoded rows, serving repeated rows from the prediction cache."""
+    if _cache is None:
+        return _predict_matrix(model, X)
+
+    keys = [feature_key("yield", version, row) for row in X]
+    preds = np.empty(len(keys))
+    todo = []
+    for i, cached in enumerate(_cache.get_many(keys)):
+        if cached is None:
+            todo.append(i)
+        else:
+            preds[i] = cached
+    if todo:
+        preds[todo] = _predict_matrix(model, X[todo])
+        _cache.set_many({keys[i]: float(preds[i]) for i in todo})
+    return preds
+
 def predict_yield(data: Dict[str, Any],
                   crop_map: Optional[Dict[str,int]] = None,
                   season_map: Optional[Dict[str,int]] = None) -> Dict[str, Any]:
@@ -167,24 +275,59 @@ def predict_yield(data: Dict[str, Any],
     Predict yield based on input dictionary.
     Returns { "predicted_yield": float, "unit": "tons" }
     """
-    model = _load_model()
-    scaler = _load_scaler()
+    served = _current()
+    bundle: YieldModel = served.value
+    encoder = _encoder_for(bundle, crop_map, season_map)
 
-    df = _prepare_input(data, crop_map=crop_map, season_map=season_map)
-    model_feature_names = getattr(model, "feature_names_in_", None)
-    X = _align_features(df, scaler, model_feature_names)
+    if encoder is not None:
+        with metrics.stage("yield", "preprocess"):
+            X = encoder.encode(data)
+        preds = _predict_encoded(bundle.model, served.version, X)
+    else:
+        with metrics.stage("yield", "preprocess"):
+            df = _prepare_input(data, crop_map=crop_map, season_map=season_map)
+            X = _align_features(df, bundle.scaler, None)
 
-    if X.shape[1] == 0:
-        raise RuntimeError("No valid input features available for prediction. Check input payload.")
+        if X.shape[1] == 0:
+            raise RuntimeError("No valid input features available for prediction. Check input payload.")
 
-    preds = model.predict(X)
+        preds = _predict_matrix(bundle.model, X)
     predicted = float(preds[0])
 
     return {
         "predicted_yield": predicted,
-        "unit": "tons"
+        "unit": "tons",
+        "model_version": served.version
     }
 
+def predict_yield_batch(records: List[Dict[str, Any]],
+                        crop_map: Optional[Dict[str,int]] = None,
+                        season_map: Optional[Dict[str,int]] = None) -> List[Dict[str, Any]]:
+    """
+    Predict yield for many input dicts with one encode and one model call.
+    """
+    if not records:
+        return []
+    served = _current()
+    encoder = _encoder_for(served.value, crop_map, season_map)
+    if encoder is None:
+        return [predict_yield(r, crop_map, season_map) for r in records]
+
+    with metrics.stage("yield", "preprocess"):
+        X = encoder.encode_many(records)
+    preds = _predict_encoded(served.value.model, served.version, X)
+    return [{"predicted_yield": p, "unit": "tons", "model_version": served.version} for p in preds.tolist()]
+
+def _predict_in_worker(data: Dict[str, Any], version: Optional[str]) -> Dict[str, Any]:
+    """Pool entry point: catch up with the server's model version, then predict."""
+    if version is not None and served_version() != version:
+        _reload()
+    return predict_yield(data)
+
+async def predict_yield_async(data: Dict[str, Any]) -> Dict[str, Any]:
+    """predict_yield on the sklearn inference pool (raises PoolSaturatedError when it is full)."""
+    return await sklearn_pool.run(_predict_in_worker, data, target_version())
+
 # Optional helper: load uploaded raw crop dataset for inspections
 def inspect_uploaded_raw(path: Optional[Path] = None) -> pd.DataFrame:
     p = Path(path) if path else DEFAULT_RAW_CSV_PATH
@@ -0,0 +1,110 @@
+"""
+Micro-batching helper
+- Callers submit single items and await their own result.
+- A background worker gathers up to `max_batch_size` items, or waits at most
+  `max_wait_ms` after the first one, then runs `batch_fn` once for the whole group
+  on a dedicated executor so the event loop is never blocked by the forward pass.
+- `execute` (optional) replaces that executor, e.g. a shared inference pool's execute().
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+
+class MicroBatcher:
+    def __init__(self,
+                 batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0,
+                 name: str = "batcher",
+                 execute: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # one thread: batches run back to back, torch parallelises inside the op
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._execute = execute
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def run_batch(self, items: List[Any]) -> List[Any]:
+        """Run an already-formed batch on the same executor, bypassing the queue."""
+        return await self._run_batch_fn(items)
+
+    async def _run_batch_fn(self, items: List[Any]) -> List[Any]:
+        if self._execute is not None:
+            return await self._execute(self.batch_fn, items)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.batch_fn, items)
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                # still drain whatever is already waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # drop callers that went away (e.g. client disconnected)
+            batch = [(item, fut) for item, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await self._run_batch_fn(items)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+    async def stop(self):
+        """Cancel the worker and fail anything still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, fut = self._queue.get_nowait()
+                if not fut.done():
+                    fut.set_exception(RuntimeError(f"{self.name} stopped"))
+        self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
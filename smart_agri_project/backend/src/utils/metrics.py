@@ -0,0 +1,262 @@
+"""
+Metrics
+- Counters and histograms rendered in the Prometheus text format at GET /metrics, with no
+  client library: a sample is a dict update under a per-metric lock, cheap enough to stay on.
+- Labels are passed positionally in the order they were declared (observe(0.02, "disease", "decode")).
+- stage(service, name) times one pipeline stage (decode, preprocess, inference, db_write, llm)
+  into smartagri_stage_seconds; MetricsMiddleware records request counts and latency per
+  route template (never the raw path, so ids in URLs do not create new series).
+- Process-pool workers keep their own copy of the metrics: the pool returns drain() with each
+  result and the server merge()s it, so stages run in workers still show up here.
+- Gauges that already live elsewhere (pool load, model state) are added with collector(fn),
+  called at render time.
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(name: str, labels: Dict[str, Any], value: float) -> str:
+    if labels:
+        inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        name = f"{name}{{{inner}}}"
+    if value == float("inf"):
+        return f"{name} +Inf"
+    return f"{name} {value:.10g}" if isinstance(value, float) else f"{name} {value}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def drain(self) -> Dict[Tuple, float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple, float]):
+        with self._lock:
+            for key, v in values.items():
+                self._values[key] = self._values.get(key, 0.0) + v
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield self.name + "_total", dict(zip(self.labels, key)), v
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (last = +Inf), sum, count]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *label_values) -> int:
+        entry = self._values.get(label_values)
+        return entry[2] if entry else 0
+
+    def drain(self) -> Dict[Tuple, list]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple, list]):
+        with self._lock:
+            for key, (counts, total, n) in values.items():
+                entry = self._values.get(key)
+                if entry is None:
+                    self._values[key] = [list(counts), total, n]
+                    continue
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += n
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = [(key, list(counts), total, n) for key, (counts, total, n) in self._values.items()]
+        for key, counts, total, n in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                yield self.name + "_bucket", {**labels, "le": "+Inf" if bound == float("inf") else f"{bound:g}"}, cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, n
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]):
+        """
+        Register fn() -> [(name, type, help, samples)], evaluated on every render.
+        A failing collector is skipped so one broken source does not hide the rest.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def stage(self, service: str, stage: str) -> _StageTimer:
+        return _StageTimer(stage_seconds, (service, stage))
+
+    def drain(self) -> Dict[str, Dict[Tuple, Any]]:
+        """Everything recorded since the last drain (and reset it): sent back by pool workers."""
+        out = {}
+        for name, metric in self._metrics.items():
+            values = metric.drain()
+            if values:
+                out[name] = values
+        return out
+
+    def merge(self, drained: Dict[str, Dict[Tuple, Any]]):
+        for name, values in drained.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help, samples):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(_format(n, labels, v) for n, labels, v in samples)
+
+        for metric in list(self._metrics.values()):
+            family(metric.name, metric.kind, metric.help, metric.samples())
+        for fn in self._collectors:
+            try:
+                families = list(fn())
+            except Exception as e:
+                print(f"Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                family(name, kind, help, samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+http_requests = metrics.counter(
+    "smartagri_http_requests", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_seconds = metrics.histogram(
+    "smartagri_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+stage_seconds = metrics.histogram(
+    "smartagri_stage_seconds", "Latency of one pipeline stage inside a service.", ("service", "stage"))
+model_load_seconds = metrics.histogram(
+    "smartagri_model_load_seconds", "Time to build a model version (first load or hot swap).", ("model", "kind"),
+    buckets=LOAD_BUCKETS)
+cache_lookups = metrics.counter(
+    "smartagri_cache_lookups", "Cache lookups by cache and result (hit, shared_hit, miss).", ("cache", "result"))
+
+
+def cache_hit_ratio() -> Iterable[Tuple[str, str, str, Iterable[Sample]]]:
+    per_cache: Dict[str, Dict[str, float]] = {}
+    for _, labels, v in cache_lookups.samples():
+        per_cache.setdefault(labels["cache"], {})[labels["result"]] = v
+    samples = []
+    for cache, results in sorted(per_cache.items()):
+        total = sum(results.values())
+        hits = results.get("hit", 0.0) + results.get("shared_hit", 0.0)
+        samples.append(("smartagri_cache_hit_ratio", {"cache": cache}, hits / total if total else 0.0))
+    return [("smartagri_cache_hit_ratio", "gauge", "Hits / lookups since start, per cache.", samples)]
+
+
+metrics.collector(cache_hit_ratio)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware (not BaseHTTPMiddleware, which wraps every response in an extra task
+    and would buffer the streaming endpoints). Latency runs until the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_requests.inc(method, route, str(status))
+            http_seconds.observe(time.perf_counter() - start, method, route)
@@ -0,0 +1,258 @@
+"""
+Prediction cache
+- In-process LRU + TTL cache for deterministic model outputs, with hit/miss/eviction counters.
+- Keys are a hash of the model version plus the normalized feature vector, so a retrained
+  model (new file mtime) never serves stale entries.
+- Optional SQLite-backed shared store lets several uvicorn workers reuse each other's results;
+  get_many / set_many look up and write a whole batch of rows in one statement.
+- Lookups are also counted in smartagri_cache_lookups{cache=<name>} for /metrics.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.utils.metrics import cache_lookups
+
+
+def model_version(path) -> str:
+    """Version tag for a model file: mtime + size (changes whenever the pickle is rewritten)."""
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def feature_key(namespace: str, version: str, row: np.ndarray) -> str:
+    """Canonical key for one normalized feature row."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(namespace.encode())
+    h.update(b"\0")
+    h.update(version.encode())
+    h.update(b"\0")
+    h.update(np.ascontiguousarray(row, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class SqliteCacheBackend:
+    """
+    Shared second-level store (one file per host). Each thread keeps one connection,
+    reused for every call and closed by close(). Expired rows are purged every
+    purge_interval_s on write, and the oldest rows are dropped beyond max_rows.
+    """
+
+    # stay below SQLite's default limit on bound parameters
+    _CHUNK = 500
+
+    def __init__(self, path: str, max_rows: int = 100000, purge_interval_s: float = 60.0):
+        self.path = path
+        self.max_rows = max(1, int(max_rows))
+        self.purge_interval_s = float(purge_interval_s)
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._next_purge = time.monotonic() + self.purge_interval_s
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prediction_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS prediction_cache_expires ON prediction_cache (expires)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # only this thread uses it; close() may run elsewhere
+            conn = sqlite3.connect(self.path, timeout=1.0, check_same_thread=False)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Unexpired values for the keys that are present."""
+        conn = self._conn()
+        now = time.time()
+        found = {}
+        for i in range(0, len(keys), self._CHUNK):
+            chunk = keys[i:i + self._CHUNK]
+            rows = conn.execute(
+                f"SELECT key, value FROM prediction_cache WHERE key IN ({','.join('?' * len(chunk))}) "
+                "AND expires >= ?", (*chunk, now)
+            ).fetchall()
+            found.update((k, json.loads(v)) for k, v in rows)
+        return found
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, Any], ttl_s: float):
+        if not items:
+            return
+        expires = time.time() + ttl_s
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO prediction_cache (key, value, expires) VALUES (?, ?, ?)",
+                [(k, json.dumps(v), expires) for k, v in items.items()]
+            )
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval_s
+            self.purge()
+
+    def set(self, key: str, value: Any, ttl_s: float):
+        self.set_many({key: value}, ttl_s)
+
+    def purge(self) -> int:
+        """Delete expired rows, then the soonest-expiring ones beyond max_rows. Returns rows deleted."""
+        conn = self._conn()
+        with conn:
+            deleted = conn.execute("DELETE FROM prediction_cache WHERE expires < ?", (time.time(),)).rowcount
+            (count,) = conn.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()
+            if count > self.max_rows:
+                deleted += conn.execute(
+                    "DELETE FROM prediction_cache WHERE key IN "
+                    "(SELECT key FROM prediction_cache ORDER BY expires LIMIT ?)", (count - self.max_rows,)
+                ).rowcount
+        return deleted
+
+    def close(self):
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 300.0,
+                 backend: Optional[SqliteCacheBackend] = None, name: str = "prediction"):
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Cached values in key order (None for misses); local misses go to the backend in one query."""
+        now = time.monotonic()
+        values: List[Optional[Any]] = [None] * len(keys)
+        todo = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if entry[1] > now:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        cache_lookups.inc(self.name, "hit")
+                        values[i] = entry[0]
+                        continue
+                    del self._entries[key]
+                    self.expirations += 1
+                todo.append(i)
+
+        shared = {}
+        if self.backend is not None and todo:
+            try:
+                shared = self.backend.get_many([keys[i] for i in todo])
+            except sqlite3.Error:
+                shared = {}
+        for i in todo:
+            value = shared.get(keys[i])
+            if value is not None:
+                self._store(keys[i], value)
+                values[i] = value
+        with self._lock:
+            for i in todo:
+                if values[i] is not None:
+                    self.shared_hits += 1
+                else:
+                    self.misses += 1
+        for i in todo:
+            cache_lookups.inc(self.name, "shared_hit" if values[i] is not None else "miss")
+        return values
+
+    def _store(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        for key, value in items.items():
+            self._store(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set_many(items, self.ttl_s)
+            except sqlite3.Error:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+    async def shutdown(self):
+        self.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+def build_cache(settings, name: str = "prediction") -> Optional[PredictionCache]:
+    """Cache configured from Settings, or None when disabled."""
+    if not settings.PREDICTION_CACHE_ENABLED:
+        return None
+    backend = None
+    if settings.PREDICTION_CACHE_SQLITE_PATH:
+        try:
+            backend = SqliteCacheBackend(
+                settings.PREDICTION_CACHE_SQLITE_PATH,
+                max_rows=settings.PREDICTION_CACHE_SQLITE_MAX_ROWS,
+                purge_interval_s=settings.PREDICTION_CACHE_SQLITE_PURGE_S
+            )
+        except (sqlite3.Error, OSError) as e:
+            print(f"Shared prediction cache unavailable: {e}")
+    return PredictionCache(
+        max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+        ttl_s=settings.PREDICTION_CACHE_TTL_S,
+        backend=backend,
+        name=name
+    )
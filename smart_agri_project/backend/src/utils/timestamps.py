@@ -0,0 +1,29 @@
+"""
+Timestamp normalization shared by the sensor routes, rollups and feature store.
+Older sensor rows were stored with ISO-string timestamps; everything is compared as naive UTC datetimes.
+"""
+
+import datetime
+from typing import Any
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def parse_timestamp(value: Any) -> datetime.datetime:
+    """
+    Normalize a reading timestamp to a naive UTC datetime (how BSON dates round-trip).
+    Accepts datetimes, ISO-8601 strings (with or without offset/Z) and epoch seconds.
+    """
+    if value is None or value == "":
+        return datetime.datetime.utcnow()
+    if isinstance(value, datetime.datetime):
+        ts = value
+    elif isinstance(value, (int, float)):
+        return EPOCH + datetime.timedelta(seconds=value)
+    elif isinstance(value, str):
+        ts = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    else:
+        raise ValueError(f"Unsupported timestamp: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ts
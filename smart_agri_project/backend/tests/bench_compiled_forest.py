@@ -0,0 +1,42 @@
+# Benchmark: sklearn RandomForestRegressor.predict vs CompiledForest.predict
+# Run from backend/:  python tests/bench_compiled_forest.py
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ml.compiled_forest import CompiledForest
+
+
+def _time(fn, X, repeat):
+    fn(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def bench(n_estimators, n_features, label):
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(5000, n_features))
+    y = X[:, 0] * 2 + rng.normal(size=5000)
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=1).fit(X, y)
+    compiled = CompiledForest(model, max_rows=None)
+
+    print(f"\n{label}: {n_estimators} trees, {n_features} features, max depth {compiled.max_depth}")
+    print(f"{'rows':>6} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for rows in (1, 10, 100, 1000):
+        Xq = rng.normal(size=(rows, n_features))
+        repeat = 50 if rows <= 10 else 10
+        sk = _time(model.predict, Xq, repeat)
+        cf = _time(compiled.predict, Xq, repeat)
+        print(f"{rows:>6} {sk:>12.3f} {cf:>12.3f} {sk / cf:>7.1f}x")
+
+
+if __name__ == "__main__":
+    bench(100, 5, "irrigation-like")
+    bench(300, 40, "yield-like")
@@ -0,0 +1,64 @@
+# Benchmark: disease training input pipeline, ImageFolder (PIL decode per epoch) vs packed memmap
+# Run from backend/:  python tests/bench_disease_loader.py [--processed_dir data/processed/disease]
+# Without --processed_dir a small synthetic dataset is generated in a temp folder.
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from torch.utils.data import DataLoader
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ml.disease_model import make_datasets
+from src.ml.packed_dataset import pack_dataset
+
+
+def _synthetic(root: Path, per_class: int):
+    rng = np.random.default_rng(0)
+    for split in ("train", "val"):
+        for cls in ("healthy", "blight", "rust"):
+            d = root / split / cls
+            d.mkdir(parents=True)
+            for i in range(per_class):
+                Image.fromarray((rng.random((224, 224, 3)) * 255).astype("uint8")).save(d / f"{i}.jpg")
+
+
+def images_per_sec(ds, batch_size, num_workers, max_batches):
+    loader = DataLoader(ds, batch_size=batch_size, shuffle=True, num_workers=num_workers,
+                        collate_fn=getattr(ds, "collate_fn", None))
+    n = 0
+    start = time.perf_counter()
+    for i, (imgs, _) in enumerate(loader):
+        n += imgs.size(0)
+        if i + 1 >= max_batches:
+            break
+    return n / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processed_dir", type=str, default=None)
+    parser.add_argument("--per_class", type=int, default=200)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--num_workers", type=int, default=0)
+    parser.add_argument("--max_batches", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.processed_dir:
+        processed = Path(args.processed_dir)
+    else:
+        processed = Path(tempfile.mkdtemp())
+        _synthetic(processed, args.per_class)
+    packed = processed / "packed"
+    if not (packed / "train_index.json").exists():
+        pack_dataset(processed, packed, splits=("train", "val"))
+
+    for label, packed_dir in (("ImageFolder", None), ("packed memmap", packed)):
+        train_ds, _ = make_datasets(processed, packed_dir)
+        rate = images_per_sec(train_ds, args.batch_size, args.num_workers, args.max_batches)
+        print(f"{label:>14}: {rate:8.1f} images/sec "
+              f"(batch {args.batch_size}, workers {args.num_workers}, train augmentation)")
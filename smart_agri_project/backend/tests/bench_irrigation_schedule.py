@@ -0,0 +1,52 @@
+# Benchmark: whole-farm schedule (vectorized roll-forward) vs one predict call per plot and day
+# Run from backend/:  python tests/bench_irrigation_schedule.py
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import irrigation_service
+from src.services.irrigation_scheduler import schedule_irrigation
+from src.services.irrigation_service import EXPECTED_FEATURES, _build_feature_matrix
+from src.services.model_registry import Served
+
+
+def _model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 100, (5000, 5)), columns=EXPECTED_FEATURES)
+    y = X["Previous_Soil_Moisture"] * 0.9 - 0.05 * X["Atmospheric_Temp"] + rng.normal(0, 2, 5000)
+    return RandomForestRegressor(n_estimators=100, random_state=0).fit(X, y)
+
+
+def per_plot_loop(model, plots, forecast):
+    for p in plots:
+        moisture = p["previous_moisture"]
+        for day in forecast:
+            X = _build_feature_matrix([{**day, "previous_moisture": moisture}])
+            moisture = float(model.predict(X)[0])
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    model = _model()
+    irrigation_service._served.current = Served(model, "bench")
+    rng = np.random.default_rng(1)
+    forecast = [{"temperature": 28 + d, "humidity": 55 - d, "rainfall": 0.0} for d in range(7)]
+    for n in (100, 1000):
+        plots = [{"plot_id": f"p{i}", "previous_moisture": float(rng.uniform(10, 60))} for i in range(n)]
+        schedule_irrigation(plots, forecast, 7)
+        start = time.perf_counter()
+        result = schedule_irrigation(plots, forecast, 7, {"pump_capacity_m3_per_day": n * 5.0})
+        vec = (time.perf_counter() - start) * 1000.0
+        loop_plots = plots[:100]
+        start = time.perf_counter()
+        per_plot_loop(model, loop_plots, forecast)
+        loop = (time.perf_counter() - start) * 1000.0 * n / len(loop_plots)
+        print(f"{n:>5} plots x 7 days: schedule {vec:8.1f} ms, per-plot loop ~{loop:8.1f} ms "
+              f"({loop / vec:.0f}x), water {result['total_water_m3']} m3")
@@ -0,0 +1,104 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.ai_service import RecommendationClient, semantic_key
+from src.utils.prediction_cache import PredictionCache
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return FakeResponse(f"advice #{self.calls}")
+
+
+def _context(moisture=36.8):
+    return {
+        "task_type": "Irrigation Prediction",
+        "inputs": {"temperature": 27, "humidity": 70, "soil_moisture": moisture},
+        "prediction": {"predicted_moisture": moisture, "recommendation": "Monitor - Low"},
+    }
+
+
+def test_near_identical_contexts_share_cached_answer():
+    model = FakeModel()
+    client = RecommendationClient(model=model, enabled=True, cache=PredictionCache(ttl_s=60))
+
+    async def run():
+        first = await client.recommend(_context(36.8))
+        second = await client.recommend(_context(36.9))
+        third = await client.recommend(_context(52.0))
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == second
+    assert third != first
+    assert model.calls == 2
+    assert semantic_key(_context(36.8)) == semantic_key(_context(37.2))
+
+
+def test_timeout_falls_back_to_rules():
+    client = RecommendationClient(model=FakeModel(delay=0.5), enabled=True, timeout_s=0.05)
+    text = asyncio.run(client.recommend(_context()))
+    assert text.startswith("**Status:** Monitor - Low")
+    assert client.stats["timeouts"] == 1
+
+
+def test_concurrency_is_bounded():
+    model = FakeModel(delay=0.05)
+    client = RecommendationClient(model=model, enabled=True, max_concurrency=2)
+
+    async def run():
+        await asyncio.gather(*(client.recommend(_context(10 * (i + 1))) for i in range(6)))
+
+    asyncio.run(run())
+    assert model.calls == 6
+    assert model.max_active <= 2
+
+
+def test_disabled_client_uses_fallback_without_model():
+    client = RecommendationClient(model=None, enabled=False)
+    text = asyncio.run(client.recommend({"task_type": "Yield Prediction", "prediction": {"predicted_yield": 3.2}}))
+    assert text.startswith("**Forecast:** 3.20 tons.")
+
+
+def test_timed_out_calls_keep_their_slot_until_they_finish():
+    model = FakeModel(delay=0.2)
+    client = RecommendationClient(model=model, enabled=True, max_concurrency=1, timeout_s=0.05)
+
+    async def run():
+        first = await client.recommend(_context(10))
+        # the first call is still running on its thread, so there is no slot for this one
+        second = await client.recommend(_context(50))
+        await asyncio.sleep(0.3)
+        # once that thread returns, the slot is free again
+        third = await client.recommend(_context(90))
+        return first, second, third
+
+    asyncio.run(run())
+    assert client.stats["timeouts"] == 3
+    assert model.calls == 2 and model.max_active == 1
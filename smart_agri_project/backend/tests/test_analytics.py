@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import analytics_service
+from src.services.analytics_service import (
+    SUMMARY_KEYS, _disease_updates, _irrigation_updates, _yield_updates,
+    histogram_percentiles, rebuild_pipelines, yield_bin
+)
+from src.services.db_service import PersistenceQueue
+
+DAY = datetime.datetime(2026, 6, 1)
+
+
+def _at(hours):
+    return DAY + datetime.timedelta(hours=hours)
+
+
+def test_disease_batch_folds_to_one_upsert_per_day_and_class():
+    docs = [{"created_at": _at(h), "predicted_class": cls, "confidence": conf}
+            for h, cls, conf in [(1, "rust", 0.9), (2, "rust", 0.7), (3, "blight", 0.6), (30, "rust", 0.5)]]
+    ops = {(op._filter["day"], op._filter["predicted_class"]): op._doc for op in _disease_updates(docs)}
+    assert len(ops) == 3
+    rust = ops[(DAY, "rust")]
+    assert rust["$inc"] == {"count": 2, "confidence_sum": pytest.approx(1.6)}
+    assert rust["$min"] == {"confidence_min": 0.7} and rust["$max"] == {"confidence_max": 0.9}
+
+
+def test_irrigation_groups_by_sensor_and_recommendation():
+    docs = [{"created_at": _at(1), "input_features": {"sensor_id": "s1"}, "recommendation": "Irrigation Needed",
+             "predicted_moisture": 20.0},
+            {"created_at": _at(2), "input_features": {"sensor_id": "s1"}, "recommendation": "Irrigation Needed",
+             "predicted_moisture": 22.0},
+            {"created_at": _at(3), "input_features": {}, "recommendation": "Monitor - Low",
+             "predicted_moisture": 30.0}]
+    ops = {tuple(op._filter.values()): op._doc["$inc"] for op in _irrigation_updates(docs)}
+    assert ops[(DAY, "s1", "Irrigation Needed")] == {"count": 2, "moisture_sum": 42.0}
+    assert ops[(DAY, "none", "Monitor - Low")] == {"count": 1, "moisture_sum": 30.0}
+
+
+def test_yield_histogram_percentiles_track_exact_ones():
+    values = np.random.default_rng(0).lognormal(mean=2.0, sigma=0.8, size=5000)
+    docs = [{"created_at": _at(0), "input_features": {"crop": "Rice", "season": 1}, "predicted_yield": float(v)}
+            for v in values]
+    (op,) = _yield_updates(docs)
+    assert op._filter == {"day": DAY, "crop": "Rice", "season": "1"}
+    hist = {k[len("hist."):]: n for k, n in op._doc["$inc"].items() if k.startswith("hist.")}
+    assert sum(hist.values()) == 5000
+    # a few dozen buckets summarize thousands of predictions
+    assert len(hist) < 200
+
+    est = histogram_percentiles(hist, [10, 50, 90, 100], values.min(), values.max())
+    for q in (10, 50, 90):
+        assert est[f"p{q}"] == pytest.approx(np.percentile(values, q), rel=0.06)
+    assert est["p100"] == pytest.approx(values.max())
+
+
+def test_numeric_labels_are_spelled_like_the_rebuild():
+    # $toString in the rebuild pipeline drops the ".0" of whole numbers, so the fold must too
+    docs = [{"created_at": _at(0), "input_features": {"crop": "Rice", "season": s}, "predicted_yield": 3.0}
+            for s in (2, 2.0, 2.5, "", None)]
+    ops = _yield_updates(docs)
+    assert sorted(op._filter["season"] for op in ops) == ["2", "2.5", "unknown"]
+    assert [op._doc["$inc"]["count"] for op in ops if op._filter["season"] == "2"] == [2]
+
+
+def test_zero_and_empty_histograms():
+    assert yield_bin(0.0) == "z" and yield_bin(-1.0) == "z"
+    assert histogram_percentiles({"z": 3}, [50]) == {"p50": 0.0}
+    assert histogram_percentiles({}, [50]) == {"p50": None}
+
+
+def test_rebuild_pipelines_merge_on_the_summary_keys():
+    for raw, (summary, pipeline) in rebuild_pipelines().items():
+        merge = pipeline[-1]["$merge"]
+        assert merge["into"] == summary and merge["on"] == SUMMARY_KEYS[summary]
+        assert raw.endswith("_predictions")
+
+
+class _FakeDb:
+    def __init__(self):
+        self.docs = {}
+
+    def __getitem__(self, name):
+        db = self
+
+        class Coll:
+            async def insert_many(self, docs, ordered=True):
+                from pymongo.errors import BulkWriteError
+                errors = []
+                for i, d in enumerate(docs):
+                    if d["_id"] in db.docs:
+                        errors.append({"index": i, "code": 11000, "errmsg": "dup"})
+                    db.docs[d["_id"]] = d
+                if errors:
+                    raise BulkWriteError({"writeErrors": errors})
+        return Coll()
+
+
+def test_queue_folds_only_newly_written_documents():
+    db = _FakeDb()
+    folded = []
+
+    async def fold(collection, docs):
+        folded.append((collection, len(docs)))
+
+    async def run():
+        queue = PersistenceQueue(lambda: db, after_insert=fold, flush_interval_ms=60000)
+        first = {"_id": ObjectId(), "predicted_class": "rust"}
+        queue.enqueue_many("disease_predictions", [first, {"predicted_class": "blight"}])
+        await queue.flush()
+        # a replayed copy of `first` is a duplicate and must not be counted again
+        queue.enqueue_many("disease_predictions", [dict(first), {"predicted_class": "rust"}])
+        await queue.close()
+
+    asyncio.run(run())
+    assert folded == [("disease_predictions", 2), ("disease_predictions", 1)]
+
+
+def test_fold_skips_unknown_collections():
+    class Boom:
+        def __getitem__(self, name):
+            raise AssertionError("no write expected")
+
+    asyncio.run(analytics_service.fold_predictions("sensor_readings", [{"x": 1}], db=Boom()))
@@ -0,0 +1,41 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.batcher import MicroBatcher
+
+
+def test_requests_are_grouped_into_batches():
+    seen = []
+
+    def double(items):
+        seen.append(len(items))
+        return [i * 2 for i in items]
+
+    async def run():
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [i * 2 for i in range(10)]
+    assert max(seen) == 4
+    assert sum(seen) == 10
+    assert len(seen) < 10
+
+
+def test_batch_errors_reach_every_caller():
+    def boom(items):
+        raise ValueError("bad batch")
+
+    async def run():
+        batcher = MicroBatcher(boom, max_batch_size=8, max_wait_ms=10)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
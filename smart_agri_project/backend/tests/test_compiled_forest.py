@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ml.compiled_forest import CompiledForest, compile_forest
+
+
+def _fit(n_estimators=50, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(800, n_features))
+    y = 3 * X[:, 0] + np.sin(X[:, 1]) + rng.normal(scale=0.3, size=800)
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=seed).fit(X, y), rng
+
+
+def test_compiled_forest_matches_sklearn():
+    model, rng = _fit()
+    compiled = CompiledForest(model, max_rows=None)
+    for n in (1, 7, 500):
+        X = rng.normal(size=(n, 6))
+        np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_compiled_forest_routes_missing_values_like_sklearn():
+    model, rng = _fit()
+    compiled = CompiledForest(model, max_rows=None)
+    X = rng.normal(size=(200, 6))
+    X[::3, 1] = np.nan
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_large_batches_fall_back_to_sklearn():
+    model, rng = _fit(n_estimators=10)
+    compiled = compile_forest(model, max_rows=16)
+    X = rng.normal(size=(64, 6))
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X))
+
+
+def test_non_forest_models_are_returned_unchanged():
+    sentinel = object()
+    assert compile_forest(sentinel) is sentinel
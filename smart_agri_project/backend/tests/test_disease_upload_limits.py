@@ -0,0 +1,90 @@
+import asyncio
+import io
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.config.settings import settings
+from src.routes.disease import _collect_sources
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    buf.seek(0)
+    return UploadFile(buf, filename="scan.zip", headers=Headers({"content-type": "application/zip"}))
+
+
+def _collect(files):
+    try:
+        return asyncio.run(_collect_sources(files)), None
+    except HTTPException as e:
+        return None, e
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "DISEASE_BULK_MAX_IMAGES", 3)
+    monkeypatch.setattr(settings, "DISEASE_BULK_MAX_IMAGE_BYTES", 1000)
+    monkeypatch.setattr(settings, "DISEASE_BULK_MAX_TOTAL_BYTES", 2500)
+
+
+def test_archives_within_limits_are_extracted(limits):
+    sources, err = _collect([_zip({"a.jpg": b"a" * 900, "b.png": b"b" * 900, "notes.txt": b"x" * 5000})])
+    assert err is None
+    assert [name for name, _ in sources] == ["a.jpg", "b.png"]
+
+
+@pytest.mark.parametrize("entries, detail", [
+    # compresses to a few bytes, but would expand past the per-image limit
+    ({"bomb.jpg": b"\0" * 10_000_000}, "Image too large"),
+    ({f"{i}.jpg": b"x" * 900 for i in range(3)}, "Upload too large"),
+    ({f"{i}.jpg": b"x" for i in range(4)}, "Too many images"),
+])
+def test_limits_are_checked_before_decompressing(limits, entries, detail):
+    _, err = _collect([_zip(entries)])
+    assert err.status_code == 413 and detail in err.detail
+
+
+def test_parts_without_a_declared_size_are_measured(limits):
+    part = UploadFile(io.BytesIO(b"x" * 1500), filename="big.jpg", headers=Headers({"content-type": "image/jpeg"}))
+    assert part.size is None
+    _, err = _collect([part])
+    assert err.status_code == 413 and "Image too large" in err.detail
+
+
+def test_predictions_sent_before_a_disconnect_are_stored(monkeypatch):
+    from src.routes import disease
+    from src.services import db_service, disease_service
+
+    async def predict_many(sources):
+        for i, (name, _) in enumerate(sources):
+            yield {"index": i, "filename": name, "predicted_class": "rust", "confidence": 0.9}
+
+    queued = []
+    monkeypatch.setattr(disease_service, "predict_disease_many", predict_many)
+    monkeypatch.setattr(db_service.prediction_queue, "enqueue_many",
+                        lambda collection, docs: queued.extend(docs) or [])
+    files = [UploadFile(io.BytesIO(b"x"), filename=f"{i}.jpg", headers=Headers({"content-type": "image/jpeg"}))
+             for i in range(3)]
+
+    async def run():
+        response = await disease.predict_leaf_disease_batch(files)
+        stream = response.body_iterator
+        first = await stream.__anext__()
+        # the client goes away after the first line
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(run())
+    assert [d["_id"] for d in queued] == [ObjectId(json.loads(first)["db_id"])]
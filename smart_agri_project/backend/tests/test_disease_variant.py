@@ -0,0 +1,57 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import disease_service
+from src.services.model_store import file_sha256
+
+
+def _use_artifacts(monkeypatch, tmp_path, variant, present, int8_top1_drop=0.002):
+    files = {"int8": tmp_path / "int8.ts", "torchscript": tmp_path / "fp32.ts",
+             "model": tmp_path / "model.pth", "export_report": tmp_path / "report.json"}
+    files["model"].write_bytes(b"weights")
+    for name in present:
+        files[name].write_bytes(b"")
+    report = {"source_sha256": file_sha256(files["model"]), "int8_top1_drop": int8_top1_drop}
+    files["export_report"].write_text(json.dumps(report))
+    monkeypatch.setattr(disease_service.settings, "DISEASE_MODEL_VARIANT", variant)
+    return files
+
+
+def test_auto_prefers_int8_then_torchscript(monkeypatch, tmp_path):
+    files = _use_artifacts(monkeypatch, tmp_path, "auto", ["int8", "torchscript"])
+    expected = "int8" if disease_service.device.type == "cpu" else "torchscript"
+    assert disease_service._select_variant(files) == expected
+
+
+def test_auto_uses_torchscript_when_int8_missing(monkeypatch, tmp_path):
+    files = _use_artifacts(monkeypatch, tmp_path, "auto", ["torchscript"])
+    assert disease_service._select_variant(files) == "torchscript"
+
+
+def test_falls_back_to_eager_without_artifacts(monkeypatch, tmp_path):
+    files = _use_artifacts(monkeypatch, tmp_path, "int8", [])
+    assert disease_service._select_variant(files) == "eager"
+    files = _use_artifacts(monkeypatch, tmp_path, "eager", ["int8", "torchscript"])
+    assert disease_service._select_variant(files) == "eager"
+
+
+def test_exports_of_an_older_pth_are_ignored(monkeypatch, tmp_path):
+    files = _use_artifacts(monkeypatch, tmp_path, "auto", ["int8", "torchscript"])
+    # retrained after the export
+    files["model"].write_bytes(b"new weights")
+    assert disease_service._select_variant(files) == "eager"
+    files["export_report"].unlink()
+    assert disease_service._select_variant(files) == "eager"
+
+
+def test_auto_skips_int8_beyond_the_accuracy_budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(disease_service.settings, "DISEASE_INT8_MAX_TOP1_DROP", 0.01)
+    files = _use_artifacts(monkeypatch, tmp_path, "auto", ["int8", "torchscript"], int8_top1_drop=0.03)
+    assert disease_service._select_variant(files) == "torchscript"
+    # an explicit choice is still honoured
+    files = _use_artifacts(monkeypatch, tmp_path, "int8", ["int8"], int8_top1_drop=0.03)
+    expected = "int8" if disease_service.device.type == "cpu" else "eager"
+    assert disease_service._select_variant(files) == expected
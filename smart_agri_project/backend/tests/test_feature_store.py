@@ -0,0 +1,148 @@
+import asyncio
+import datetime
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import irrigation_service
+from src.services.feature_store import SensorFeatureStore, UnknownSensorError
+from src.services.model_registry import Served
+
+START = datetime.datetime(2026, 6, 1)
+
+
+def _doc(sensor_id, minute, moisture, temp=20.0, humidity=50.0):
+    return {"sensor_id": sensor_id, "timestamp": START + datetime.timedelta(minutes=minute),
+            "soil_moisture_pct": moisture, "temp_C": temp, "humidity_pct": humidity, "pH": 6.5}
+
+
+def test_rolling_features_match_pandas_with_fixed_memory():
+    store = SensorFeatureStore(capacity=8, windows=(3, 12))
+    moisture = np.random.default_rng(0).uniform(10, 60, 40)
+    store.add_many([_doc("a", i, m) for i, m in enumerate(moisture)])
+    ring = store._rings["a"]
+    assert ring.values.shape == (8, 4) and len(ring.times) == 8
+
+    s = pd.Series(moisture)
+    feats = store.features("a")
+    assert feats["previous_moisture"] == moisture[-1]
+    assert feats["moisture_delta"] == pytest.approx(moisture[-1] - moisture[-2])
+    assert feats["moisture_mean_3"] == pytest.approx(s.rolling(3).mean().iloc[-1])
+    # windows are capped at the buffer size
+    assert feats["moisture_mean_8"] == pytest.approx(s.rolling(8).mean().iloc[-1])
+    assert feats["readings"] == 8
+
+
+def test_stale_readings_are_ignored():
+    store = SensorFeatureStore(capacity=4)
+    store.add(_doc("a", 5, 30.0))
+    store.add(_doc("a", 1, 99.0))
+    assert store.features("a")["previous_moisture"] == 30.0
+    assert store.features("a")["moisture_delta"] is None
+    assert store.stats["stale"] == 1
+    assert store.features("missing") is None
+
+
+class _FakeCursor:
+    def __init__(self, groups):
+        self.groups = groups
+
+    def __aiter__(self):
+        async def gen():
+            for g in self.groups:
+                yield g
+        return gen()
+
+
+class _FakeDb:
+    def __init__(self, groups):
+        self.groups = groups
+        self.pipelines = []
+
+    def __getitem__(self, name):
+        return self
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return _FakeCursor(self.groups)
+
+
+def test_rebuild_from_one_aggregation():
+    newest_first = [{"timestamp": d["timestamp"], **{k: d[k] for k in ("temp_C", "humidity_pct", "soil_moisture_pct", "pH")}}
+                    for d in reversed([_doc("a", i, 10.0 + i) for i in range(4)])]
+    db = _FakeDb([{"_id": "a", "rows": newest_first}])
+    store = SensorFeatureStore(capacity=4)
+    store.add(_doc("stale", 0, 1.0))
+    assert asyncio.run(store.rebuild(db)) == 1
+    assert len(db.pipelines) == 1
+    assert "stale" not in store
+    feats = store.features("a")
+    assert feats["previous_moisture"] == 13.0
+    assert feats["moisture_mean_3"] == pytest.approx(12.0)
+
+
+class _EchoModel:
+    def predict(self, X):
+        return X[:, -1]
+
+
+def test_irrigation_prediction_from_sensor_id(monkeypatch):
+    store = SensorFeatureStore(capacity=4)
+    store.add_many([_doc("plot-1", 0, 30.0), _doc("plot-1", 1, 33.0, temp=25.0, humidity=70.0)])
+    monkeypatch.setattr(irrigation_service, "feature_store", store)
+    monkeypatch.setattr(irrigation_service._served, "current", Served(_EchoModel(), "echo"))
+    if irrigation_service._cache is not None:
+        irrigation_service._cache.clear()
+
+    result = irrigation_service.predict_irrigation({"sensor_id": "plot-1"})
+    # the echo model returns Previous_Soil_Moisture
+    assert result["predicted_moisture"] == 33.0
+    assert result["sensor_features"]["moisture_delta"] == 3.0
+    X = irrigation_service._build_feature_matrix(irrigation_service._with_sensor_features([{"sensor_id": "plot-1"}])[0])
+    assert X[0].tolist() == [70.0, 25.0, 23.0, 19.0, 33.0]
+
+    # caller-supplied values win over the store
+    assert irrigation_service.predict_irrigation({"sensor_id": "plot-1", "previous_moisture": 12.0})["predicted_moisture"] == 12.0
+    with pytest.raises(UnknownSensorError):
+        irrigation_service.predict_irrigation({"sensor_id": "nope"})
+
+
+def test_string_timestamps_from_older_rows():
+    iso = lambda minute: (START + datetime.timedelta(minutes=minute)).isoformat()
+    rows = [{"timestamp": iso(1), "soil_moisture_pct": 11.0},
+            {"timestamp": START + datetime.timedelta(minutes=2), "soil_moisture_pct": 12.0},
+            {"timestamp": "garbage", "soil_moisture_pct": 99.0}]
+    store = SensorFeatureStore(capacity=4)
+    asyncio.run(store.rebuild(_FakeDb([{"_id": "a", "rows": rows}])))
+    feats = store.features("a")
+    assert feats["previous_moisture"] == 12.0 and feats["moisture_delta"] == 1.0
+    assert feats["last_timestamp"] == iso(2)
+
+    store.add({"sensor_id": "a", "timestamp": iso(3), "soil_moisture_pct": 13.0})
+    store.add(_doc("a", 0, 50.0))
+    store.add({"sensor_id": "a", "timestamp": "not a time", "soil_moisture_pct": 1.0})
+    assert store.features("a")["previous_moisture"] == 13.0
+    assert store.stats["stale"] == 1 and store.stats["invalid"] == 1
+
+
+def test_feature_store_failure_does_not_skip_rollups(monkeypatch):
+    from src.services import sensor_service
+
+    class _Broken:
+        def add_many(self, docs):
+            raise RuntimeError("boom")
+
+    rolled = []
+
+    async def rollups(docs):
+        rolled.extend(docs)
+
+    monkeypatch.setattr(sensor_service, "feature_store", _Broken())
+    monkeypatch.setattr(sensor_service, "update_rollups", rollups)
+    asyncio.run(sensor_service.after_sensor_insert([_doc("a", 0, 1.0)]))
+    assert len(rolled) == 1
@@ -0,0 +1,196 @@
+import asyncio
+import datetime
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import db_service
+
+START = datetime.datetime(2026, 6, 1)
+OPS = {"$lt": lambda a, b: a < b, "$gte": lambda a, b: a >= b}
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(_matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+        elif isinstance(cond, dict):
+            if not all(OPS[op](doc[key], v) for op, v in cond.items()):
+                return False
+        elif doc.get(key) != cond:
+            return False
+    return True
+
+
+class _FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        async def gen():
+            for d in self.docs:
+                yield d
+        return gen()
+
+
+class _FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append((query, projection))
+        out = []
+        for d in self.docs:
+            if _matches(d, query):
+                keep = d if projection is None else {k: v for k, v in d.items() if k == "_id" or k in projection}
+                out.append(dict(keep))
+        return _FakeCursor(out)
+
+
+@pytest.fixture
+def disease(monkeypatch):
+    # 25 predictions, several sharing a timestamp so the _id tie-break matters
+    docs = [{"_id": ObjectId(), "created_at": START + datetime.timedelta(minutes=i // 3),
+             "predicted_class": "rust" if i % 2 else "blight", "confidence": 0.5, "meta": {"i": i}}
+            for i in range(25)]
+    coll = _FakeCollection(docs)
+    monkeypatch.setattr(db_service, "_db", lambda: {"disease_predictions": coll})
+    return coll
+
+
+def _all_pages(**kwargs):
+    async def run():
+        pages, cursor = [], None
+        while True:
+            items, cursor = await db_service.find_history("disease", limit=4, cursor=cursor, **kwargs)
+            pages.append(items)
+            if cursor is None:
+                return pages
+    return asyncio.run(run())
+
+
+def test_keyset_pages_cover_everything_once(disease):
+    pages = _all_pages()
+    ids = [d["_id"] for page in pages for d in page]
+    expected = sorted(disease.docs, key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+    assert ids == [str(d["_id"]) for d in expected]
+    assert [len(p) for p in pages] == [4] * 6 + [1]
+
+
+def test_filters_and_projection(disease):
+    pages = _all_pages(filters={"predicted_class": "rust", "model_version": None}, fields=["predicted_class"])
+    items = [d for page in pages for d in page]
+    assert len(items) == 12
+    assert all(set(d) == {"_id", "predicted_class", "created_at"} for d in items)
+    query, projection = disease.queries[-1]
+    assert projection == {"predicted_class": 1, "created_at": 1}
+    assert query["$and"][0] == {"predicted_class": "rust"}
+
+
+def test_time_range(disease):
+    items, _ = asyncio.run(db_service.find_history(
+        "disease", limit=100, since=START + datetime.timedelta(minutes=2), until=START + datetime.timedelta(minutes=4)))
+    assert len(items) == 6
+
+
+def test_bad_requests_are_value_errors():
+    with pytest.raises(ValueError):
+        db_service.history_query("disease", filters={"recommendation": "x"})
+    with pytest.raises(ValueError):
+        db_service.history_query("disease", fields=["password"])
+    with pytest.raises(ValueError):
+        db_service.decode_cursor("not-a-cursor")
+
+
+def test_indexes_match_filters():
+    indexes = db_service.history_indexes()
+    assert [("predicted_class", 1), ("created_at", -1), ("_id", -1)] in indexes["disease_predictions"]
+    assert [("recommendation", 1), ("created_at", -1), ("_id", -1)] in indexes["irrigation_predictions"]
+    assert all(idx[0] == db_service.NEWEST_FIRST for idx in indexes.values())
+
+
+def test_export_streams_ndjson(disease):
+    from fastapi.testclient import TestClient
+    import src.main as main
+
+    client = TestClient(main.app)
+    res = client.get("/history/disease/export", params={"predicted_class": "blight", "fields": "confidence"})
+    assert res.status_code == 200
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert len(lines) == 13
+    assert lines[0]["created_at"] == "2026-06-01T00:08:00"
+
+    page = client.get("/history/disease", params={"limit": 10}).json()
+    assert page["count"] == 10 and page["next_cursor"]
+    assert client.get("/history/disease", params={"recommendation": "x"}).status_code == 400
+    assert client.get("/history/nothing").status_code == 404
+
+
+class _MigratingCollection:
+    """Applies the $dateFromString pipeline the way Mongo does, onError included."""
+
+    def __init__(self, values):
+        self.values = values
+
+    async def update_many(self, query, pipeline):
+        spec = pipeline[0]["$set"]["created_at"]["$dateFromString"]
+        assert spec["onError"] == "$created_at"
+        modified = 0
+        for i, v in enumerate(self.values):
+            if isinstance(v, str):
+                try:
+                    self.values[i] = datetime.datetime.fromisoformat(v)
+                    modified += 1
+                except ValueError:
+                    pass
+
+        class Result:
+            modified_count = modified
+        return Result()
+
+    async def count_documents(self, query):
+        return sum(isinstance(v, str) for v in self.values)
+
+
+class _BrokenCollection:
+    async def update_many(self, query, pipeline):
+        raise RuntimeError("not primary")
+
+
+def test_created_at_migration_skips_bad_strings_and_continues():
+    disease = _MigratingCollection(["2026-06-01T00:00:00", "garbage", START])
+    yields = _MigratingCollection(["2026-06-02T00:00:00"])
+    db = {"disease_predictions": disease, "irrigation_predictions": _BrokenCollection(),
+          "yield_predictions": yields}
+
+    report = asyncio.run(db_service.migrate_created_at(db))
+    assert report["disease_predictions"] == {"converted": 1, "invalid": 1}
+    assert "error" in report["irrigation_predictions"]
+    # a failing collection does not stop the ones after it
+    assert report["yield_predictions"] == {"converted": 1, "invalid": 0}
+    assert disease.values[1] == "garbage"
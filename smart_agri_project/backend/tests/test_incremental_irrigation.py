@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import src.services.incremental_irrigation as inc
+from src.services.model_store import ModelStore
+
+START = datetime.datetime(2026, 5, 1)
+
+
+def _readings(n, offset=0, sensors=("s1", "s2", "s3")):
+    rng = np.random.default_rng(offset)
+    rows = []
+    moisture = {s: 40.0 for s in sensors}
+    for i in range(offset, offset + n):
+        s = sensors[i % len(sensors)]
+        temp, hum = rng.uniform(15, 35), rng.uniform(30, 90)
+        moisture[s] = float(np.clip(moisture[s] * 0.9 + 0.1 * hum - 0.2 * (temp - 25), 0, 100))
+        rows.append({"_id": f"id{i}", "sensor_id": s, "timestamp": START + datetime.timedelta(minutes=i),
+                     "temp_C": temp, "humidity_pct": hum, "soil_moisture_pct": moisture[s]})
+    return pd.DataFrame(rows)
+
+
+async def _batches(df, size):
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+
+def test_lag_carries_across_batches():
+    df = _readings(30)
+    last = {}
+    parts = [inc.lagged_features(df.iloc[i:i + 7], last) for i in range(0, 30, 7)]
+    X = np.concatenate([p[0] for p in parts])
+
+    expected = df.groupby("sensor_id")["soil_moisture_pct"].shift(1).dropna()
+    prev_col = inc.EXPECTED_FEATURES.index("Previous_Soil_Moisture")
+    assert np.allclose(X[:, prev_col], expected.to_numpy())
+    assert last == df.groupby("sensor_id")["soil_moisture_pct"].last().to_dict()
+
+
+def test_incremental_runs_publish_and_advance_watermark(monkeypatch, tmp_path):
+    monkeypatch.setattr(inc, "MODEL_PATH", tmp_path / "missing.pkl")
+    model_store = ModelStore(tmp_path / "store")
+    state_dir = tmp_path / "state"
+    kwargs = dict(model_store=model_store, state_dir=state_dir, trees_per_run=5, max_trees=12,
+                  min_rows=50)
+
+    # too few rows: nothing is consumed
+    early = asyncio.run(inc.run_incremental(_batches(_readings(20), 10), **kwargs))
+    assert early["status"] == "waiting"
+    assert not (state_dir / "state.json").exists()
+
+    first = asyncio.run(inc.run_incremental(_batches(_readings(600), 100), **kwargs))
+    assert first["status"] == "published"
+    state, buffers = inc.load_state(state_dir)
+    assert state.watermark == (START + datetime.timedelta(minutes=599)).isoformat()
+    assert state.watermark_ids == ["id599"]
+    assert set(state.last_moisture) == {"s1", "s2", "s3"}
+    assert len(buffers["holdout_y"]) == first["holdout_rows"] > 0
+
+    for run in range(2):
+        result = asyncio.run(inc.run_incremental(_batches(_readings(300, offset=600 + 300 * run), 100), **kwargs))
+        assert result["new_rows"] == 300
+        assert result["status"] in ("published", "rejected")
+        if result["status"] == "rejected":
+            assert result["holdout_rmse"] > result["previous_holdout_rmse"]
+
+    served = joblib.load(model_store.resolve("irrigation").path)
+    versions = model_store.versions("irrigation")
+    # nothing to grow yet: the first version is a window fit
+    assert versions[0]["incremental"]["mode"] == "window"
+    assert all(v["incremental"]["mode"] == "warm_start" for v in versions[1:])
+    # the first version is a fresh forest; warm-started ones keep the newest max_trees trees
+    assert len(served.estimators_) == (100 if len(versions) == 1 else 12)
+    assert inc.load_state(state_dir)[0].runs == 3
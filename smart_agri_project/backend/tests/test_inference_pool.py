@@ -0,0 +1,139 @@
+import asyncio
+import math
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.inference_pool import InferencePool, PoolSaturatedError, sklearn_pool
+from src.utils.batcher import MicroBatcher
+
+
+def test_pool_sheds_load_beyond_workers_plus_queue():
+    release = threading.Event()
+
+    def blocked(x):
+        release.wait(5)
+        return x
+
+    async def run():
+        pool = InferencePool("test", workers=1, max_queue=1, retry_after_s=2)
+        first = asyncio.ensure_future(pool.run(blocked, 1))
+        second = asyncio.ensure_future(pool.run(blocked, 2))
+        await asyncio.sleep(0.05)
+        busy = pool.stats()
+        with pytest.raises(PoolSaturatedError) as exc:
+            await pool.run(blocked, 3)
+        release.set()
+        results = await asyncio.gather(first, second)
+        await pool.shutdown()
+        return busy, exc.value, results, pool.stats()
+
+    busy, error, results, stats = asyncio.run(run())
+    assert busy["in_flight"] == 2 and busy["queued"] == 1 and busy["busy_workers"] == 1
+    assert error.headers == {"Retry-After": "2"}
+    assert results == [1, 2]
+    assert stats["submitted"] == 2 and stats["completed"] == 2 and stats["rejected"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["busy_seconds"] > 0 and 0 < stats["utilization"] <= 1.0
+
+
+def test_failures_release_their_slot():
+    def boom():
+        raise ValueError("bad input")
+
+    async def run():
+        pool = InferencePool("test", workers=1, max_queue=0)
+        with pytest.raises(ValueError):
+            await pool.run(boom)
+        result = await pool.run(math.sqrt, 16.0)
+        await pool.shutdown()
+        return result, pool.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == 4.0
+    assert stats["failed"] == 1 and stats["completed"] == 1 and stats["in_flight"] == 0
+
+
+def test_process_pool_runs_picklable_calls():
+    async def run():
+        pool = InferencePool("proc", kind="process", workers=1, max_queue=4)
+        results = await asyncio.gather(*(pool.run(math.sqrt, float(i * i)) for i in range(4)))
+        await pool.shutdown()
+        return results
+
+    assert asyncio.run(run()) == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_batcher_runs_on_the_pool():
+    threads = set()
+
+    def add_one(items):
+        threads.add(threading.current_thread().name)
+        return [i + 1 for i in items]
+
+    async def run():
+        pool = InferencePool("test", workers=1)
+        batcher = MicroBatcher(add_one, max_batch_size=8,
+                               max_wait_ms=20, execute=pool.execute)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.stop()
+        await pool.shutdown()
+        return results, pool.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == [1, 2, 3, 4, 5]
+    # execute() alone does not count against admission
+    assert stats["submitted"] == 0
+    assert all(name.startswith("test-pool") for name in threads)
+
+
+def test_saturated_pool_answers_503(monkeypatch):
+    from fastapi.testclient import TestClient
+    import src.main as main
+
+    async def saturated(*args):
+        raise PoolSaturatedError("sklearn", 130, 1)
+
+    monkeypatch.setattr(sklearn_pool, "run", saturated)
+    client = TestClient(main.app)
+    res = client.post("/predict/irrigation/", json={"humidity": 50.0, "temperature": 25.0, "previous_moisture": 30.0})
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
+
+    pools = client.get("/health/pools").json()
+    assert set(pools) == {"torch", "sklearn"}
+    assert pools["sklearn"]["kind"] in ("thread", "process")
+
+
+def test_bulk_disease_scans_are_admitted(monkeypatch):
+    from fastapi.testclient import TestClient
+    import src.main as main
+    from src.services import disease_service
+    from src.services.inference_pool import torch_pool
+
+    seen = []
+
+    async def run_batch(tensors):
+        seen.append(torch_pool.stats()["in_flight"])
+        return [{"predicted_class": "rust", "confidence": 0.9} for _ in tensors]
+
+    monkeypatch.setattr(disease_service.batcher, "run_batch", run_batch)
+    monkeypatch.setattr(disease_service, "_load_image_tensor", lambda src: src)
+    sources = [(f"{i}.jpg", b"x") for i in range(5)]
+
+    async def scan():
+        return [item async for item in disease_service.predict_disease_many(sources, batch_size=2)]
+
+    assert len(asyncio.run(scan())) == 5
+    # one slot for the whole scan, released at the end
+    assert seen == [1, 1, 1] and torch_pool.stats()["in_flight"] == 0
+
+    monkeypatch.setattr(torch_pool, "_pending", torch_pool.limit)
+    client = TestClient(main.app)
+    res = client.post("/predict/disease/batch", files=[("files", ("a.jpg", b"x", "image/jpeg"))])
+    assert res.status_code == 503
+    assert "Retry-After" in res.headers
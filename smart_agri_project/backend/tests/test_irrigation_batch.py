@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import irrigation_service
+from src.services.model_registry import Served
+from src.services.irrigation_service import (
+    EXPECTED_FEATURES, _build_feature_matrix, predict_irrigation, predict_irrigation_batch
+)
+
+
+def _fit_model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 100, (300, 5)), columns=EXPECTED_FEATURES)
+    y = X["Previous_Soil_Moisture"] * 0.9 + rng.normal(0, 2, 300)
+    return RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y)
+
+
+def test_feature_matrix_maps_aliases_and_estimates():
+    X = _build_feature_matrix([
+        {"temperature": 30, "humidity": 60, "previous_moisture": 20},
+        {"Atmospheric_Temp": 25, "Humidity": 80, "Dew_Point": 21, "Soil_Temp": 24, "soil_moisture": 33},
+        {"temperature": None, "Atmospheric_Temp": 10, "humidity": 50},
+    ])
+    assert X.shape == (3, 5)
+    # Humidity, Atmospheric_Temp, Soil_Temp, Dew_Point, Previous_Soil_Moisture
+    assert X[0].tolist() == [60, 30, 28, 22, 20]
+    assert X[1].tolist() == [80, 25, 24, 21, 33]
+    assert X[2].tolist() == [50, 10, 8, 0, 0]
+
+
+def test_batch_matches_single_predictions(monkeypatch, tmp_path):
+    monkeypatch.setattr(irrigation_service._served, "current", Served(_fit_model(), "test"))
+    if irrigation_service._cache is not None:
+        irrigation_service._cache.clear()
+    records = [{"temperature": t, "humidity": 70, "previous_moisture": m}
+               for t, m in [(20, 10), (27, 31.8), (35, 80)]]
+    batch = predict_irrigation_batch(records)
+    singles = [predict_irrigation(r) for r in records]
+    assert batch == singles
+    for res in batch:
+        p = res["predicted_moisture"]
+        expected = ("Irrigation Needed" if p < 25 else
+                    "Monitor - Low" if p < 40 else "No Irrigation Required")
+        assert res["recommendation"] == expected
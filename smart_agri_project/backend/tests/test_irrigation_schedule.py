@@ -0,0 +1,98 @@
+import datetime
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import irrigation_scheduler, irrigation_service
+from src.services.feature_store import SensorFeatureStore
+from src.services.irrigation_scheduler import _allocate, schedule_irrigation
+from src.services.model_registry import Served
+
+
+class _DryingModel:
+    """Tomorrow's moisture = today's - 5 (Previous_Soil_Moisture is the last feature)."""
+
+    def predict(self, X):
+        return X[:, -1] - 5.0
+
+
+@pytest.fixture(autouse=True)
+def _model(monkeypatch):
+    monkeypatch.setattr(irrigation_service._served, "current", Served(_DryingModel(), "dry"))
+
+
+FORECAST = [{"temperature": 25.0, "humidity": 60.0, "rainfall": 0.0}] * 3
+
+
+def test_roll_forward_feeds_predictions_back():
+    plots = [{"plot_id": "wet", "previous_moisture": 80.0},
+             {"plot_id": "dry", "previous_moisture": 32.0, "area_m2": 500.0, "moisture_per_mm": 2.0}]
+    result = schedule_irrigation(plots, FORECAST, horizon_days=3)
+    wet, dry = result["plots"]
+    assert wet["predicted_moisture"] == [75.0, 70.0, 65.0]
+    assert wet["water_m3"] == 0.0
+    # 32 -> 27 -> 22 (< 25): topped up to 40 with (40 - 22) / 2 = 9 mm, then dries again
+    assert dry["predicted_moisture"] == [27.0, 22.0, 35.0]
+    assert dry["irrigation_mm"] == [0.0, 9.0, 0.0]
+    assert dry["moisture_after"] == [27.0, 40.0, 35.0]
+    assert dry["water_m3"] == pytest.approx(9 * 500 / 1000)
+    assert result["plot_days_below_trigger"] == 0
+
+
+def test_capacity_serves_most_urgent_first_and_carries_deficit():
+    plots = [{"plot_id": f"p{i}", "previous_moisture": m, "area_m2": 1000.0}
+             for i, m in enumerate([26.0, 20.0, 28.0])]
+    result = schedule_irrigation(plots, FORECAST[:1], horizon_days=1,
+                                 constraints={"pump_capacity_m3_per_day": 30.0})
+    mm = [p["irrigation_mm"][0] for p in result["plots"]]
+    # predictions 21, 15, 23: p1 is most urgent and needs 25 mm, p0 gets the remaining 5 of 19
+    assert mm == [5.0, 25.0, 0.0]
+    assert result["daily"][0]["plots_short"] == 2
+    assert result["daily"][0]["water_m3"] == 30.0
+
+
+def test_allocate_is_unchanged_when_within_limit():
+    need = np.array([1.0, 2.0])
+    assert _allocate(need, np.array([0.0, -1.0]), 5.0) is need
+    assert _allocate(need, np.array([0.0, -1.0]), 2.5).tolist() == [0.5, 2.0]
+
+
+def test_sensor_start_and_per_plot_forecast(monkeypatch):
+    store = SensorFeatureStore(capacity=4)
+    store.add({"sensor_id": "s1", "timestamp": datetime.datetime(2026, 6, 1), "soil_moisture_pct": 50.0,
+               "temp_C": 20.0, "humidity_pct": 50.0, "pH": 6.5})
+    monkeypatch.setattr(irrigation_scheduler, "feature_store", store)
+    rainy = [{"temperature": 20.0, "humidity": 90.0, "rainfall": 10.0}] * 2
+    plots = [{"plot_id": "a", "sensor_id": "s1", "forecast": rainy},
+             {"plot_id": "b", "previous_moisture": 50.0}]
+    result = schedule_irrigation(plots, FORECAST, horizon_days=2)
+    assert result["plots"][0]["predicted_moisture"] == [55.0, 60.0]
+    assert result["plots"][1]["predicted_moisture"] == [45.0, 40.0]
+
+    with pytest.raises(ValueError):
+        schedule_irrigation([{"plot_id": "c", "previous_moisture": 30.0}], FORECAST, horizon_days=5)
+    with pytest.raises(ValueError):
+        schedule_irrigation([{"plot_id": "d"}], FORECAST, horizon_days=1)
+
+
+def test_schedule_endpoint(monkeypatch):
+    from fastapi.testclient import TestClient
+    import src.main as main
+    from src.services.inference_pool import sklearn_pool
+
+    # worker processes would not see the monkeypatched model
+    monkeypatch.setattr(sklearn_pool, "kind", "thread")
+    monkeypatch.setattr(sklearn_pool, "initializer", None)
+    monkeypatch.setattr(sklearn_pool, "_executor", None)
+    client = TestClient(main.app)
+    body = {"plots": [{"plot_id": "p1", "previous_moisture": 30.0}],
+            "forecast": FORECAST, "horizon_days": 3,
+            "constraints": {"water_budget_m3": 5.0}}
+    res = client.post("/predict/irrigation/schedule", json=body)
+    assert res.status_code == 200
+    assert res.json()["total_water_m3"] <= 5.0
+    assert client.post("/predict/irrigation/schedule", json={**body, "horizon_days": 10}).status_code == 422
@@ -0,0 +1,69 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.inference_pool import _timed
+from src.utils.metrics import Metrics, metrics, stage_seconds
+from src.utils.prediction_cache import PredictionCache
+
+
+def test_render_prometheus_text():
+    m = Metrics()
+    hits = m.counter("demo_hits", "Demo counter.", ("kind",))
+    latency = m.histogram("demo_seconds", "Demo histogram.", ("kind",), buckets=(0.1, 1.0))
+    hits.inc("a")
+    hits.inc("a", amount=2)
+    for v in (0.05, 0.5, 5.0):
+        latency.observe(v, "a")
+
+    text = m.render()
+    assert "# TYPE demo_hits counter" in text
+    assert 'demo_hits_total{kind="a"} 3' in text
+    assert 'demo_seconds_bucket{kind="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{kind="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{kind="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{kind="a"} 3' in text
+    assert 'demo_seconds_sum{kind="a"} 5.55' in text
+
+
+def test_worker_metrics_are_merged_back():
+    def work():
+        with metrics.stage("test", "inference"):
+            time.sleep(0.001)
+        return 42
+
+    before = stage_seconds.count("test", "inference")
+    # what a process-pool worker does: run, then hand back (and reset) what it recorded
+    result, seconds, recorded = _timed(work, (), True)
+    assert result == 42 and seconds > 0
+    assert stage_seconds.count("test", "inference") == 0
+    metrics.merge(recorded)
+    metrics.merge({"smartagri_stage_seconds": {("test", "inference"): [[0] * 16, 0.5, 1]}})
+    assert stage_seconds.count("test", "inference") >= before + 2
+
+
+def test_cache_hit_ratio():
+    cache = PredictionCache(ttl_s=60, name="test-ratio")
+    cache.get("k")
+    cache.set("k", 1.0)
+    cache.get("k")
+    cache.get("k")
+    assert 'smartagri_cache_hit_ratio{cache="test-ratio"} 0.6666666667' in metrics.render()
+
+
+def test_requests_are_counted_per_route_template():
+    from fastapi.testclient import TestClient
+    import src.main as main
+
+    client = TestClient(main.app)
+    assert client.get("/sensors/no-such-sensor/features").status_code == 404
+    client.get("/definitely/not/a/route")
+
+    text = client.get("/metrics").text
+    assert 'smartagri_http_requests_total{method="GET",route="/sensors/{sensor_id}/features",status="404"}' in text
+    assert "no-such-sensor" not in text
+    assert 'route="unmatched"' in text
+    assert 'smartagri_http_request_duration_seconds_bucket{method="GET",route="/sensors/{sensor_id}/features",le="+Inf"}' in text
+    assert "# TYPE smartagri_pool_utilization gauge" in text
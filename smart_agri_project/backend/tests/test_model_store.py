@@ -0,0 +1,162 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.model_registry import HotSwapModel, registry
+from src.services.model_store import ModelStore
+
+
+def _write(path, text):
+    path.write_text(text)
+    return path
+
+
+def test_publish_resolve_and_pin(tmp_path):
+    store = ModelStore(tmp_path / "store")
+    legacy = _write(tmp_path / "model.txt", "legacy")
+
+    artifact = store.resolve("demo", {"model": legacy})
+    assert artifact.version.startswith("file-")
+    assert artifact.path == legacy
+
+    v1 = store.publish("demo", {"model": _write(tmp_path / "a.txt", "one")},
+                       features=["x"], metrics={"rmse": 2.0})["version"]
+    v2 = store.publish("demo", {"model": _write(tmp_path / "b.txt", "two")})["version"]
+
+    assert [m["version"] for m in store.versions("demo")] == [v1, v2]
+    assert store.resolve("demo", {"model": legacy}).version == v2
+    assert store.manifest("demo", v1)["metrics"] == {"rmse": 2.0}
+
+    store.pin("demo", v1)
+    pinned = store.resolve("demo")
+    assert pinned.version == v1
+    assert pinned.path.read_text() == "one"
+    pinned.verify()
+
+    store.unpin("demo")
+    assert store.resolve("demo").version == v2
+    with pytest.raises(KeyError):
+        store.pin("demo", "nope")
+
+
+def test_checksum_mismatch_is_rejected(tmp_path):
+    store = ModelStore(tmp_path)
+    version = store.publish("demo", {"model": _write(tmp_path / "m.txt", "good")})["version"]
+    artifact = store.resolve("demo")
+    artifact.path.write_text("tampered")
+    with pytest.raises(ValueError):
+        artifact.verify()
+    assert artifact.version == version
+
+
+def test_hot_swap_keeps_old_model_for_holders(tmp_path):
+    store = ModelStore(tmp_path / "store")
+    store.publish("swap_demo", {"model": _write(tmp_path / "a.txt", "one")})
+    holder = HotSwapModel("swap_demo", lambda: store.resolve("swap_demo"), lambda a: a.path.read_text())
+
+    in_flight = holder.get()
+    assert in_flight.value == "one"
+    assert holder.reload() is False
+
+    store.publish("swap_demo", {"model": _write(tmp_path / "b.txt", "two")})
+    assert holder.reload() is True
+    assert holder.get().value == "two"
+    # a request that grabbed the old reference finishes on it
+    assert in_flight.value == "one"
+    assert registry.entry("swap_demo").version == holder.get().version
+    assert registry.entry("swap_demo").previous_version == in_flight.version
+
+
+def test_failed_build_keeps_serving_previous_version(tmp_path):
+    store = ModelStore(tmp_path / "store")
+    store.publish("broken_demo", {"model": _write(tmp_path / "a.txt", "one")})
+
+    def build(artifact):
+        text = artifact.path.read_text()
+        if text == "bad":
+            raise RuntimeError("corrupt model")
+        return text
+
+    holder = HotSwapModel("broken_demo", lambda: store.resolve("broken_demo"), build)
+    assert holder.get().value == "one"
+    store.publish("broken_demo", {"model": _write(tmp_path / "b.txt", "bad")})
+    with pytest.raises(RuntimeError):
+        holder.reload()
+    assert holder.get().value == "one"
+    assert registry.entry("broken_demo").reload_error == "corrupt model"
+
+
+def test_admin_pin_endpoint(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    import src.main as main
+    from src.routes import admin
+
+    store = ModelStore(tmp_path / "store")
+    monkeypatch.setattr(admin, "store", store)
+    version = store.publish("irrigation", {"model": _write(tmp_path / "m.pkl", "x")})["version"]
+
+    client = TestClient(main.app)
+    assert client.post("/admin/models/irrigation/pin", json={"version": "missing"}).status_code == 404
+    assert client.post("/admin/models/unknown/pin", json={"version": version}).status_code == 404
+
+    body = client.post("/admin/models/irrigation/pin", json={"version": version}).json()
+    assert body["pinned"] == version
+    assert store.pinned("irrigation") == version
+    assert client.get("/admin/models").json()["irrigation"]["versions"][0]["version"] == version
+
+    assert client.delete("/admin/models/irrigation/pin").json()["pinned"] is None
+    assert store.pinned("irrigation") is None
+
+
+def test_pool_calls_carry_the_watched_store_version(monkeypatch, tmp_path):
+    import asyncio
+    from src.services import irrigation_scheduler, irrigation_service, yield_service
+    from src.services.inference_pool import sklearn_pool
+
+    store = ModelStore(tmp_path / "store")
+    v1 = store.publish("irrigation", {"model": _write(tmp_path / "a.pkl", "one")})["version"]
+    resolves = []
+
+    def resolve():
+        resolves.append(1)
+        return store.resolve("irrigation")
+
+    def no_model():
+        raise FileNotFoundError("no yield model")
+
+    served = irrigation_service._served
+    monkeypatch.setattr(served, "resolve", resolve)
+    monkeypatch.setattr(served, "current", None)
+    monkeypatch.setattr(served, "target", None)
+    monkeypatch.setattr(yield_service._served, "resolve", no_model)
+    monkeypatch.setattr(yield_service._served, "target", "stale")
+    calls = []
+
+    async def run(fn, *args):
+        calls.append(args[-1])
+        return [] if fn is irrigation_service._predict_in_worker else {}
+
+    monkeypatch.setattr(sklearn_pool, "run", run)
+
+    def watcher_tick():
+        asyncio.run(registry.refresh_targets())
+
+    watcher_tick()
+    asyncio.run(irrigation_service.predict_irrigation_batch_async([{"humidity": 50.0}]))
+    store.pin("irrigation", v1)
+    v2 = store.publish("irrigation", {"model": _write(tmp_path / "b.pkl", "two")})["version"]
+    watcher_tick()
+    asyncio.run(irrigation_scheduler.schedule_irrigation_async([], []))
+    store.unpin("irrigation")
+    watcher_tick()
+    asyncio.run(irrigation_service.predict_irrigation_batch_async([{"humidity": 50.0}]))
+    asyncio.run(yield_service.predict_yield_async({"crop": "Rice"}))
+
+    # this process never loaded a model, yet workers still see the pin and the new version
+    assert irrigation_service.served_version() is None
+    assert calls == [v1, v1, v2, None]
+    # the store is read by the watcher only, never per request
+    assert len(resolves) == 3
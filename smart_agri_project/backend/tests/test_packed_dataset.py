@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader
+from torchvision import datasets
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ml.packed_dataset import PackedImageDataset, ensure_packed, is_stale, pack_dataset, random_affine_batch
+
+
+def _processed(root: Path):
+    rng = np.random.default_rng(0)
+    for split, n in (("train", 5), ("val", 2)):
+        for cls in ("b_blight", "a_healthy"):
+            (root / split / cls).mkdir(parents=True)
+            for i in range(n):
+                Image.fromarray((rng.random((224, 224, 3)) * 255).astype("uint8")).save(root / split / cls / f"{i}.png")
+
+
+def test_packed_arrays_match_imagefolder(tmp_path):
+    _processed(tmp_path)
+    index = pack_dataset(tmp_path, tmp_path / "packed", splits=("train", "val"))
+    assert index["train"]["count"] == 10
+
+    ref = datasets.ImageFolder(tmp_path / "train")
+    ds = PackedImageDataset(tmp_path / "packed", "train")
+    assert ds.classes == ref.classes
+    assert ds.labels.tolist() == [label for _, label in ref.samples]
+    img, _ = ref[3]
+    np.testing.assert_array_equal(ds.images[3], np.asarray(img).transpose(2, 0, 1))
+
+
+def test_batched_fetch_matches_single_items(tmp_path):
+    _processed(tmp_path)
+    pack_dataset(tmp_path, tmp_path / "packed", splits=("val",))
+    ds = PackedImageDataset(tmp_path / "packed", "val", train=False)
+    x, y = ds.__getitems__([3, 0, 2])
+    for row, i in enumerate([3, 0, 2]):
+        xi, yi = ds[i]
+        torch.testing.assert_close(x[row], xi)
+        assert y[row] == yi
+
+    loader = DataLoader(PackedImageDataset(tmp_path / "packed", "val", train=True),
+                        batch_size=3, shuffle=True, collate_fn=PackedImageDataset.collate_fn)
+    xb, yb = next(iter(loader))
+    assert xb.shape == (3, 3, 224, 224) and yb.shape == (3,)
+    assert torch.isfinite(xb).all()
+
+
+def test_affine_batch_identity_and_flip():
+    x = torch.rand(6, 3, 32, 32)
+    out = random_affine_batch(x, scale=(1.0, 1.0), ratio=(1.0, 1.0), degrees=0.0,
+                              generator=torch.Generator().manual_seed(0))
+    for a, b in zip(out, x):
+        assert torch.allclose(a, b, atol=1e-5) or torch.allclose(a, b.flip(-1), atol=1e-5)
+
+
+def test_changed_sources_are_repacked(tmp_path):
+    _processed(tmp_path)
+    packed = tmp_path / "packed"
+    assert ensure_packed(tmp_path, packed, splits=("train", "val")) == ["train", "val"]
+    assert ensure_packed(tmp_path, packed, splits=("train", "val")) == []
+
+    # preprocessing removed one image and added another
+    (tmp_path / "train" / "a_healthy" / "0.png").unlink()
+    Image.new("RGB", (224, 224)).save(tmp_path / "train" / "b_blight" / "9.png")
+    assert is_stale(tmp_path, "train", packed) and not is_stale(tmp_path, "val", packed)
+    assert ensure_packed(tmp_path, packed, splits=("train", "val")) == ["train"]
+    ds = PackedImageDataset(packed, "train")
+    assert len(ds) == 10 and "b_blight/9.png" in ds.index["files"]
@@ -0,0 +1,191 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.db_service import PersistenceQueue
+
+
+class FakeDb:
+    """Collections share one store keyed by _id; `down` makes every write fail like a lost connection."""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = []
+        self.down = False
+
+    def __getitem__(self, name):
+        return _FakeCollection(self, name)
+
+
+class _FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.db.calls.append((self.name, len(docs)))
+        if self.db.down:
+            raise AutoReconnect("connection refused")
+        errors = []
+        for i, doc in enumerate(docs):
+            key = (self.name, doc["_id"])
+            if key in self.db.docs:
+                errors.append({"index": i, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.db.docs[key] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+def _queue(db, tmp_path, **kwargs):
+    options = dict(flush_rows=10, flush_interval_ms=60000, retries=1, backoff_s=0.001, replay_interval_s=0)
+    options.update(kwargs)
+    return PersistenceQueue(lambda: db, spill_path=tmp_path / "spill.jsonl", **options)
+
+
+def test_ids_are_returned_before_the_write(tmp_path):
+    db = FakeDb()
+
+    async def run():
+        queue = _queue(db, tmp_path)
+        ids = [queue.enqueue("yield_predictions", {"predicted_yield": float(i)}) for i in range(5)]
+        ids += queue.enqueue_many("disease_predictions", [{"predicted_class": "x"} for _ in range(12)])
+        written_before_close = len(db.docs)
+        await queue.close()
+        return queue, ids, written_before_close
+
+    queue, ids, written_before_close = asyncio.run(run())
+    assert written_before_close == 0
+    assert all(ObjectId.is_valid(i) for i in ids)
+    assert {str(_id) for _, _id in db.docs} == set(ids)
+    # one insert_many per collection and flush_rows
+    assert sorted(db.calls) == [("disease_predictions", 2), ("disease_predictions", 10), ("yield_predictions", 5)]
+    assert queue.stats["written"] == 17 and len(queue) == 0
+
+
+def test_background_flush_by_size():
+    db = FakeDb()
+
+    async def run():
+        queue = PersistenceQueue(lambda: db, flush_rows=4, flush_interval_ms=60000)
+        queue.enqueue_many("irrigation_predictions", [{"n": i} for i in range(4)])
+        await asyncio.sleep(0.05)
+        written = len(db.docs)
+        await queue.close()
+        return written
+
+    assert asyncio.run(run()) == 4
+
+
+def test_spill_while_down_then_replay(tmp_path):
+    db = FakeDb()
+    db.down = True
+
+    async def run():
+        queue = _queue(db, tmp_path)
+        ids = queue.enqueue_many("yield_predictions", [{"predicted_yield": float(i)} for i in range(15)])
+        await queue.flush()
+        spilled = queue.stats["spilled"]
+        attempts = len(db.calls)
+
+        # a replay that fails keeps everything for later
+        assert await queue.replay() == 0
+        assert queue.spill_path.exists()
+
+        db.down = False
+        await queue.replay()
+        await queue.close()
+        # the background task may have replayed it first; together they replay everything once
+        return queue, ids, spilled, attempts, queue.stats["replayed"]
+
+    queue, ids, spilled, attempts, replayed = asyncio.run(run())
+    assert spilled == 15
+    # two batches, each tried 1 + retries times
+    assert attempts == 4
+    assert replayed == 15
+    assert not queue.spill_path.exists()
+    assert sorted(str(_id) for _, _id in db.docs) == sorted(ids)
+    assert all(isinstance(_id, ObjectId) for _, _id in db.docs)
+
+
+def test_replay_is_idempotent_after_partial_write(tmp_path):
+    db = FakeDb()
+
+    async def run():
+        queue = _queue(db, tmp_path)
+        docs = [{"_id": ObjectId(), "n": i} for i in range(3)]
+        queue._spill("disease_predictions", docs)
+        # the first document made it in before the connection dropped
+        db.docs[("disease_predictions", docs[0]["_id"])] = docs[0]
+        return await queue.replay(), queue.stats
+
+    replayed, stats = asyncio.run(run())
+    assert replayed == 3
+    assert len(db.docs) == 3
+    assert stats["duplicates"] == 1 and stats["dropped"] == 0
+
+
+def test_full_queue_spills_instead_of_blocking(tmp_path, monkeypatch):
+    db = FakeDb()
+    db.down = True
+
+    async def run():
+        queue = _queue(db, tmp_path, flush_rows=5, max_rows=5, max_overflow_rows=2)
+        loop_thread = threading.get_ident()
+        spill_threads = []
+        spill = queue._spill
+
+        def record(collection, docs):
+            spill_threads.append(threading.get_ident())
+            spill(collection, docs)
+
+        monkeypatch.setattr(queue, "_spill", record)
+        queue.enqueue_many("yield_predictions", [{"n": i} for i in range(5)])
+        queue.enqueue("yield_predictions", {"n": 5})
+        queue.enqueue_many("yield_predictions", [{"n": 6}, {"n": 7}])
+        # nothing is written on the request path; the overflow beyond its bound is dropped
+        inline = (len(queue), queue.stats["spilled"], queue.stats["dropped"], queue.spill_path.exists())
+        await queue.close()
+        return inline, queue.stats["spilled"], loop_thread, spill_threads
+
+    inline, spilled, loop_thread, spill_threads = asyncio.run(run())
+    assert inline == (5, 0, 2, False)
+    # the overflowing document, then the five queued ones Mongo refused
+    assert spilled == 6
+    assert spill_threads and loop_thread not in spill_threads
+
+
+def test_replay_reads_in_chunks_and_requeues_the_rest(tmp_path):
+    db = FakeDb()
+
+    async def run():
+        queue = _queue(db, tmp_path, flush_rows=10)
+        docs = [{"_id": ObjectId(), "n": i} for i in range(25)]
+        queue._spill("yield_predictions", docs)
+        inserted = []
+        original = queue._insert
+
+        async def insert(collection, batch):
+            inserted.append(len(batch))
+            if len(inserted) == 2:
+                raise AutoReconnect("connection refused")
+            await original(collection, batch)
+
+        queue._insert = insert
+        replayed = await queue.replay()
+        with open(queue.spill_path, encoding="utf-8") as f:
+            left = f.read().splitlines()
+        return replayed, inserted, left, queue._replaying_path().exists()
+
+    replayed, inserted, left, replaying_left = asyncio.run(run())
+    # one flush_rows chunk per insert; the failed chunk and the unread rest go back
+    assert inserted == [10, 10] and replayed == 10
+    assert len(left) == 15 and not replaying_left
+    assert len(db.docs) == 10
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import irrigation_service
+from src.services.model_store import ModelStore
+from src.utils.prediction_cache import PredictionCache, SqliteCacheBackend, feature_key, model_version
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(max_entries=2, ttl_s=60)
+    cache.set("a", 1.0)
+    cache.set("b", 2.0)
+    assert cache.get("a") == 1.0      # a is now most recent
+    cache.set("c", 3.0)               # evicts b
+    assert cache.get("b") is None
+    assert cache.get("c") == 3.0
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = PredictionCache(max_entries=10, ttl_s=0.01)
+    cache.set("a", 1.0)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_shared_sqlite_backend_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    worker_a = PredictionCache(ttl_s=60, backend=SqliteCacheBackend(path))
+    worker_b = PredictionCache(ttl_s=60, backend=SqliteCacheBackend(path))
+    worker_a.set("k", 42.5)
+    assert worker_b.get("k") == 42.5
+    assert worker_b.stats()["shared_hits"] == 1
+
+
+def test_keys_depend_on_version_and_features():
+    row = np.array([1.0, 2.0, 3.0])
+    assert feature_key("x", "v1", row) == feature_key("x", "v1", row.copy())
+    assert feature_key("x", "v1", row) != feature_key("x", "v2", row)
+    assert feature_key("x", "v1", row) != feature_key("x", "v1", row + 1e-9)
+
+
+def test_rewritten_model_file_invalidates_cache(monkeypatch, tmp_path):
+    features = irrigation_service.EXPECTED_FEATURES
+    X = pd.DataFrame(np.random.default_rng(0).uniform(0, 100, (100, 5)), columns=features)
+    path = tmp_path / "irrigation_rf.pkl"
+    monkeypatch.setattr(irrigation_service, "MODEL_PATH", path)
+    monkeypatch.setattr(irrigation_service, "store", ModelStore(tmp_path / "store"))
+    monkeypatch.setattr(irrigation_service, "_cache", PredictionCache(ttl_s=60))
+    monkeypatch.setattr(irrigation_service._served, "current", None)
+
+    joblib.dump(RandomForestRegressor(n_estimators=5, random_state=0).fit(X, np.full(100, 10.0)), path)
+    payload = {"temperature": 25, "humidity": 60, "previous_moisture": 30}
+    assert irrigation_service.predict_irrigation(payload)["predicted_moisture"] == 10.0
+    assert irrigation_service.predict_irrigation(payload)["predicted_moisture"] == 10.0
+    assert irrigation_service._cache.stats()["hits"] == 1
+
+    joblib.dump(RandomForestRegressor(n_estimators=5, random_state=0).fit(X, np.full(100, 50.0)), path)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    # the registry watcher swaps the rewritten file in
+    assert irrigation_service._reload()
+    assert irrigation_service.served_version() == "file-" + model_version(path)
+    assert irrigation_service.predict_irrigation(payload)["predicted_moisture"] == 50.0
+
+
+def test_sqlite_backend_batches_purges_and_caps(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / "cache.sqlite"), max_rows=3, purge_interval_s=3600)
+    backend.set_many({"a": 1.0, "b": 2.0}, ttl_s=-1)
+    backend.set_many({f"k{i}": float(i) for i in range(5)}, ttl_s=60)
+    assert backend.get_many(["a", "k0", "k4", "missing"]) == {"k0": 0.0, "k4": 4.0}
+
+    # two expired rows, then the two soonest-expiring beyond the cap
+    assert backend.purge() == 4
+    assert set(backend.get_many([f"k{i}" for i in range(5)])) == {"k2", "k3", "k4"}
+
+    # one connection per thread, reused across calls
+    assert backend._conn() is backend._conn() and len(backend._conns) == 1
+    backend.close()
+    assert backend._conns == [] and backend.get("k4") == 4.0
+
+
+def test_get_many_mixes_local_and_shared_hits(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / "cache.sqlite"))
+    other = PredictionCache(ttl_s=60, backend=backend)
+    other.set_many({"a": 1.0, "b": 2.0})
+    cache = PredictionCache(ttl_s=60, backend=backend)
+    cache.set("c", 3.0)
+    assert cache.get_many(["a", "c", "x", "b"]) == [1.0, 3.0, None, 2.0]
+    stats = cache.stats()
+    assert (stats["hits"], stats["shared_hits"], stats["misses"]) == (1, 2, 1)
+    cache.close()
@@ -0,0 +1,81 @@
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ingestion.preprocess_disease import process_images, split_for
+
+
+def _make_raw(raw: Path, per_class=6):
+    rng = np.random.default_rng(0)
+    for cls in ("Tomato___healthy", "Tomato___Late_blight"):
+        (raw / cls).mkdir(parents=True)
+        for i in range(per_class):
+            pixels = (rng.random((300, 400, 3)) * 255).astype("uint8")
+            Image.fromarray(pixels).save(raw / cls / f"img_{i}.jpg")
+    (raw / "Tomato___healthy" / "broken.jpg").write_bytes(b"not a jpeg")
+
+
+def test_parallel_incremental_preprocessing(tmp_path):
+    raw, proc = tmp_path / "raw", tmp_path / "proc"
+    _make_raw(raw)
+
+    info = process_images(raw, proc, workers=2)
+    assert info["total_images"] == 13
+    assert info["last_run"]["done"] == 12
+    assert info["train"] + info["val"] + info["test"] == 12
+
+    manifest = json.loads((proc / "manifest.json").read_text())
+    entry = manifest["Tomato___healthy/img_0.jpg"]
+    assert entry["split"] == split_for("Tomato___healthy/img_0.jpg")
+    with Image.open(proc / entry["target"]) as im:
+        assert im.size == (224, 224)
+    corrupt = json.loads((proc / "corrupt.json").read_text())
+    assert [c["path"] for c in corrupt] == ["Tomato___healthy/broken.jpg"]
+
+    # re-run: nothing is decoded again, corrupt image still reported
+    again = process_images(raw, proc, workers=2)
+    assert again["last_run"] == {"done": 0, "unchanged": 12, "corrupt": 0, "removed": 0, "images_per_sec": None}
+    assert again["corrupt"] == 1
+
+    # only the new image is processed
+    shutil.copy(raw / "Tomato___healthy" / "img_0.jpg", raw / "Tomato___healthy" / "img_new.jpg")
+    third = process_images(raw, proc, workers=2)
+    assert third["last_run"]["done"] == 1
+    assert third["last_run"]["unchanged"] == 12
+
+
+def test_splits_are_deterministic():
+    names = [f"cls/{i}.jpg" for i in range(2000)]
+    first = [split_for(n) for n in names]
+    assert first == [split_for(n) for n in names]
+    assert 0.65 < first.count("train") / len(names) < 0.75
+
+
+def test_outputs_not_in_the_manifest_are_removed(tmp_path):
+    raw, proc = tmp_path / "raw", tmp_path / "proc"
+    _make_raw(raw, per_class=3)
+    process_images(raw, proc, workers=1)
+
+    # an output of the old random split, in a split this image does not hash to
+    rel = "Tomato___healthy/img_0.jpg"
+    other = next(s for s in ("train", "val", "test") if s != split_for(rel))
+    leaked = proc / other / rel
+    leaked.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(proc / json.loads((proc / "manifest.json").read_text())[rel]["target"], leaked)
+    # a deleted source
+    deleted = json.loads((proc / "manifest.json").read_text())["Tomato___Late_blight/img_1.jpg"]["target"]
+    (raw / "Tomato___Late_blight" / "img_1.jpg").unlink()
+
+    info = process_images(raw, proc, workers=1)
+    assert info["last_run"]["removed"] == 2
+    assert not leaked.exists() and not (proc / deleted).exists()
+    on_disk = sorted(p.relative_to(proc).as_posix() for s in ("train", "val", "test")
+                     for p in (proc / s).rglob("*.jpg"))
+    manifest = json.loads((proc / "manifest.json").read_text())
+    assert on_disk == sorted(e["target"] for e in manifest.values() if e["status"] != "corrupt")
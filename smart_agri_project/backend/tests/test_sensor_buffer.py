@@ -0,0 +1,79 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.sensor_service import SensorWriteBuffer, BufferFullError
+
+
+class FakeResult:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.batches.append(list(docs))
+        return FakeResult(list(range(len(docs))))
+
+
+def _rows(n):
+    return [{"sensor_id": f"s{i % 3}", "soil_moisture_pct": float(i)} for i in range(n)]
+
+
+def test_flushes_by_size_and_on_close():
+    coll = FakeCollection()
+
+    async def run():
+        buf = SensorWriteBuffer(lambda: coll, flush_rows=10, flush_interval_ms=60000, max_rows=100)
+        await buf.add(_rows(25))
+        await asyncio.sleep(0.05)
+        flushed_before_close = sum(len(b) for b in coll.batches)
+        await buf.close()
+        return buf, flushed_before_close
+
+    buf, flushed_before_close = asyncio.run(run())
+    assert flushed_before_close >= 20
+    assert sum(len(b) for b in coll.batches) == 25
+    assert max(len(b) for b in coll.batches) <= 10
+    assert buf.stats["inserted"] == 25 and len(buf) == 0
+
+
+def test_flushes_by_time():
+    coll = FakeCollection()
+
+    async def run():
+        buf = SensorWriteBuffer(lambda: coll, flush_rows=1000, flush_interval_ms=20, max_rows=2000)
+        await buf.add(_rows(3))
+        await asyncio.sleep(0.1)
+        n = sum(len(b) for b in coll.batches)
+        await buf.close()
+        return n
+
+    assert asyncio.run(run()) == 3
+
+
+def test_backpressure_raises_when_full():
+    class StuckCollection:
+        async def insert_many(self, docs, ordered=True):
+            raise ConnectionError("mongo down")
+
+    async def run():
+        buf = SensorWriteBuffer(lambda: StuckCollection(), flush_rows=5, flush_interval_ms=10,
+                                max_rows=10, put_timeout_s=0.05)
+        await buf.add(_rows(10))
+        with pytest.raises(BufferFullError):
+            await buf.add(_rows(5))
+        await buf.close()
+        return buf
+
+    buf = asyncio.run(run())
+    assert len(buf) == 10
+    assert "mongo down" in buf.stats["last_error"]
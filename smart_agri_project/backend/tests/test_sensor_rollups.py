@@ -0,0 +1,119 @@
+import datetime
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.sensor_service import _rollup_updates, parse_timestamp, pick_rollup
+
+
+def _doc(sensor_id, ts, moisture):
+    return {"sensor_id": sensor_id, "timestamp": parse_timestamp(ts), "soil_moisture_pct": moisture,
+            "temp_C": 20.0, "humidity_pct": 50.0, "pH": 6.5}
+
+
+def test_parse_timestamp_normalizes_to_naive_utc():
+    assert parse_timestamp("2025-03-01T12:30:00+02:00") == datetime.datetime(2025, 3, 1, 10, 30)
+    assert parse_timestamp("2025-03-01T10:30:00Z") == datetime.datetime(2025, 3, 1, 10, 30)
+    assert parse_timestamp(0) == datetime.datetime(1970, 1, 1)
+
+
+def test_rollups_pre_aggregate_per_sensor_and_bucket():
+    docs = [
+        _doc("a", "2025-03-01T10:00:05", 30.0),
+        _doc("a", "2025-03-01T10:00:50", 10.0),
+        _doc("a", "2025-03-01T10:01:10", 20.0),
+        _doc("b", "2025-03-01T10:00:20", 40.0),
+    ]
+    updates = _rollup_updates(docs)
+    minute = {(op._filter["sensor_id"], op._filter["bucket"].minute): op._doc
+              for op in updates["sensor_rollup_1m"]}
+    assert len(minute) == 3
+    first = minute[("a", 0)]
+    assert first["$inc"]["count"] == 2
+    assert first["$inc"]["sum.soil_moisture_pct"] == 40.0
+    assert first["$min"]["min.soil_moisture_pct"] == 10.0
+    assert first["$max"]["max.soil_moisture_pct"] == 30.0
+
+    hourly = updates["sensor_rollup_1h"]
+    assert len(hourly) == 2
+    assert sorted(op._doc["$inc"]["count"] for op in hourly) == [1, 3]
+    assert all(op._upsert for op in hourly)
+
+
+def test_pick_rollup_uses_coarsest_level_that_fits():
+    assert pick_rollup(0) is None
+    assert pick_rollup(30) is None
+    assert pick_rollup(60)[0] == "1m"
+    assert pick_rollup(900)[0] == "1m"
+    assert pick_rollup(3600 * 6)[0] == "1h"
+    assert pick_rollup(86400 * 7)[0] == "1d"
+
+
+class _Result:
+    def __init__(self, n):
+        self.modified_count = n
+
+
+class _Readings:
+    def __init__(self, docs):
+        self.docs = {d["_id"]: d for d in docs}
+
+    def find(self, query):
+        docs = [dict(d) for d in self.docs.values() if isinstance(d["timestamp"], str)]
+
+        async def gen():
+            for d in docs:
+                yield d
+        return gen()
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        if doc["timestamp"] != query["timestamp"]:
+            return _Result(0)
+        doc.update(update["$set"])
+        return _Result(1)
+
+
+class _Rollups:
+    def __init__(self):
+        self.ops = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.ops.extend(ops)
+
+
+class _Db(dict):
+    def __missing__(self, name):
+        self[name] = _Rollups()
+        return self[name]
+
+
+def test_string_timestamps_are_migrated_and_folded_once():
+    import asyncio
+    from src.services.sensor_service import SENSOR_COLLECTION, migrate_sensor_timestamps
+
+    docs = [
+        {"_id": 1, "sensor_id": "a", "timestamp": "2025-03-01T10:00:05Z", "soil_moisture_pct": 30.0},
+        {"_id": 2, "sensor_id": "a", "timestamp": "2025-03-01T10:00:50", "soil_moisture_pct": 10.0},
+        {"_id": 3, "sensor_id": "a", "timestamp": datetime.datetime(2025, 3, 1, 10, 0, 55), "soil_moisture_pct": 5.0},
+        {"_id": 4, "sensor_id": "a", "timestamp": "yesterday", "soil_moisture_pct": 1.0},
+    ]
+    db = _Db({SENSOR_COLLECTION: _Readings(docs)})
+
+    async def run():
+        # two workers starting at once
+        return await asyncio.gather(migrate_sensor_timestamps(db, batch_size=1),
+                                    migrate_sensor_timestamps(db, batch_size=1))
+
+    first, second = asyncio.run(run())
+    assert first["converted"] + second["converted"] == 2
+    assert first["invalid"] == second["invalid"] == 1
+    readings = db[SENSOR_COLLECTION].docs
+    assert readings[1]["timestamp"] == datetime.datetime(2025, 3, 1, 10, 0, 5)
+    assert readings[4]["timestamp"] == "yesterday"
+
+    # only the two converted readings reach the rollups, each exactly once
+    minute = db["sensor_rollup_1m"].ops
+    assert sum(op._doc["$inc"]["count"] for op in minute) == 2
+    assert sum(op._doc["$inc"]["sum.soil_moisture_pct"] for op in minute) == 40.0
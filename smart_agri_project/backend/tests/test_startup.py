@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Importing the app must stay cheap: models and heavy libraries load lazily / in warmup
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "2.5"))
+HEAVY_MODULES = ["torch", "torchvision", "sklearn", "pandas", "google.generativeai"]
+
+
+def test_import_main_within_budget():
+    code = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        "import src.main\n"
+        "print(time.perf_counter() - t)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR,
+                         capture_output=True, text=True, check=True).stdout.splitlines()
+    elapsed, heavy = float(out[-2]), out[-1]
+    assert heavy == "", f"heavy modules imported eagerly: {heavy}"
+    assert elapsed < IMPORT_BUDGET_S, f"import src.main took {elapsed:.2f}s (budget {IMPORT_BUDGET_S}s)"
+
+
+def test_health_endpoints_report_model_state():
+    from fastapi.testclient import TestClient
+    import src.main as main
+    from src.services.model_registry import registry
+
+    client = TestClient(main.app)
+    assert client.get("/health/live").json() == {"status": "alive"}
+
+    with registry.loading("irrigation"):
+        pass
+    body = client.get("/health/ready").json()
+    assert body["models"]["irrigation"]["state"] == "ready"
+    assert body["models"]["irrigation"]["load_seconds"] is not None
+    assert set(body["models"]) >= {"disease", "irrigation", "yield"}
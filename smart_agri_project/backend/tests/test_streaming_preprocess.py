@@ -0,0 +1,87 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ingestion import preprocess_irrigation, preprocess_yield
+from src.ingestion.streaming import RunningStats, preprocess_streaming, read_split
+
+
+def _irrigation_csv(path, n=500):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "Time": pd.date_range("2024-01-01", periods=n, freq="h").astype(str),
+        "Humidity": rng.uniform(20, 90, n),
+        "Atmospheric_Temp": rng.uniform(5, 40, n),
+        "Soil_Moisture": rng.integers(0, 255, n),
+    })
+    df.loc[rng.choice(n, 25, replace=False), "Humidity"] = np.nan
+    df.to_csv(path, index=False)
+    return path
+
+
+def _sorted(df):
+    return df.sort_values("Time").reset_index(drop=True)
+
+
+def test_running_stats_match_pandas():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(5, 2, 1000), "b": rng.integers(0, 9, 1000).astype(float)})
+    stats = RunningStats(["a", "b"])
+    for start in range(0, 1000, 37):
+        stats.update(df.iloc[start:start + 37])
+    np.testing.assert_allclose(stats.mean, df.mean().to_numpy())
+    np.testing.assert_allclose(stats.std, df.std().to_numpy())
+    assert stats.integral.tolist() == [False, True]
+
+
+def test_streaming_matches_in_memory(tmp_path):
+    raw = _irrigation_csv(tmp_path / "raw.csv")
+    mem = preprocess_irrigation.preprocess(raw, out_dir=tmp_path / "mem")
+    for chunksize in (7, 10_000):
+        out = tmp_path / f"stream_{chunksize}"
+        info = preprocess_irrigation.preprocess(raw, out_dir=out, streaming=True, chunksize=chunksize)
+        assert {k: info[k] for k in ("rows", "train", "val", "test")} == \
+               {k: mem[k] for k in ("rows", "train", "val", "test")}
+        for split in ("train", "val", "test"):
+            pd.testing.assert_frame_equal(
+                _sorted(read_split(out, split)), _sorted(read_split(tmp_path / "mem", split)),
+                check_dtype=False, atol=1e-9
+            )
+    assert mem["rows"] == 475
+    assert 0.6 < mem["train"] / mem["rows"] < 0.8
+
+
+def test_yield_streaming_adds_yield_and_keeps_integers(tmp_path):
+    raw = tmp_path / "crop.csv"
+    pd.DataFrame({
+        "Crop": ["Rice", "Wheat", "Maize", None] * 10,
+        "Crop_Year": list(range(2000, 2040)),
+        "Area": [2.0, 0.0, 4.0, 1.0] * 10,
+        "Production": [10.0, 5.0, 8.0, 3.0] * 10,
+    }).to_csv(raw, index=False)
+
+    info = preprocess_yield.preprocess(raw, out_dir=tmp_path / "out", streaming=True, chunksize=6)
+    assert info["rows"] == 30
+    rows = pd.concat([read_split(tmp_path / "out", s) for s in ("train", "val", "test")])
+    assert rows["Crop_Year"].dtype == np.int64
+    assert sorted(rows["Yield"].unique().tolist()) == [2.0, 5.0]
+
+
+def test_unparseable_value_in_an_integer_column_becomes_missing(tmp_path):
+    raw = tmp_path / "raw.csv"
+    ids = [str(i) for i in range(100)]
+    ids[57] = "n/a"
+    pd.DataFrame({"id": ids, "x": np.arange(100) * 0.5}).to_csv(raw, index=False)
+
+    info = preprocess_streaming(raw, tmp_path / "out", clean=lambda df: df, normalize_numeric=False,
+                                chunksize=8, num_cols=["id", "x"])
+    assert info["rows"] == 100
+    rows = pd.concat([read_split(tmp_path / "out", s) for s in ("train", "val", "test")])
+    # written as float like the in-memory path, with the bad value missing
+    assert rows["id"].dtype == np.float64
+    assert rows["id"].isna().sum() == 1
+    assert sorted(rows["id"].dropna().astype(int).tolist()) == [i for i in range(100) if i != 57]
@@ -0,0 +1,82 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, TensorDataset
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ml.train_engine import TrainConfig, fit
+
+CPU = torch.device("cpu")
+
+
+def _loaders():
+    g = torch.Generator().manual_seed(0)
+    x = torch.randn(48, 3, 8, 8, generator=g)
+    y = (x.mean(dim=(1, 2, 3)) > 0).long()
+    train = DataLoader(TensorDataset(x[:32], y[:32]), batch_size=8, shuffle=True)
+    val = DataLoader(TensorDataset(x[32:], y[32:]), batch_size=8)
+    return train, val
+
+
+def _model():
+    torch.manual_seed(1)
+    return nn.Sequential(nn.Conv2d(3, 4, 3, padding=1), nn.BatchNorm2d(4), nn.ReLU(), nn.Dropout(0.2),
+                         nn.AdaptiveAvgPool2d(1), nn.Flatten(), nn.Linear(4, 2))
+
+
+class _KilledAt:
+    """Loader wrapper that dies when the given epoch starts, like a killed process."""
+
+    def __init__(self, loader, epoch):
+        self.loader, self.epoch, self.calls = loader, epoch, 0
+        self.batch_size = loader.batch_size
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.calls += 1
+        if self.calls == self.epoch:
+            raise KeyboardInterrupt
+        return iter(self.loader)
+
+
+def test_resume_matches_uninterrupted_run(tmp_path):
+    train, val = _loaders()
+    full = _model()
+    full_history = fit(full, train, val, CPU, TrainConfig(epochs=3, lr=1e-2))
+
+    config = TrainConfig(epochs=3, lr=1e-2, checkpoint_path=str(tmp_path / "ckpt.pt"), resume=True)
+    with pytest.raises(KeyboardInterrupt):
+        fit(_model(), _KilledAt(train, 3), val, CPU, config)
+    assert torch.load(config.checkpoint_path, weights_only=False)["epoch"] == 2
+
+    # a different global RNG state in the new process must not matter
+    torch.manual_seed(123)
+    resumed = _model()
+    history = fit(resumed, train, val, CPU, config)
+
+    assert [h["epoch"] for h in history] == [1, 2, 3]
+    assert history[-1]["train_loss"] == pytest.approx(full_history[-1]["train_loss"])
+    for a, b in zip(full.state_dict().values(), resumed.state_dict().values()):
+        assert torch.equal(a, b)
+
+
+def test_bf16_channels_last_accumulation_and_log(tmp_path):
+    train, val = _loaders()
+    best = []
+    log = tmp_path / "log.jsonl"
+    config = TrainConfig(epochs=2, lr=1e-2, amp="bf16", channels_last=True, accum_steps=2,
+                         log_path=str(log))
+    history = fit(_model(), train, val, CPU, config, on_best=lambda m, e, acc: best.append(e))
+
+    assert len(history) == 2
+    assert all(h["effective_batch"] == 16 and h["images_per_sec"] > 0 for h in history)
+    assert 0.0 <= history[-1]["val_acc"] <= 1.0
+    assert [json.loads(line)["epoch"] for line in log.read_text().splitlines()] == [1, 2]
+    assert best == sorted(set(best))
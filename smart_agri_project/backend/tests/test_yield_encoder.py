@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ml.yield_encoder import YieldFeatureEncoder
+from src.services import yield_service
+from src.services.model_registry import Served
+
+
+def _training_frame():
+    rng = np.random.default_rng(0)
+    n = 200
+    raw = pd.DataFrame({
+        "crop": rng.integers(0, 5, n),
+        "area": rng.uniform(0.5, 10, n),
+        "rainfall": rng.uniform(50, 300, n),
+        "temperature": rng.uniform(15, 40, n),
+        "season": rng.integers(0, 5, n),
+        "soil_type": rng.choice(["clay", "loam", "sandy"], n),
+        "ph": rng.uniform(5, 8, n),
+        "fertilizer_level": rng.uniform(0, 5, n),
+    })
+    X = pd.get_dummies(raw, drop_first=True).astype(float)
+    y = X["area"] * 0.5 + X["rainfall"] * 0.01 + X["soil_type_sandy"]
+    return X, y
+
+
+def _fitted():
+    X, y = _training_frame()
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=20, random_state=0).fit(scaler.transform(X), y)
+    return X, scaler, model
+
+
+def test_encoder_matches_scaled_one_hot_row():
+    X, scaler, _ = _fitted()
+    encoder = YieldFeatureEncoder(list(X.columns), scaler=scaler,
+                                  category_maps={"crop": yield_service.DEFAULT_CROP_MAP,
+                                                 "season": yield_service.DEFAULT_SEASON_MAP})
+    payload = {"crop": "Maize", "area": 2.0, "rainfall": "120", "temperature": 30,
+               "season": "rabi", "soil_type": "sandy", "ph": 6.5, "fertilizer_level": 2}
+
+    expected = pd.DataFrame([{c: 0.0 for c in X.columns}])
+    expected.loc[0, ["crop", "area", "rainfall", "temperature", "season", "ph", "fertilizer_level"]] = \
+        [2, 2.0, 120.0, 30, 1, 6.5, 2]
+    expected.loc[0, "soil_type_sandy"] = 1.0
+
+    np.testing.assert_allclose(encoder.encode(payload), scaler.transform(expected))
+
+
+def test_encode_many_matches_encode():
+    X, scaler, _ = _fitted()
+    encoder = YieldFeatureEncoder(list(X.columns), scaler=scaler,
+                                  category_maps={"crop": yield_service.DEFAULT_CROP_MAP})
+    records = [
+        {"crop": "rice", "area": 1.0, "soil_type": "loam"},
+        {"crop": "unknown", "area": 3.0, "rainfall": None},
+        {"area": 5.5, "ph": 7.1, "soil_type": "clay"},
+    ]
+    batch = encoder.encode_many(records)
+    assert batch.shape == (3, X.shape[1])
+    for i, r in enumerate(records):
+        np.testing.assert_allclose(batch[i:i + 1], encoder.encode(r))
+    # unmapped crop stays missing
+    assert np.isnan(batch[1, list(X.columns).index("crop")])
+
+
+def test_predict_yield_uses_encoder_and_batch_agrees(monkeypatch):
+    if yield_service._cache is not None:
+        yield_service._cache.clear()
+    X, scaler, model = _fitted()
+    bundle = yield_service.YieldModel(model, scaler, yield_service._build_encoder(model, scaler))
+    monkeypatch.setattr(yield_service._served, "current", Served(bundle, "test"))
+    assert bundle.encoder is not None
+
+    records = [{"crop": "wheat", "area": a, "rainfall": 150, "temperature": 25, "season": "kharif",
+                "soil_type": "loam", "ph": 6.8, "fertilizer_level": 1.5} for a in (1.0, 4.0, 9.0)]
+    singles = [yield_service.predict_yield(r) for r in records]
+    assert yield_service.predict_yield_batch(records) == singles
+    assert singles[0]["model_version"] == "test"
+
+
+def test_absent_inputs_match_the_pandas_path():
+    X, scaler, model = _fitted()
+    encoder = yield_service._build_encoder(model, scaler)
+    # rainfall, temperature and ph omitted; soil_type omitted so its dummies stay 0
+    payload = {"crop": 0, "area": 3.0, "season": 1, "fertilizer_level": 2}
+
+    row = encoder.encode(payload)
+    expected = yield_service._align_features(yield_service._prepare_input(payload), scaler)
+    np.testing.assert_allclose(row, expected.to_numpy(dtype=float))
+    cols = list(X.columns)
+    assert all(np.isnan(row[0, cols.index(c)]) for c in ("rainfall", "temperature", "ph"))
+    assert row[0, cols.index("soil_type_sandy")] == (0.0 - scaler.mean_[cols.index("soil_type_sandy")]) \
+        / scaler.scale_[cols.index("soil_type_sandy")]